@@ -0,0 +1,97 @@
+"""
+Benchmark for the hex dump parser
+Compares the original regex + per-byte int() parser with ct952_hexparse
+Compatible with Python 2.7
+"""
+
+import os
+import random
+import re
+import sys
+import tempfile
+import time
+
+import ct952_hexparse
+
+
+def legacy_parse_hex_file(filename):
+    """The original BitmapBrowser.parse_hex_file"""
+    with open(filename, 'r') as f:
+        content = f.read()
+
+    hex_matches = re.findall(r'0x([0-9A-Fa-f]{2})', content)
+    if not hex_matches:
+        raise ValueError("No hexadecimal data found in file")
+
+    data = bytearray()
+    for hex_str in hex_matches:
+        data.append(int(hex_str, 16))
+    return data
+
+
+def write_byte_dump(filename, size):
+    """Write size random bytes as a "0x39,0x5A," style C array, 16 per line"""
+    rnd = random.Random(size)
+    with open(filename, 'w') as f:
+        for start in range(0, size, 16):
+            count = min(16, size - start)
+            f.write("  " + ",".join("0x%02X" % rnd.randint(0, 255) for _ in range(count)) + ",\n")
+
+
+def write_dword_dump(filename, size):
+    """Write size / 4 random words as a "0x000004d8," style C array, 5 per line"""
+    rnd = random.Random(size)
+    words = size // 4
+    with open(filename, 'w') as f:
+        for start in range(0, words, 5):
+            count = min(5, words - start)
+            f.write(",".join("0x%08x" % rnd.randint(0, 0xFFFFFFFF) for _ in range(count)) + ",\n")
+
+
+def best_time(func, filename, repeat):
+    best = None
+    result = None
+    for _ in range(repeat):
+        start = time.time()
+        result = func(filename)
+        elapsed = time.time() - start
+        if best is None or elapsed < best:
+            best = elapsed
+    return best, result
+
+
+def bench(label, filename, repeat=3):
+    megabytes = os.path.getsize(filename) / float(1 << 20)
+    old_time, old_data = best_time(legacy_parse_hex_file, filename, repeat)
+    new_time, new_data = best_time(ct952_hexparse.parse_hex_file, filename, repeat)
+    if old_data != new_data:
+        raise AssertionError("{}: parsers disagree".format(label))
+    print("{:<28} {:8.2f} MB  before {:8.1f} MB/s  after {:8.1f} MB/s  ({:.0f}x)".format(
+        label, megabytes, megabytes / old_time, megabytes / new_time, old_time / new_time))
+
+
+def main():
+    """Run the benchmark on the given files, or on generated dumps"""
+    if len(sys.argv) > 1:
+        for filename in sys.argv[1:]:
+            bench(os.path.basename(filename), filename)
+        return
+
+    tmpdir = tempfile.mkdtemp()
+    try:
+        for size in (94 << 10, 4 << 20):
+            filename = os.path.join(tmpdir, "bytes_{}.txt".format(size))
+            write_byte_dump(filename, size)
+            bench("byte array {} KB".format(size >> 10), filename)
+
+            filename = os.path.join(tmpdir, "dwords_{}.txt".format(size))
+            write_dword_dump(filename, size)
+            bench("dword array {} KB".format(size >> 10), filename)
+    finally:
+        for name in os.listdir(tmpdir):
+            os.remove(os.path.join(tmpdir, name))
+        os.rmdir(tmpdir)
+
+
+if __name__ == "__main__":
+    main()
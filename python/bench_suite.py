@@ -0,0 +1,433 @@
+"""
+Benchmark suite for the ct952-dmp-121 parsers and decoders
+Times parse, decode, colour conversion and scaling on generated inputs and compares them with a stored baseline
+Compatible with Python 2.7
+
+    python bench_suite.py               # compare with bench_baseline.json, exit 1 on regressions
+    python bench_suite.py --save        # record this machine's results as the baseline
+    python bench_suite.py --quick -k 'decode/*'
+"""
+
+import argparse
+import collections
+import fnmatch
+import json
+import os
+import re
+import shutil
+import sys
+import tempfile
+import time
+
+try:
+    import tracemalloc
+except ImportError:
+    tracemalloc = None
+
+import numpy as np
+from PIL import Image
+
+import ct952_canvas
+import ct952_colorspace
+import ct952_core
+import ct952_decode
+import ct952_fwbitmap
+import ct952_hexparse
+import ct952_palette
+import ct952_romscan
+
+BASELINE_VERSION = 1
+DEFAULT_BASELINE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "bench_baseline.json")
+# Runs of the large cases vary by up to 30% on a shared machine
+DEFAULT_THRESHOLD = 0.5
+# Slack on top of the threshold, so sub-millisecond cases do not fail on timer noise
+NOISE_SECONDS = 0.001
+NOISE_KB = 64
+
+# From the 80x124 clock digits (BMP/0.txt ...) up to a 1024x600 panel
+IMAGE_SIZES = ((80, 124), (320, 240), (720, 480), (1024, 600))
+HEX_SIZES = (10 << 10, 1 << 20, 10 << 20, 50 << 20)
+QUICK_HEX_SIZES = (10 << 10, 1 << 20)
+ROM_SIZE = 8 << 20
+MIN_SECONDS = 0.2           # keep repeating a case until this much time is spent
+
+MPIX = "MPix"
+MB = "MB"
+
+# Formats decode() returns as a view of the data: their cases time only the
+# wrapping, so they report no MPix/s to be compared with real decodes
+WRAP_ONLY_FORMATS = (ct952_decode.FORMAT_8BIT_GRAY, ct952_decode.FORMAT_8BIT_INDEXED)
+
+# Cases whose buffers PIL allocates, out of tracemalloc's sight: they report
+# no peak rather than the few KB of Python objects around the real work
+UNTRACED_CASES = ('decode/24-bit-rgb/*', 'scale/flatten/*', 'scale/pyramid/*', 'scale/zoom-4x/*')
+
+HEX_DIGITS = np.frombuffer(b'0123456789abcdef', dtype=np.uint8)
+
+# setup() prepares the input and returns the function to time; amount is
+# in unit (MPix or MB), or None when only the time means something
+Case = collections.namedtuple('Case', 'name stage setup amount unit')
+
+
+def slug(text):
+    return re.sub(r'[^0-9a-z]+', '-', text.lower()).strip('-')
+
+
+def hex_lines(values, digits, per_line):
+    """values as "0x1f," C array text, per_line tokens a line; len(values) must fill the lines"""
+    values = np.asarray(values, dtype=np.uint64)
+    shifts = np.arange(digits - 1, -1, -1, dtype=np.uint64) * np.uint64(4)
+    tokens = np.empty((len(values), digits + 3), dtype=np.uint8)
+    tokens[:, 0] = ord('0')
+    tokens[:, 1] = ord('x')
+    tokens[:, 2:-1] = HEX_DIGITS[(values[:, np.newaxis] >> shifts) & np.uint64(0xF)]
+    tokens[:, -1] = ord(',')
+    lines = np.empty((len(values) // per_line, per_line * (digits + 3) + 1), dtype=np.uint8)
+    lines[:, :-1] = tokens.reshape(len(lines), -1)
+    lines[:, -1] = ord('\n')
+    return lines.tobytes()
+
+
+def _hex_layout(size, words):
+    """(digits, tokens a line, lines) of a hex dump of about size bytes"""
+    digits, per_line = (8, 5) if words else (2, 16)
+    return digits, per_line, max(1, size // (per_line * (digits + 3) + 1))
+
+
+def hex_dump_size(size, words=False):
+    """Exact size of the file write_hex_dump writes for size"""
+    digits, per_line, rows = _hex_layout(size, words)
+    return rows * (per_line * (digits + 3) + 1)
+
+
+def write_hex_dump(filename, size, words=False, seed=0):
+    """
+    About size bytes of random hex text: "0x39," bytes 16 a line like the
+    byte arrays, or "0x000004d8," words 5 a line like BMP/*.txt.
+    """
+    digits, per_line, rows = _hex_layout(size, words)
+    random = np.random.RandomState(seed)
+    with open(filename, 'wb') as f:
+        for first in range(0, rows, 1 << 15):
+            count = min(1 << 15, rows - first) * per_line
+            f.write(hex_lines(random.randint(0, 1 << (4 * digits), count, dtype=np.int64),
+                              digits, per_line))
+    return filename
+
+
+def write_bitmap_dump(filename, width, height, bits, seed=0):
+    """A firmware bitmap hex dump: the '>4I' header, then its pixel words"""
+    payload_words = (width * height * bits + 31) // 32
+    mode = dict((mode_bits, mode) for mode, mode_bits in ct952_fwbitmap.MODE_BITS.items())[bits]
+    words = np.concatenate((
+        [payload_words, mode, width, height],
+        np.random.RandomState(seed).randint(0, 1 << 32, payload_words, dtype=np.int64)))
+    words = np.concatenate((words, np.zeros(-len(words) % 5, dtype=np.int64)))
+    with open(filename, 'wb') as f:
+        f.write(hex_lines(words, 8, 5))
+    return filename
+
+
+def write_palette(filename, count=ct952_palette.PALETTE_SIZE - 1, seed=0):
+    """A count-prefixed palette table like BMP/pal*.txt"""
+    entries = np.random.RandomState(seed).randint(0, 1 << 24, count, dtype=np.int64)
+    words = np.concatenate(([count], entries))
+    words = np.concatenate((words, np.zeros(-len(words) % 5, dtype=np.int64)))
+    with open(filename, 'wb') as f:
+        f.write(hex_lines(words, 8, 5))
+    return filename
+
+
+def random_bytes(count, seed=0):
+    return np.random.RandomState(seed).randint(0, 256, count).astype(np.uint8).tobytes()
+
+
+def random_palette(seed=0):
+    entries = np.random.RandomState(seed).randint(0, 1 << 24, ct952_palette.PALETTE_SIZE)
+    return ct952_palette.Palette(entries, 0, "random")
+
+
+def parse_cases(directory, quick):
+    cases = []
+    for size in (QUICK_HEX_SIZES if quick else HEX_SIZES):
+        for words in (False, True):
+            kind = "words" if words else "bytes"
+            parse = ct952_hexparse.parse_hex_words if words else ct952_hexparse.parse_hex_file
+            filename = os.path.join(directory, "{}_{}.txt".format(kind, size))
+
+            def setup(filename=filename, size=size, words=words, parse=parse):
+                write_hex_dump(filename, size, words)
+                return lambda: parse(filename)
+            cases.append(Case("parse/hex-{}/{}KB".format(kind, size >> 10), "parse", setup,
+                              hex_dump_size(size, words) / float(1 << 20), MB))
+
+    for width, height in IMAGE_SIZES[-2:]:
+        filename = os.path.join(directory, "bitmap_{}x{}.txt".format(width, height))
+        # Header and pixel words, five "0x12345678," a line
+        size = -(-(4 + width * height // 4) // 5) * 56
+
+        def setup(filename=filename, width=width, height=height):
+            write_bitmap_dump(filename, width, height, 8)
+            return lambda: ct952_fwbitmap.load_file(filename)
+        cases.append(Case("parse/fwbitmap/{}x{}".format(width, height), "parse", setup,
+                          size / float(1 << 20), MB))
+
+    palette_file = os.path.join(directory, "palette.txt")
+
+    def setup_palette():
+        write_palette(palette_file)
+        return lambda: ct952_palette.load_palette(palette_file)
+    cases.append(Case("parse/palette", "parse", setup_palette, None, None))
+
+    def setup_scan():
+        buffer = random_bytes(ROM_SIZE)
+        return lambda: ct952_romscan.scan(buffer)
+    cases.append(Case("parse/romscan/{}MB".format(ROM_SIZE >> 20), "parse", setup_scan,
+                      ROM_SIZE / float(1 << 20), MB))
+    return cases
+
+
+def decode_cases():
+    cases = []
+    formats = sorted(ct952_decode.FORMAT_BITS.items(), key=lambda item: (item[1], item[0]))
+    for format_type, bits in formats:
+        for width, height in IMAGE_SIZES:
+            def setup(format_type=format_type, bits=bits, width=width, height=height):
+                data = random_bytes((width * height * bits + 7) // 8)
+                palette = None
+                if format_type in ct952_decode.INDEXED_FORMATS.values():
+                    palette = random_palette().lut()
+                return lambda: ct952_decode.decode(data, width, height, format_type, palette)
+            if format_type in WRAP_ONLY_FORMATS:
+                cases.append(Case("decode/{}-wrap/{}x{}".format(slug(format_type), width, height),
+                                  "decode", setup, None, None))
+                continue
+            cases.append(Case("decode/{}/{}x{}".format(slug(format_type), width, height),
+                              "decode", setup, width * height / 1e6, MPIX))
+    return cases
+
+
+def colour_cases():
+    width, height = IMAGE_SIZES[-1]
+    pixels = width * height / 1e6
+    cases = []
+    for color_range in (ct952_colorspace.FULL_RANGE, ct952_colorspace.STUDIO_RANGE):
+        def setup(color_range=color_range):
+            yuv = np.frombuffer(random_bytes(width * height * 3), dtype=np.uint8).reshape(height, width, 3)
+            ct952_colorspace.yuv_to_rgb(yuv[:1], color_range)     # build the tables first
+            return lambda: ct952_colorspace.yuv_to_rgb(yuv, color_range)
+        cases.append(Case("colour/yuv-to-rgb-{}/{}x{}".format(color_range, width, height),
+                          "colour", setup, pixels, MPIX))
+
+    def setup_rgb():
+        rgb = np.frombuffer(random_bytes(width * height * 3), dtype=np.uint8).reshape(height, width, 3)
+        ct952_colorspace.rgb_to_yuv(rgb[:1])
+        return lambda: ct952_colorspace.rgb_to_yuv(rgb)
+    cases.append(Case("colour/rgb-to-yuv-device/{}x{}".format(width, height), "colour",
+                      setup_rgb, pixels, MPIX))
+
+    def setup_palette():
+        entries = np.random.RandomState(0).randint(0, 1 << 24, ct952_palette.PALETTE_SIZE)
+        return lambda: ct952_palette.Palette(entries, 0).lut()
+    cases.append(Case("colour/palette-lut", "colour", setup_palette,
+                      ct952_palette.PALETTE_SIZE / 1e6, MPIX))
+    return cases
+
+
+def scale_cases():
+    """The image view's work (ct952_canvas), without Tk: flatten, Fit pyramid, 4x zoom"""
+    cases = []
+    for width, height in IMAGE_SIZES[1:]:
+        pixels = width * height / 1e6
+
+        def setup_flatten(width=width, height=height):
+            data = random_bytes(width * height)
+            image = ct952_decode.decode(data, width, height, ct952_decode.FORMAT_8BIT_INDEXED,
+                                        random_palette().lut())
+            return lambda: ct952_canvas.flatten(image, (255, 255, 255))
+        cases.append(Case("scale/flatten/{}x{}".format(width, height), "scale",
+                          setup_flatten, pixels, MPIX))
+
+        def setup_pyramid(width=width, height=height):
+            image = Image.frombytes('RGB', (width, height), random_bytes(width * height * 3))
+
+            def pyramid():
+                level = image
+                while level.width > 64 and level.height > 64:
+                    level = ct952_canvas.halve(level)
+                return level
+            return pyramid
+        cases.append(Case("scale/pyramid/{}x{}".format(width, height), "scale",
+                          setup_pyramid, pixels, MPIX))
+
+        def setup_zoom(width=width, height=height):
+            image = Image.frombytes('RGB', (width, height), random_bytes(width * height * 3))
+            box = (0, 0, width // 4, height // 4)
+            return lambda: image.crop(box).resize((width, height), Image.NEAREST)
+        cases.append(Case("scale/zoom-4x/{}x{}".format(width, height), "scale",
+                          setup_zoom, pixels, MPIX))
+    return cases
+
+
+def import_cases(directory):
+    """
+    Timed in a fresh interpreter: setup returns the function that measures
+    the milliseconds. The core import itself loads nothing, so the first
+    decode and parse through it are timed too.
+    """
+    def setup_parse():
+        filename = os.path.join(directory, "first_parse.txt")
+        write_hex_dump(filename, 10 << 10)
+        return lambda: ct952_core.first_parse_ms(filename)
+    return [Case("import/ct952_core", "import", lambda: lambda: ct952_core.measure_import()[0],
+                 None, None),
+            Case("import/ct952_core-first-decode", "import", lambda: ct952_core.first_decode_ms,
+                 None, None),
+            Case("import/ct952_core-first-parse", "import", setup_parse, None, None)]
+
+
+def all_cases(directory, quick=False):
+    return (import_cases(directory) + parse_cases(directory, quick) + decode_cases()
+            + colour_cases() + scale_cases())
+
+
+def time_case(func, repeat):
+    """Best time of at least repeat runs, repeating until MIN_SECONDS have passed"""
+    best = None
+    spent = 0.0
+    runs = 0
+    while runs < repeat or spent < MIN_SECONDS:
+        start = time.time()
+        func()
+        elapsed = time.time() - start
+        best = elapsed if best is None else min(best, elapsed)
+        spent += elapsed
+        runs += 1
+    return best
+
+
+def peak_memory(func):
+    """Peak KB that Python and NumPy allocate during one run, or None without tracemalloc"""
+    if tracemalloc is None:
+        return None
+    tracemalloc.start()
+    try:
+        func()
+        return tracemalloc.get_traced_memory()[1] // 1024
+    finally:
+        tracemalloc.stop()
+
+
+def run_case(case, repeat):
+    if case.stage == "import":
+        measure = case.setup()
+        seconds = min(measure() for _ in range(repeat)) / 1000.0
+        result = {'seconds': seconds, 'peak_kb': None}
+    else:
+        func = case.setup()
+        seconds = time_case(func, repeat)
+        untraced = any(fnmatch.fnmatchcase(case.name, pattern) for pattern in UNTRACED_CASES)
+        result = {'seconds': seconds, 'peak_kb': None if untraced else peak_memory(func)}
+    if case.amount:
+        result['throughput'] = case.amount / seconds if seconds else float('inf')
+        result['unit'] = "{}/s".format(case.unit)
+    return result
+
+
+def load_baseline(filename):
+    try:
+        with open(filename) as f:
+            baseline = json.load(f)
+    except (IOError, OSError, ValueError):
+        return {}
+    if baseline.get('version') != BASELINE_VERSION:
+        return {}
+    return baseline.get('cases', {})
+
+
+def save_baseline(filename, cases):
+    with open(filename, 'w') as f:
+        json.dump({'version': BASELINE_VERSION,
+                   'python': "{}.{}".format(*sys.version_info[:2]),
+                   'cases': cases}, f, indent=1, sort_keys=True)
+        f.write("\n")
+
+
+def regressions(result, base, threshold):
+    """What got worse than base by more than threshold (and the noise allowance)"""
+    found = []
+    if result['seconds'] > base['seconds'] * (1 + threshold) + NOISE_SECONDS:
+        found.append("time {:+.0%}".format(result['seconds'] / base['seconds'] - 1))
+    if (result.get('peak_kb') is not None and base.get('peak_kb') is not None
+            and result['peak_kb'] > base['peak_kb'] * (1 + threshold) + NOISE_KB):
+        found.append("memory {:+.0%}".format(result['peak_kb'] / float(max(1, base['peak_kb'])) - 1))
+    return found
+
+
+def describe(case, result, base):
+    throughput = ("{:9.1f} {:<6}".format(result['throughput'], result['unit'])
+                  if 'throughput' in result else " " * 16)
+    peak = "{:>8} KB".format(result['peak_kb']) if result['peak_kb'] is not None else " " * 11
+    change = ""
+    if base:
+        change = "  {:+.0%}".format(result['seconds'] / base['seconds'] - 1)
+    return "{:<40} {:10.3f} ms {} {}{}".format(
+        case.name, result['seconds'] * 1000, throughput, peak, change)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Time every parser, decoder, colour conversion and scaling step on "
+                    "generated inputs and compare with a stored baseline.")
+    parser.add_argument('-k', '--select', action='append',
+                        help="only cases matching this glob, e.g. 'decode/*' (repeatable)")
+    parser.add_argument('-b', '--baseline', default=DEFAULT_BASELINE,
+                        help="baseline JSON (default: %(default)s)")
+    parser.add_argument('-t', '--threshold', type=float, default=DEFAULT_THRESHOLD,
+                        help="allowed slowdown or memory growth as a fraction (default: %(default)s)")
+    parser.add_argument('--save', action='store_true', help="write the results as the new baseline")
+    parser.add_argument('--quick', action='store_true', help="skip the 10 and 50 MB hex dumps")
+    parser.add_argument('-r', '--repeat', type=int, default=3, help="minimum runs per case")
+    parser.add_argument('-l', '--list', action='store_true', help="list the cases and exit")
+    args = parser.parse_args(argv)
+
+    directory = tempfile.mkdtemp(prefix="ct952_bench_")
+    try:
+        cases = all_cases(directory, args.quick)
+        if args.select:
+            cases = [case for case in cases
+                     if any(fnmatch.fnmatch(case.name, pattern) for pattern in args.select)]
+        if args.list:
+            for case in cases:
+                print(case.name)
+            return 0
+
+        baseline = load_baseline(args.baseline)
+        results = {}
+        failed = []
+        for case in cases:
+            result = results[case.name] = run_case(case, max(1, args.repeat))
+            base = baseline.get(case.name)
+            print(describe(case, result, base))
+            sys.stdout.flush()
+            if base and not args.save:
+                worse = regressions(result, base, args.threshold)
+                if worse:
+                    failed.append("{}: {}".format(case.name, ", ".join(worse)))
+    finally:
+        shutil.rmtree(directory, ignore_errors=True)
+
+    if args.save:
+        baseline.update(results)
+        save_baseline(args.baseline, baseline)
+        sys.stderr.write("Saved {} cases to {}\n".format(len(results), args.baseline))
+        return 0
+    if not baseline:
+        sys.stderr.write("No baseline in {}; run with --save to record one\n".format(args.baseline))
+    for line in failed:
+        sys.stderr.write("REGRESSION {}\n".format(line))
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
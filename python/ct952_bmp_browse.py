@@ -1,34 +1,90 @@
-#!/usr/bin/env python2.7
+#!/usr/bin/env python
 # -*- coding: utf-8 -*-
 """
 Digital Picture Frame Bitmap Browser
 Browses and displays bitmap files from ct952-dmp-121 project
-Compatible with Python 2.7
+Compatible with Python 2.7 and 3
+
+The parsers and decoders it drives are GUI-free modules (see ct952_core);
+Tk is only imported when a browser window is created.
 """
 
+import argparse
 import os
 import sys
 import re
 import struct
 import math
-from PIL import Image, ImageTk
-import Tkinter as tk
-import tkFileDialog
-import tkMessageBox
-from itertools import product
+from PIL import Image
+
+import ct952_decode
+import ct952_detect
+import ct952_fwbitmap
+import ct952_hexparse
+import ct952_mpeg
+import ct952_palette
+import ct952_render
+import ct952_romscan
+import ct952_romsect
+import ct952_timing
+
+def import_tk():
+    """Import Tkinter on first use, so the headless render command never loads it"""
+    global tk, tkFileDialog, tkMessageBox, ct952_canvas, ct952_gallery, ct952_worker
+    try:
+        import Tkinter as tk
+        import tkFileDialog
+        import tkMessageBox
+    except ImportError:
+        import tkinter as tk
+        import tkinter.filedialog as tkFileDialog
+        import tkinter.messagebox as tkMessageBox
+    import ct952_canvas
+    import ct952_gallery
+    import ct952_worker
+
+# Ranked widths offered by Auto-detect
+DETECT_CANDIDATES = 10
 
 class BitmapBrowser(object):
-    def __init__(self):
+    def __init__(self, yuv=False, timing_log=None, profiler=None):
+        """
+        yuv: open with 24-bit YUV as the format, and auto-detect 24-bit data as YUV.
+        timing_log (ct952_timing.TimingLog) receives the stage timings of every
+        load and render; profiler (ct952_timing.Profiler) profiles each render.
+        """
+        import_tk()
+        self.yuv = yuv
+        self.timing_log = timing_log
+        self.profiler = profiler
+        self.load_timings = None
+        self.profile_session = None
         self.root = tk.Tk()
         self.root.title("Digital Picture Frame Bitmap Browser")
         self.root.geometry("800x600")
         
         self.current_data = None
         self.current_filename = ""
-        self.image_label = None
+        self.current_bitmap = None
+        self.showing_logo = False
+        self.current_palette = None
+        self.current_image = None
+        self.render_key = None
+        self.candidates = []
+        self.candidate_index = 0
         
         self.setup_ui()
         
+        # Re-render shortly after any setting is edited
+        self.render_worker = ct952_worker.RenderWorker(self.root)
+        # ROM scans run on their own, so renders and detection cannot supersede them
+        self.scan_worker = ct952_worker.RenderWorker(self.root)
+        self.rerender = ct952_worker.Debouncer(
+            self.root, lambda: self.render_bitmap(interactive=False))
+        for var in (self.width_var, self.height_var, self.offset_var,
+                    self.format_var, self.palette_start_var):
+            var.trace('w', self.rerender.trigger)
+        
     def setup_ui(self):
         """Setup the user interface"""
         # Main frame
@@ -43,9 +99,22 @@ class BitmapBrowser(object):
         tk.Button(control_frame, text="Open Bitmap File", 
                  command=self.open_file).pack(side=tk.LEFT, padx=(0, 5))
         
+        tk.Button(control_frame, text="Open Folder", 
+                 command=self.open_folder).pack(side=tk.LEFT, padx=(0, 5))
+        
+        tk.Button(control_frame, text="Open ROM", 
+                 command=self.open_rom).pack(side=tk.LEFT, padx=(0, 5))
+        
         self.filename_label = tk.Label(control_frame, text="No file selected")
         self.filename_label.pack(side=tk.LEFT, padx=(5, 0))
         
+        # Palette selection
+        tk.Button(control_frame, text="Load Palette", 
+                 command=self.open_palette).pack(side=tk.LEFT, padx=(20, 5))
+        
+        self.palette_label = tk.Label(control_frame, text="No palette")
+        self.palette_label.pack(side=tk.LEFT, padx=(5, 0))
+        
         # Format controls
         format_frame = tk.Frame(main_frame)
         format_frame.pack(fill=tk.X, pady=(0, 10))
@@ -58,22 +127,50 @@ class BitmapBrowser(object):
         self.height_var = tk.StringVar(value="240")
         tk.Entry(format_frame, textvariable=self.height_var, width=8).pack(side=tk.LEFT, padx=(5, 10))
         
+        tk.Label(format_frame, text="Offset:").pack(side=tk.LEFT)
+        self.offset_var = tk.StringVar(value="0")
+        tk.Entry(format_frame, textvariable=self.offset_var, width=8).pack(side=tk.LEFT, padx=(5, 10))
+        
         tk.Label(format_frame, text="Format:").pack(side=tk.LEFT)
-        self.format_var = tk.StringVar(value="8-bit grayscale")
+        self.format_var = tk.StringVar(
+            value=ct952_decode.FORMAT_YUV24 if self.yuv else "8-bit grayscale")
         format_menu = tk.OptionMenu(format_frame, self.format_var, 
                                    "1-bit monochrome", "8-bit grayscale", 
-                                   "16-bit RGB565", "24-bit RGB")
+                                   "16-bit RGB565", "24-bit RGB",
+                                   ct952_decode.FORMAT_YUV24,
+                                   "2-bit indexed", "4-bit indexed",
+                                   "8-bit indexed")
         format_menu.pack(side=tk.LEFT, padx=(5, 10))
         
+        tk.Label(format_frame, text="Pal start:").pack(side=tk.LEFT)
+        self.palette_start_var = tk.StringVar(
+            value=str(ct952_palette.GDI_BITMAP_PALETTE_INDEX_START))
+        tk.Entry(format_frame, textvariable=self.palette_start_var, width=4).pack(side=tk.LEFT, padx=(5, 10))
+        
         tk.Button(format_frame, text="Render", 
                  command=self.render_bitmap).pack(side=tk.LEFT, padx=(10, 0))
         
         tk.Button(format_frame, text="Auto-detect", 
                  command=self.auto_detect).pack(side=tk.LEFT, padx=(5, 0))
+        tk.Button(format_frame, text="<", 
+                 command=lambda: self.select_candidate(self.candidate_index - 1)).pack(side=tk.LEFT)
+        tk.Button(format_frame, text=">", 
+                 command=lambda: self.select_candidate(self.candidate_index + 1)).pack(side=tk.LEFT)
+        self.candidate_label = tk.Label(format_frame, text="")
+        self.candidate_label.pack(side=tk.LEFT, padx=(5, 0))
+        
+        tk.Label(format_frame, text="Zoom:").pack(side=tk.LEFT, padx=(10, 0))
+        self.zoom_var = tk.StringVar(value=ct952_canvas.ZOOM_FIT)
+        tk.OptionMenu(format_frame, self.zoom_var, *ct952_canvas.ZOOM_CHOICES,
+                      command=self.set_zoom).pack(side=tk.LEFT, padx=(5, 0))
+        
+        tk.Button(format_frame, text="Save Image", 
+                 command=self.save_image).pack(side=tk.LEFT, padx=(10, 0))
         
         # Image display area
         self.image_frame = tk.Frame(main_frame, bg="white", relief=tk.SUNKEN, bd=2)
         self.image_frame.pack(fill=tk.BOTH, expand=True)
+        self.viewer = ct952_canvas.ImageCanvas(self.image_frame)
         
         # Status bar
         self.status_var = tk.StringVar(value="Ready")
@@ -85,234 +182,342 @@ class BitmapBrowser(object):
         """Open and parse a bitmap file"""
         filename = tkFileDialog.askopenfilename(
             title="Select bitmap file",
-            filetypes=[("Text files", "*.txt"), ("All files", "*.*")]
+            filetypes=[("Bitmap files", "*.txt *.bin"), ("Text files", "*.txt"), ("All files", "*.*")]
         )
         
+        if filename:
+            self.load_file(filename)
+            
+    def open_folder(self):
+        """Browse a whole asset directory as thumbnails"""
+        directory = tkFileDialog.askdirectory(title="Select bitmap folder")
+        if directory:
+            ct952_gallery.ThumbnailGallery(self.root, directory, self.load_file)
+            
+    def load_file(self, filename):
+        """Load a bitmap file and render it"""
         if filename:
             try:
-                self.current_data = self.parse_hex_file(filename)
-                self.current_filename = os.path.basename(filename)
-                self.filename_label.config(text=self.current_filename)
-                self.status_var.set("Loaded {} bytes from {}".format(
-                    len(self.current_data), self.current_filename))
-                
-                # Try to auto-detect format
-                self.auto_detect()
-                
+                name = os.path.basename(filename)
+                timings = ct952_timing.Timings("load {}".format(name))
+                with timings.stage("load", os.path.getsize(filename)):
+                    data, bitmap = ct952_fwbitmap.load_file(filename)
+                if bitmap is None and ct952_mpeg.logo_kind(data) is not None:
+                    try:
+                        self.show_logo(data, name, timings)
+                        return
+                    except ValueError:
+                        # Only looked like a logo header: show the raw data instead
+                        del timings.stages[1:]
+                # The next render reports the load with its own stages
+                self.load_timings = timings
+                self.show_data(data, bitmap, name)
             except Exception as e:
                 tkMessageBox.showerror("Error", "Failed to load file: {}".format(str(e)))
                 
-    def parse_hex_file(self, filename):
-        """Parse hexadecimal data from file"""
-        with open(filename, 'r') as f:
-            content = f.read()
+    def show_logo(self, data, name, timings=None):
+        """
+        Decode a boot logo (MPEG or JPEG) and show it as it is, without a
+        palette. Edits to the settings do not re-render it as raw pixels;
+        the Render button does.
+        """
+        with ct952_timing.stage(timings, "decode", len(data)) as counts:
+            image = ct952_mpeg.decode_logo(data)
+            counts.pixels = image.size[0] * image.size[1]
+        self.current_data, self.current_bitmap = data, None
+        self.showing_logo = True
+        self.current_filename = name
+        self.filename_label.config(text=self.current_filename)
+        self.display_timed(timings, image)
+        summary = self.finish_timings(timings)
+        self.status_var.set("Decoded {}x{} {} logo from {}{}".format(
+            image.size[0], image.size[1], ct952_mpeg.LOGO_KINDS[ct952_mpeg.logo_kind(data)], name,
+            ": " + summary if summary else ""))
+        
+    def show_data(self, data, bitmap, name):
+        """Make data the current bitmap and render it"""
+        self.current_data, self.current_bitmap = data, bitmap
+        self.showing_logo = False
+        if self.current_bitmap is not None:
+            # Firmware bitmap: render the pixel words, not the header
+            self.current_data = self.current_bitmap.payload
+        self.current_filename = name
+        self.filename_label.config(text=self.current_filename)
+        self.status_var.set("Loaded {} bytes from {}".format(
+            len(self.current_data), self.current_filename))
+        
+        # Try to auto-detect format
+        self.auto_detect()
+        
+    def open_rom(self):
+        """List the sections of a ROM or flash image and scan it for bitmaps and palettes"""
+        filename = tkFileDialog.askopenfilename(
+            title="Select ROM image",
+            filetypes=[("ROM images", "*.rom *.AP *.tsim *.bin"), ("All files", "*.*")]
+        )
         
-        # Extract hex values using regex
-        hex_pattern = r'0x([0-9A-Fa-f]{2})'
-        hex_matches = re.findall(hex_pattern, content)
+        if filename:
+            self.status_var.set("Scanning {}...".format(os.path.basename(filename)))
+            self.scan_worker.submit(lambda: (ct952_romsect.read_sections(filename),
+                                             ct952_romscan.scan_file(filename)),
+                                    lambda result: self.show_rom_hits(filename, *result),
+                                    lambda e: self.scan_failed(filename, e))
+            
+    def scan_failed(self, filename, error):
+        self.status_var.set("Failed to scan {}".format(os.path.basename(filename)))
+        tkMessageBox.showerror("Error", "Failed to scan image: {}".format(str(error)))
+            
+    def show_rom_hits(self, filename, sections, hits):
+        """List the sections, then the scanner hits; selecting one loads it"""
+        name = os.path.basename(filename)
+        self.status_var.set("Found {} sections and {} bitmaps and palettes in {}".format(
+            len(sections), len(hits), name))
+        
+        window = tk.Toplevel(self.root)
+        window.title("{} ({} sections, {} hits)".format(name, len(sections), len(hits)))
+        scrollbar = tk.Scrollbar(window, orient=tk.VERTICAL)
+        scrollbar.pack(side=tk.RIGHT, fill=tk.Y)
+        listbox = tk.Listbox(window, width=60, height=25, font="TkFixedFont",
+                             yscrollcommand=scrollbar.set)
+        listbox.pack(side=tk.LEFT, fill=tk.BOTH, expand=True)
+        scrollbar.config(command=listbox.yview)
+        for path, description in sections:
+            listbox.insert(tk.END, description)
+        for hit in hits:
+            listbox.insert(tk.END, ct952_romscan.describe(hit))
+        
+        def on_select(event):
+            selection = listbox.curselection()
+            if not selection:
+                return
+            index = int(selection[0])
+            if index < len(sections):
+                self.load_rom_section(filename, sections[index][0])
+            else:
+                self.load_rom_hit(filename, hits[index - len(sections)])
+        listbox.bind("<<ListboxSelect>>", on_select)
         
-        if not hex_matches:
-            raise ValueError("No hexadecimal data found in file")
+    def load_rom_hit(self, filename, hit):
+        """Show one scanner hit: bitmaps render, palettes become the current palette"""
+        try:
+            loaded = ct952_romscan.load_hit(filename, hit)
+            if hit.kind == ct952_romscan.PALETTE:
+                self.set_palette(loaded)
+            else:
+                data, bitmap = loaded
+                self.show_data(data, bitmap, "{}@{:#x}".format(os.path.basename(filename), hit.offset))
+        except Exception as e:
+            tkMessageBox.showerror("Error", "Failed to load {}: {}".format(
+                ct952_romscan.describe(hit), str(e)))
+                
+    def load_rom_section(self, filename, path):
+        """Show a whole section (RODA, Engl...) as raw data, unzipped if needed"""
+        try:
+            data = ct952_romsect.load_section(filename, path)
+            self.show_data(data, None, "{}:{}".format(os.path.basename(filename), path))
+        except Exception as e:
+            tkMessageBox.showerror("Error", "Failed to load section {}: {}".format(path, str(e)))
+                
+    def open_palette(self):
+        """Open a firmware palette table (BMP/pal*.txt)"""
+        filename = tkFileDialog.askopenfilename(
+            title="Select palette file",
+            filetypes=[("Text files", "*.txt"), ("All files", "*.*")]
+        )
         
-        # Convert to bytes
-        data = bytearray()
-        for hex_str in hex_matches:
-            data.append(int(hex_str, 16))
-            
-        return data
+        if filename:
+            try:
+                self.set_palette(ct952_palette.load_palette(filename))
+            except Exception as e:
+                tkMessageBox.showerror("Error", "Failed to load palette: {}".format(str(e)))
+    
+    def set_palette(self, palette):
+        """Use palette for indexed formats and re-render"""
+        self.current_palette = palette
+        self.palette_start_var.set(str(self.current_palette.start))
+        self.palette_label.config(text="{} ({} entries)".format(
+            self.current_palette.name, len(self.current_palette)))
+        
+        if self.current_data and self.format_var.get() in ct952_decode.INDEXED_FORMATS.values():
+            self.render_bitmap()
+    
+    def palette_lut(self):
+        """RGB lookup table of the current palette at the chosen start index"""
+        if self.current_palette is None:
+            return None
+        return self.current_palette.lut(int(self.palette_start_var.get()))
+    
+    def parse_hex_file(self, filename):
+        """Parse hexadecimal data from file"""
+        return ct952_hexparse.parse_hex_file(filename)
     
     def auto_detect(self):
         """Attempt to auto-detect bitmap dimensions and format"""
         if not self.current_data:
             return
             
-        data_len = len(self.current_data)
-        self.status_var.set("Auto-detecting format for {} bytes...".format(data_len))
-        
-        # Common digital picture frame resolutions
-        common_resolutions = [
-            (320, 240), (480, 272), (800, 480), (1024, 600),
-            (640, 480), (480, 320), (272, 480), (240, 320)
-        ]
-        
-        # Try different bit depths
-        bit_depths = [1, 8, 16, 24]
-        
-        best_match = None
-        best_score = float('inf')
-        
-        for (width, height), bits in product(common_resolutions, bit_depths):
-            expected_bytes = (width * height * bits) // 8
-            score = abs(expected_bytes - data_len)
-            
-            if score < best_score:
-                best_score = score
-                best_match = (width, height, bits)
-        
-        if best_match:
-            width, height, bits = best_match
-            self.width_var.set(str(width))
-            self.height_var.set(str(height))
-            
-            if bits == 1:
-                self.format_var.set("1-bit monochrome")
-            elif bits == 8:
-                self.format_var.set("8-bit grayscale")
-            elif bits == 16:
-                self.format_var.set("16-bit RGB565")
-            else:
-                self.format_var.set("24-bit RGB")
-                
-            self.status_var.set("Auto-detected: {}x{} {}-bit (score: {})".format(
-                width, height, bits, best_score))
+        if self.current_bitmap is not None:
+            self.apply_bitmap_header(self.current_bitmap)
+            return
             
-            # Auto-render if it's a close match
-            if best_score < data_len * 0.1:  # Within 10%
-                self.render_bitmap()
+        data = self.current_data
+        self.status_var.set("Auto-detecting format for {} bytes...".format(len(data)))
+        self.render_worker.submit(lambda: ct952_detect.detect(data, DETECT_CANDIDATES),
+                                  self.show_candidates)
+        
+    def show_candidates(self, candidates):
+        """Take the ranked auto-detect results and show the best one"""
+        self.candidates = candidates
+        if not candidates:
+            self.candidate_label.config(text="")
+            self.status_var.set("Auto-detect found no likely width")
+            return
+        self.select_candidate(0)
+        
+    def select_candidate(self, index):
+        """Apply auto-detect candidate index (wrapping around) and render it"""
+        if not self.candidates:
+            return
+        self.candidate_index = index % len(self.candidates)
+        candidate = self.candidates[self.candidate_index]
+        format_type = ct952_detect.DEPTH_FORMATS[candidate.bits]
+        if candidate.bits == 24 and self.yuv:
+            format_type = ct952_decode.FORMAT_YUV24
+        self.width_var.set(str(candidate.width))
+        self.height_var.set(str(candidate.height))
+        self.offset_var.set(str(candidate.offset))
+        self.format_var.set(format_type)
+        self.candidate_label.config(text="{}/{}: {}x{} {}-bit @{} ({:.2f})".format(
+            self.candidate_index + 1, len(self.candidates), candidate.width,
+            candidate.height, candidate.bits, candidate.offset, candidate.score))
+        self.render_bitmap(interactive=False)
+    
+    def apply_bitmap_header(self, bitmap):
+        """Take width, height and depth straight from a firmware bitmap header"""
+        self.width_var.set(str(bitmap.width))
+        self.height_var.set(str(bitmap.height))
+        self.format_var.set(bitmap.format_type)
+        self.offset_var.set("0")
+        self.candidates = []
+        self.candidate_label.config(text="")
+        self.status_var.set("Firmware bitmap: {}x{} {}-bit".format(
+            bitmap.width, bitmap.height, bitmap.bits))
+        self.render_bitmap()
     
-    def render_bitmap(self):
-        """Render the bitmap with current settings"""
+    def render_bitmap(self, interactive=True):
+        """Render the bitmap with current settings on the render worker"""
         if not self.current_data:
-            tkMessageBox.showwarning("Warning", "No data loaded")
+            if interactive:
+                tkMessageBox.showwarning("Warning", "No data loaded")
             return
+        if self.showing_logo:
+            if not interactive:
+                return
+            self.showing_logo = False
             
         try:
             width = int(self.width_var.get())
             height = int(self.height_var.get())
+            offset = int(self.offset_var.get() or 0)
+            if offset < 0:
+                raise ValueError("Offset must not be negative")
             format_type = self.format_var.get()
+            palette = None
+            if format_type in ct952_decode.INDEXED_FORMATS.values():
+                palette = self.palette_lut()
+        except ValueError as e:
+            self.render_failed(e, interactive)
+            return
             
-            if format_type == "1-bit monochrome":
-                image = self.render_1bit(width, height)
-            elif format_type == "8-bit grayscale":
-                image = self.render_8bit_gray(width, height)
-            elif format_type == "16-bit RGB565":
-                image = self.render_16bit_rgb565(width, height)
-            elif format_type == "24-bit RGB":
-                image = self.render_24bit_rgb(width, height)
-            else:
-                raise ValueError("Unknown format: {}".format(format_type))
+        key = (id(self.current_data), width, height, offset, format_type, palette)
+        if not interactive and key == self.render_key:
+            return
+        self.render_key = key
+        
+        data = memoryview(self.current_data)[offset:]
+        background = self.viewer.background
+        pixels = width * height
+        timings = ct952_timing.Timings("render {} {}x{} {} @{}".format(
+            self.current_filename, width, height, format_type, offset))
+        if self.load_timings is not None:
+            timings.extend(self.load_timings)
+            self.load_timings = None
+        if self.profile_session is not None:
+            # Its render was superseded before it was shown
+            self.profile_session.abandon()
+        session = self.profile_session = self.profiler.session() if self.profiler else None
+        
+        def job():
+            with ct952_timing.profiling(session):
+                size = (pixels * ct952_decode.FORMAT_BITS[format_type] + 7) // 8
+                with timings.stage("decode", size, pixels):
+                    image = ct952_decode.decode(data, width, height, format_type, palette)
+                with timings.stage("flatten", pixels=pixels):
+                    flat = ct952_canvas.flatten(image, background)
+            return image, flat
             
-            self.display_image(image)
-            self.status_var.set("Rendered {}x{} {} image".format(width, height, format_type))
+        def done(result):
+            with ct952_timing.profiling(session):
+                self.display_timed(timings, *result)
+            self.profile_session = None
+            self.status_var.set("Rendered {}x{} {}: {}".format(
+                width, height, format_type, self.finish_timings(timings, session)))
             
-        except Exception as e:
-            tkMessageBox.showerror("Render Error", str(e))
+        def failed(error):
+            if session is not None:
+                session.abandon()
+            self.profile_session = None
+            self.render_failed(error, interactive)
             
-    def render_1bit(self, width, height):
-        """Render 1-bit monochrome bitmap"""
-        expected_bytes = (width * height + 7) // 8
-        if len(self.current_data) < expected_bytes:
-            raise ValueError("Not enough data for {}x{} 1-bit image".format(width, height))
-        
-        image = Image.new('L', (width, height))
-        pixels = []
-        
-        bit_index = 0
-        for y in range(height):
-            for x in range(width):
-                byte_index = bit_index // 8
-                bit_offset = bit_index % 8
-                
-                if byte_index < len(self.current_data):
-                    byte_val = self.current_data[byte_index]
-                    bit_val = (byte_val >> (7 - bit_offset)) & 1
-                    pixels.append(255 if bit_val else 0)
-                else:
-                    pixels.append(0)
-                    
-                bit_index += 1
-        
-        image.putdata(pixels)
-        return image
-    
-    def render_8bit_gray(self, width, height):
-        """Render 8-bit grayscale bitmap"""
-        expected_bytes = width * height
-        if len(self.current_data) < expected_bytes:
-            raise ValueError("Not enough data for {}x{} 8-bit image".format(width, height))
-        
-        image = Image.new('L', (width, height))
-        image.putdata(self.current_data[:expected_bytes])
-        return image
+        self.status_var.set("Rendering {}x{} {}...".format(width, height, format_type))
+        self.render_worker.submit(job, done, failed)
+        
+    def render_failed(self, error, interactive):
+        """Report a render error; live re-renders only use the status bar"""
+        self.render_key = None
+        if interactive:
+            tkMessageBox.showerror("Render Error", str(error))
+        else:
+            self.status_var.set("Render error: {}".format(error))
+            
+    def display_image(self, image, flat=None):
+        """Display the rendered image; flat is its RGB version, if already made"""
+        self.current_image = image
+        self.viewer.show(image if flat is None else flat)
     
-    def render_16bit_rgb565(self, width, height):
-        """Render 16-bit RGB565 bitmap"""
-        expected_bytes = width * height * 2
-        if len(self.current_data) < expected_bytes:
-            raise ValueError("Not enough data for {}x{} 16-bit image".format(width, height))
-        
-        image = Image.new('RGB', (width, height))
-        pixels = []
-        
-        for i in range(0, min(expected_bytes, len(self.current_data)), 2):
-            if i + 1 < len(self.current_data):
-                # Little endian RGB565
-                low_byte = self.current_data[i]
-                high_byte = self.current_data[i + 1]
-                rgb565 = (high_byte << 8) | low_byte
-                
-                # Extract RGB components
-                r = ((rgb565 >> 11) & 0x1F) << 3
-                g = ((rgb565 >> 5) & 0x3F) << 2
-                b = (rgb565 & 0x1F) << 3
-                
-                pixels.append((r, g, b))
-            else:
-                pixels.append((0, 0, 0))
-        
-        image.putdata(pixels)
-        return image
+    def display_timed(self, timings, image, flat=None):
+        """display_image, with the view's compose and PhotoImage stages added to timings"""
+        self.viewer.timings = timings
+        try:
+            self.display_image(image, flat)
+        finally:
+            self.viewer.timings = None
     
-    def render_24bit_rgb(self, width, height):
-        """Render 24-bit RGB bitmap"""
-        expected_bytes = width * height * 3
-        if len(self.current_data) < expected_bytes:
-            raise ValueError("Not enough data for {}x{} 24-bit image".format(width, height))
-        
-        image = Image.new('RGB', (width, height))
-        pixels = []
-        
-        for i in range(0, min(expected_bytes, len(self.current_data)), 3):
-            if i + 2 < len(self.current_data):
-                r = self.current_data[i]
-                g = self.current_data[i + 1]
-                b = self.current_data[i + 2]
-                pixels.append((r, g, b))
-            else:
-                pixels.append((0, 0, 0))
-        
-        image.putdata(pixels)
-        return image
+    def finish_timings(self, timings, session=None):
+        """Log an operation's timings and close its profile; returns them as status text"""
+        if timings is None:
+            return ""
+        if self.timing_log is not None:
+            self.timing_log.write(timings)
+        text = timings.summary()
+        if session is not None:
+            try:
+                text += "; profile in {}".format(session.close(timings.label))
+            except (IOError, OSError) as e:
+                text += "; profile not saved: {}".format(e)
+        return text
     
-    def display_image(self, image):
-        """Display the rendered image"""
-        # Clear previous image
-        for widget in self.image_frame.winfo_children():
-            widget.destroy()
-        
-        # Scale image to fit display area if needed
-        display_image = image.copy()
-        max_width = 600
-        max_height = 400
-        
-        if image.width > max_width or image.height > max_height:
-            ratio = min(max_width / float(image.width), max_height / float(image.height))
-            new_size = (int(image.width * ratio), int(image.height * ratio))
-            display_image = image.resize(new_size, Image.NEAREST)
-        
-        # Convert to PhotoImage and display
-        photo = ImageTk.PhotoImage(display_image)
-        self.image_label = tk.Label(self.image_frame, image=photo)
-        self.image_label.image = photo  # Keep a reference
-        self.image_label.pack(expand=True)
-        
-        # Add save button
-        save_button = tk.Button(self.image_frame, text="Save Image", 
-                               command=lambda: self.save_image(image))
-        save_button.pack(pady=5)
+    def set_zoom(self, mode):
+        """Change the zoom of the image view"""
+        self.viewer.set_zoom(mode)
     
-    def save_image(self, image):
+    def save_image(self):
         """Save the rendered image"""
+        image = self.current_image
+        if image is None:
+            tkMessageBox.showwarning("Warning", "Nothing rendered yet")
+            return
+            
         filename = tkFileDialog.asksaveasfilename(
             title="Save image",
             defaultextension=".png",
@@ -330,27 +535,45 @@ class BitmapBrowser(object):
         """Start the application"""
         self.root.mainloop()
 
-def main():
-    """Main entry point"""
-    if len(sys.argv) > 1:
+def main(yuv=False):
+    """Main entry point; yuv starts the browser in its YUV flavour"""
+    if len(sys.argv) > 1 and sys.argv[1] == "render":
+        sys.exit(ct952_render.main(sys.argv[2:]))
+    
+    options = argparse.ArgumentParser(add_help=False)
+    options.add_argument('--timings')
+    options.add_argument('--profile')
+    args, rest = options.parse_known_args(sys.argv[1:])
+    
+    if rest:
         print("Digital Picture Frame Bitmap Browser")
-        print("Usage: python {} [bitmap_file.txt]".format(sys.argv[0]))
+        print("Usage: python {} [--timings FILE.jsonl] [--profile PREFIX]".format(sys.argv[0]))
+        print("       python {} render [options] FILE_OR_DIR...".format(sys.argv[0]))
         print("\nThis tool helps visualize bitmap data from the ct952-dmp-121 project.")
         print("It supports multiple formats commonly used in embedded systems:")
         print("- 1-bit monochrome")
         print("- 8-bit grayscale") 
         print("- 16-bit RGB565")
         print("- 24-bit RGB")
-        print("\nRequires: PIL/Pillow, Tkinter")
+        print("- {}".format(ct952_decode.FORMAT_YUV24))
+        print("\nThe render command writes PNGs and a JSON summary without the GUI;")
+        print("run \"python {} render --help\" for its options.".format(sys.argv[0]))
+        print("\n--timings appends the stage timings of every load and render as JSON lines;")
+        print("--profile runs each render under cProfile and tracemalloc and writes")
+        print("PREFIX-001.prof and PREFIX-001.txt, PREFIX-002... next to it.")
+        print("\nRequires: PIL/Pillow, NumPy, Tkinter (not needed for render)")
         return
     
     try:
-        app = BitmapBrowser()
+        app = BitmapBrowser(
+            yuv,
+            timing_log=ct952_timing.TimingLog(args.timings) if args.timings else None,
+            profiler=ct952_timing.Profiler(args.profile) if args.profile else None)
         app.run()
     except ImportError as e:
         print("Error: Missing required library")
-        print("Please install: pip install Pillow")
-        print("Tkinter should be included with Python 2.7")
+        print("Please install: pip install Pillow numpy")
+        print("Tkinter (tkinter on Python 3) should be included with Python")
         sys.exit(1)
     except Exception as e:
         print("Error starting application: {}".format(str(e)))
@@ -0,0 +1,394 @@
+"""
+Incremental asset build for the ct952-dmp-121 bitmaps and palettes (BMP/*.txt, .bin, PNG)
+Rebuilds only the outputs whose input contents or conversion parameters changed, in a process pool
+Compatible with Python 2.7
+
+A build file lists rules as JSON; sources may be glob patterns, one
+output per source is written to output_dir:
+
+    {"rules": [
+        {"kind": "palette", "sources": "art/clock/*.png", "output": "BMP/palNumber.txt",
+         "bits": 4, "start": 8},
+        {"kind": "encode", "sources": "art/clock/*.png", "output_dir": "BMP", "bits": 4,
+         "palette": "BMP/palNumber.txt"},
+        {"kind": "decode", "sources": "BMP/*.txt", "exclude": ["BMP/pal*"], "output_dir": "png"}
+    ]}
+
+An "extension" replaces the default .txt or .png of the outputs; encode
+rules with "extension": ".bin" write the bitmap's bytes instead of a C array.
+"""
+
+import argparse
+import fnmatch
+import glob
+import hashlib
+import io
+import json
+import multiprocessing
+import os
+import sys
+import tempfile
+import time
+
+import ct952_encode
+import ct952_fwbitmap
+import ct952_palette
+
+MANIFEST_VERSION = 1
+MANIFEST_SUFFIX = ".manifest.json"
+
+PALETTE = "palette"
+ENCODE = "encode"
+DECODE = "decode"
+
+# Parameters each kind takes, with their defaults; they are part of the rule's key
+RULE_PARAMETERS = {
+    PALETTE: {'bits': 8, 'start': None, 'count': None},
+    ENCODE: {'bits': 8, 'palette': None, 'palette_start': None, 'start': None, 'count': None,
+             'pad': False, 'keep_indices': False},
+    DECODE: {'palette': None, 'palette_start': None},
+}
+# Default extension of the outputs written to output_dir; encode also writes .bin
+OUTPUT_EXTENSIONS = {ENCODE: ".txt", DECODE: ".png"}
+
+
+class Rule(object):
+    """One output, the files it is made from and how"""
+
+    def __init__(self, kind, inputs, output, params):
+        self.kind = kind
+        self.inputs = inputs
+        self.output = output
+        self.params = params
+
+    def key(self, hashes):
+        """Hash of everything the output depends on: kind, parameters, input contents"""
+        description = [MANIFEST_VERSION, self.kind, sorted(self.params.items()),
+                       [(os.path.normcase(path), hashes[path]) for path in self.inputs]]
+        return hashlib.sha1(json.dumps(description).encode('utf-8')).hexdigest()
+
+    def __repr__(self):
+        return "Rule({}, {} -> {})".format(self.kind, ", ".join(self.inputs), self.output)
+
+
+def load_rules(filename):
+    """
+    Rules of a build file, with glob patterns expanded relative to its
+    directory. Patterns also match what earlier rules will output.
+    """
+    with open(filename) as f:
+        spec = json.load(f)
+    root = os.path.dirname(os.path.abspath(filename))
+
+    rules = []
+    for entry in spec.get('rules', []):
+        kind = entry.get('kind')
+        if kind not in RULE_PARAMETERS:
+            raise ValueError("{}: unknown rule kind {!r}".format(filename, kind))
+        params = dict(RULE_PARAMETERS[kind])
+        params.update((name, entry[name]) for name in params if name in entry)
+
+        sources = _expand(root, entry.get('sources', []), entry.get('exclude', []),
+                          [rule.output for rule in rules])
+        if not sources:
+            raise ValueError("{}: {} rule matches no sources".format(filename, kind))
+        palette = [_path(root, params['palette'])] if params.get('palette') else []
+
+        if kind == PALETTE:
+            rules.append(Rule(kind, sources, _path(root, entry['output']), params))
+            continue
+        for source in sources:
+            if 'output' in entry and len(sources) == 1:
+                output = _path(root, entry['output'])
+            else:
+                name = os.path.splitext(os.path.basename(source))[0]
+                output = os.path.join(_path(root, entry.get('output_dir', os.curdir)),
+                                      name + entry.get('extension', OUTPUT_EXTENSIONS[kind]))
+            inputs = [source] + palette
+            if kind == DECODE and not palette:
+                # The palette the firmware draws the bitmap with is an input too
+                found = ct952_palette.find_palette_file(source)
+                inputs += [found] if found else []
+            rules.append(Rule(kind, inputs, output, params))
+    return rules
+
+
+def _path(root, path):
+    return os.path.normpath(os.path.join(root, path))
+
+
+def _expand(root, patterns, excludes, planned):
+    if not isinstance(patterns, list):
+        patterns = [patterns]
+
+    def matches(pattern):
+        pattern = _path(root, pattern)
+        found = set(os.path.normpath(path) for path in glob.glob(pattern))
+        found.update(path for path in planned if fnmatch.fnmatch(path, pattern))
+        return sorted(found)
+
+    excluded = set()
+    for pattern in excludes:
+        excluded.update(matches(pattern))
+    paths = []
+    for pattern in patterns:
+        for path in matches(pattern):
+            if path not in excluded and path not in paths:
+                paths.append(path)
+    return paths
+
+
+class Manifest(object):
+    """
+    What the last build saw: content hashes of files, remembered by size
+    and mtime so unchanged files are not read again, and the key each
+    output was built from.
+    """
+
+    def __init__(self, filename):
+        self.filename = filename
+        self.files = {}
+        self.outputs = {}
+        try:
+            with open(filename) as f:
+                manifest = json.load(f)
+        except (IOError, OSError, ValueError):
+            return
+        if manifest.get('version') == MANIFEST_VERSION:
+            self.files = manifest.get('files', {})
+            self.outputs = manifest.get('outputs', {})
+
+    def hash(self, path):
+        """sha1 of a file's contents, or None if it does not exist"""
+        try:
+            stat = os.stat(path)
+        except OSError:
+            return None
+        known = self.files.get(path)
+        if known and known[0] == stat.st_size and known[1] == stat.st_mtime:
+            return known[2]
+        digest = file_hash(path)
+        self.files[path] = [stat.st_size, stat.st_mtime, digest]
+        return digest
+
+    def save(self):
+        manifest = {'version': MANIFEST_VERSION, 'files': self.files, 'outputs': self.outputs}
+        atomic_write(self.filename, json.dumps(manifest, sort_keys=True,
+                                               separators=(',', ':')).encode('utf-8'))
+
+
+def file_hash(path):
+    digest = hashlib.sha1()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def atomic_write(filename, data):
+    """
+    Write data to a temporary file next to filename and rename it into
+    place, so a failed or interrupted build never leaves half an output.
+    """
+    directory = os.path.dirname(filename) or os.curdir
+    if not os.path.isdir(directory):
+        os.makedirs(directory)
+    handle, temporary = tempfile.mkstemp(dir=directory, prefix=".tmp-")
+    try:
+        with os.fdopen(handle, 'wb') as f:
+            f.write(data)
+        try:
+            os.replace(temporary, filename)
+        except AttributeError:
+            # Python 2 has no os.replace, and rename will not replace on Windows
+            if os.name == 'nt' and os.path.exists(filename):
+                os.remove(filename)
+            os.rename(temporary, filename)
+    except BaseException:
+        if os.path.exists(temporary):
+            os.remove(temporary)
+        raise
+
+
+def build_palette(rule):
+    params = rule.params
+    images = [ct952_encode.load_rgba(path) for path in rule.inputs]
+    start = params['start']
+    if start is None:
+        start = ct952_encode.default_start(params['bits'])
+    palette = ct952_encode.make_palette(images, params['bits'], start, params['count'])
+    return ct952_encode.palette_to_c_array(palette).encode('ascii')
+
+
+def build_encode(rule):
+    params = rule.params
+    bits = params['bits']
+    source = rule.inputs[0]
+    if params['keep_indices']:
+        indices = ct952_encode.load_indices(source, bits, params['pad'])
+    else:
+        if not params['palette']:
+            raise ValueError("{}: encode rules need a palette unless they keep indices".format(source))
+        palette = ct952_palette.load_palette(rule.inputs[1], params['palette_start'])
+        indices = ct952_encode.quantize(ct952_encode.load_rgba(source, bits, params['pad']),
+                                        bits, palette, params['start'], params['count'])
+    data = ct952_encode.encode(indices, bits)
+    if os.path.splitext(rule.output)[1].lower() == '.bin':
+        return data
+    return ct952_encode.to_c_array(data).encode('ascii')
+
+
+def build_decode(rule):
+    data, bitmap = ct952_fwbitmap.load_file(rule.inputs[0])
+    if bitmap is None:
+        raise ValueError("{}: not a firmware bitmap".format(rule.inputs[0]))
+    lut = None
+    if len(rule.inputs) > 1:
+        lut = ct952_palette.load_palette(rule.inputs[1], rule.params['palette_start']).lut()
+    output = io.BytesIO()
+    bitmap.decode(lut).save(output, 'PNG')
+    return output.getvalue()
+
+
+BUILDERS = {PALETTE: build_palette, ENCODE: build_encode, DECODE: build_decode}
+
+
+def run_rule(rule):
+    """
+    Build one output; returns (output, error message or None). Runs in
+    pool workers, so errors are reported instead of raised.
+    """
+    try:
+        atomic_write(rule.output, BUILDERS[rule.kind](rule))
+    except Exception as e:
+        return rule.output, str(e) or type(e).__name__
+    return rule.output, None
+
+
+def is_current(rule, manifest, hashes):
+    """True if rule's output exists as it was last built, from the same key"""
+    built = manifest.outputs.get(rule.output)
+    return (built is not None and built.get('key') == rule.key(hashes)
+            and built.get('hash') == manifest.hash(rule.output))
+
+
+def stale_rules(rules, manifest, force=False):
+    """
+    Rules whose output is missing, changed since it was built, or built
+    from other inputs, or whose inputs another stale rule makes.
+    """
+    producers = dict((rule.output, rule) for rule in rules)
+    stale = []
+    for rule in rules:
+        hashes = dict((path, manifest.hash(path)) for path in rule.inputs)
+        if (force or any(producers.get(path) in stale for path in rule.inputs)
+                or not is_current(rule, manifest, hashes)):
+            stale.append(rule)
+    return stale
+
+
+def build(rules, manifest, processes=None, force=False, log=None):
+    """
+    Bring every output up to date. Rules run in waves: a rule waits for
+    the rules that make its inputs, and each wave runs in a process pool.
+    Rules whose inputs failed to build are not built from the old inputs.
+    Returns (built, skipped, failed) output lists.
+    """
+    producers = dict((rule.output, rule) for rule in rules)
+    pending = list(rules)
+    built = []
+    failed = []
+    skipped = []
+    pool = None
+    try:
+        while pending:
+            wave = [rule for rule in pending
+                    if not any(path in producers and producers[path] in pending
+                               for path in rule.inputs)]
+            if not wave:
+                raise ValueError("Rules depend on each other: {}".format(pending))
+            pending = [rule for rule in pending if rule not in wave]
+
+            todo = []
+            failed_outputs = set(output for output, error in failed)
+            for rule in wave:
+                broken = [path for path in rule.inputs if path in failed_outputs]
+                if broken:
+                    failed.append((rule.output, "{} failed to build".format(broken[0])))
+                    manifest.outputs.pop(rule.output, None)
+                    continue
+                hashes = dict((path, manifest.hash(path)) for path in rule.inputs)
+                if None in hashes.values():
+                    failed.append((rule.output, "missing input"))
+                    continue
+                if not force and is_current(rule, manifest, hashes):
+                    skipped.append(rule.output)
+                else:
+                    todo.append((rule, rule.key(hashes)))
+            if not todo:
+                continue
+
+            if len(todo) > 1 and processes != 1:
+                if pool is None:
+                    pool = multiprocessing.Pool(processes)
+                results = pool.map(run_rule, [rule for rule, key in todo])
+            else:
+                results = [run_rule(rule) for rule, key in todo]
+
+            for (rule, key), (output, error) in zip(todo, results):
+                if error is not None:
+                    manifest.outputs.pop(output, None)
+                    failed.append((output, error))
+                    continue
+                manifest.files.pop(output, None)
+                manifest.outputs[output] = {'key': key, 'hash': manifest.hash(output)}
+                built.append(output)
+                if log is not None:
+                    log("built {}".format(output))
+    finally:
+        if pool is not None:
+            pool.close()
+            pool.join()
+    return built, skipped, failed
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Build bitmaps, palettes and previews from a JSON rule file, "
+                    "redoing only what changed since the last build.")
+    parser.add_argument('build_file', help="JSON rule file")
+    parser.add_argument('-m', '--manifest',
+                        help="build manifest (default: the build file + {})".format(MANIFEST_SUFFIX))
+    parser.add_argument('-j', '--jobs', type=int, help="worker processes (default: one per CPU)")
+    parser.add_argument('-B', '--force', action='store_true', help="rebuild everything")
+    parser.add_argument('-n', '--dry-run', action='store_true', help="list what would be built")
+    args = parser.parse_args(argv)
+
+    start = time.time()
+    try:
+        rules = load_rules(args.build_file)
+    except (IOError, OSError, ValueError) as e:
+        sys.stderr.write("{}\n".format(e))
+        return 1
+    manifest = Manifest(args.manifest or args.build_file + MANIFEST_SUFFIX)
+
+    if args.dry_run:
+        for rule in stale_rules(rules, manifest, args.force):
+            print(rule.output)
+        return 0
+
+    try:
+        built, skipped, failed = build(rules, manifest, args.jobs, args.force,
+                                       lambda message: sys.stdout.write(message + "\n"))
+    finally:
+        # Keep what earlier waves built even if a later one blew up
+        manifest.save()
+    for output, error in failed:
+        sys.stderr.write("{}: {}\n".format(output, error))
+    sys.stderr.write("{} built, {} up to date, {} failed in {:.2f} s\n".format(
+        len(built), len(skipped), len(failed), time.time() - start))
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
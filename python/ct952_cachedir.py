@@ -0,0 +1,44 @@
+"""
+Per-user cache directory for the ct952-dmp-121 indexes and result caches
+Keeps generated files such as the ROM and symbol indexes out of the source tree
+Compatible with Python 2.7
+"""
+
+import hashlib
+import os
+
+# Overrides the cache directory, e.g. to share one between checkouts
+CACHE_ENV = 'CT952_CACHE_DIR'
+CACHE_NAME = 'ct952-dmp-121'
+
+
+def cache_dir():
+    """The cache directory, created on first use"""
+    directory = os.environ.get(CACHE_ENV)
+    if not directory:
+        if os.name == 'nt':
+            base = os.environ.get('LOCALAPPDATA') or os.path.expanduser('~')
+        else:
+            base = os.environ.get('XDG_CACHE_HOME') or os.path.join(os.path.expanduser('~'), '.cache')
+        directory = os.path.join(base, CACHE_NAME)
+    if not os.path.isdir(directory):
+        try:
+            os.makedirs(directory)
+        except OSError:
+            pass        # created meanwhile, or unwritable: writing the cache fails quietly
+    return directory
+
+
+def cache_path(name):
+    """A cache file called name"""
+    return os.path.join(cache_dir(), name)
+
+
+def index_path(filename, suffix):
+    """
+    The cache file for filename: its base name and suffix, with a hash of
+    its absolute path so that files of the same name do not share one.
+    """
+    path = os.path.normcase(os.path.abspath(filename))
+    digest = hashlib.sha1(path.encode('utf-8')).hexdigest()[:12]
+    return cache_path("{}-{}{}".format(os.path.basename(filename), digest, suffix))
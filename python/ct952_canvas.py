@@ -0,0 +1,165 @@
+"""
+Persistent image view for the ct952-dmp-121 bitmap browser
+One canvas and one PhotoImage, updated in place; zoom and pan only touch the viewport
+Compatible with Python 2.7
+"""
+
+try:
+    import Tkinter as tk
+except ImportError:
+    import tkinter as tk
+
+from PIL import Image, ImageTk
+
+import ct952_timing
+
+ZOOM_FIT = "Fit"
+ZOOM_LEVELS = (1, 2, 4, 8, 16)
+ZOOM_CHOICES = (ZOOM_FIT,) + tuple("{}x".format(zoom) for zoom in ZOOM_LEVELS)
+
+
+def flatten(image, background):
+    """Convert any decoded image to RGB, drawing transparent pixels as background"""
+    if image.mode == 'RGB':
+        return image
+    if image.mode == 'P' and 'transparency' in image.info:
+        image = image.convert('RGBA')
+    if image.mode in ('RGBA', 'LA'):
+        flat = Image.new('RGB', image.size, background)
+        flat.paste(image, mask=image.split()[-1])
+        return flat
+    return image.convert('RGB')
+
+
+def halve(image):
+    """The next level of the Fit pyramid: image reduced by 2 with a box filter"""
+    size = (max(1, image.width // 2), max(1, image.height // 2))
+    return image.resize(size, Image.BOX)
+
+
+class ImageCanvas(object):
+    """
+    Shows one image in a canvas. "Fit" draws the largest power of two
+    reduction that fits, from a pyramid built once per image; the integer
+    zooms enlarge only the visible part. Drag with the mouse to pan.
+    """
+
+    def __init__(self, master, background=(255, 255, 255)):
+        self.background = background
+        self.canvas = tk.Canvas(master, bg="#{:02x}{:02x}{:02x}".format(*background),
+                                highlightthickness=0)
+        self.canvas.pack(fill=tk.BOTH, expand=True)
+
+        self.pyramid = []           # full size RGB image, then halvings, built on demand
+        self.zoom_mode = ZOOM_FIT
+        self.center = (0.0, 0.0)    # view centre, in full size image pixels
+        self.photo = None
+        self.photo_item = None
+        self._drag = None
+        self.timings = None         # ct952_timing.Timings for the redraws of one render
+
+        self.canvas.bind("<Configure>", lambda event: self.redraw())
+        self.canvas.bind("<ButtonPress-1>", self.on_press)
+        self.canvas.bind("<B1-Motion>", self.on_drag)
+
+    def show(self, image):
+        """Display a new image, keeping zoom and pan if its size is unchanged"""
+        image = flatten(image, self.background)
+        if not self.pyramid or self.pyramid[0].size != image.size:
+            self.center = (image.width / 2.0, image.height / 2.0)
+        self.pyramid = [image]
+        self.redraw()
+
+    def clear(self):
+        self.pyramid = []
+        self.redraw()
+
+    def set_zoom(self, mode):
+        """Switch to ZOOM_FIT or one of the "Nx" ZOOM_CHOICES"""
+        self.zoom_mode = mode
+        self.redraw()
+
+    def level(self, k):
+        """The image reduced by 2 ** k"""
+        while len(self.pyramid) <= k:
+            self.pyramid.append(halve(self.pyramid[-1]))
+        return self.pyramid[k]
+
+    def scale(self, view_width, view_height):
+        """Return (pyramid level, integer zoom) for the current mode"""
+        if self.zoom_mode != ZOOM_FIT:
+            return 0, int(self.zoom_mode.rstrip('x'))
+
+        width, height = self.pyramid[0].size
+        k = 0
+        while (width > view_width or height > view_height) and width > 1 and height > 1:
+            width //= 2
+            height //= 2
+            k += 1
+        return k, 1
+
+    def redraw(self):
+        view_width = self.canvas.winfo_width()
+        view_height = self.canvas.winfo_height()
+        if view_width < 2 or view_height < 2:
+            return
+
+        pixels = view_width * view_height
+        with ct952_timing.stage(self.timings, "compose", pixels=pixels):
+            frame = Image.new('RGB', (view_width, view_height), self.background)
+            if self.pyramid:
+                self._compose(frame)
+
+        with ct952_timing.stage(self.timings, "photoimage", pixels=pixels):
+            if self.photo is None or (self.photo.width(), self.photo.height()) != frame.size:
+                # Only a resized window needs a new PhotoImage
+                self.photo = ImageTk.PhotoImage('RGB', frame.size)
+                if self.photo_item is None:
+                    self.photo_item = self.canvas.create_image(0, 0, anchor=tk.NW)
+                self.canvas.itemconfig(self.photo_item, image=self.photo)
+            self.photo.paste(frame)
+
+    def _compose(self, frame):
+        """Paste the visible part of the current level, zoomed, into frame"""
+        view_width, view_height = frame.size
+        k, zoom = self.scale(view_width, view_height)
+        source = self.level(k)
+        factor = float(1 << k)
+
+        origin = []
+        for axis, view, size in ((0, view_width, source.width), (1, view_height, source.height)):
+            shown = size * zoom
+            if shown <= view:
+                offset = (view - shown) // 2
+            else:
+                offset = int(round(view / 2.0 - self.center[axis] / factor * zoom))
+                offset = min(0, max(view - shown, offset))
+            origin.append(offset)
+
+        # Store the clamped centre so a drag never runs past the edge
+        self.center = tuple((view / 2.0 - offset) / zoom * factor
+                            for view, offset in zip(frame.size, origin))
+
+        left = max(0, -origin[0] // zoom)
+        top = max(0, -origin[1] // zoom)
+        right = min(source.width, -(-(view_width - origin[0]) // zoom))
+        bottom = min(source.height, -(-(view_height - origin[1]) // zoom))
+        if right <= left or bottom <= top:
+            return
+
+        visible = source.crop((left, top, right, bottom))
+        if zoom > 1:
+            visible = visible.resize(((right - left) * zoom, (bottom - top) * zoom), Image.NEAREST)
+        frame.paste(visible, (origin[0] + left * zoom, origin[1] + top * zoom))
+
+    def on_press(self, event):
+        self._drag = (event.x, event.y, self.center)
+
+    def on_drag(self, event):
+        if self._drag is None or not self.pyramid:
+            return
+        x, y, center = self._drag
+        k, zoom = self.scale(self.canvas.winfo_width(), self.canvas.winfo_height())
+        step = float(1 << k) / zoom
+        self.center = (center[0] - (event.x - x) * step, center[1] - (event.y - y) * step)
+        self.redraw()
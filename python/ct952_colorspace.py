@@ -0,0 +1,159 @@
+"""
+BT.601 colour conversion shared by the ct952-dmp-121 tools
+Lookup tables are built once on first use and applied to whole arrays
+Compatible with Python 2.7
+"""
+
+import numpy as np
+
+# Colour ranges
+FULL_RANGE = "full"        # JPEG style, Y/U/V 0..255 (BitmapBrowser, paltetris scripts)
+STUDIO_RANGE = "studio"    # Y 16..235, U/V 16..240 (OSD palette entries)
+DEVICE = "device"          # COMUTL_RGB2YUV integer path, bit exact with the firmware
+
+RANGES = (FULL_RANGE, STUDIO_RANGE, DEVICE)
+
+# COMUTL_RGB2YUV coefficients, scaled by 256000 (comutl.c, NO_FLOAT_POINT)
+COMUTL_SCALE = 256000
+COMUTL_MATRIX = np.array([[65738, 129057, 25064],
+                          [-37945, -74494, 112439],
+                          [112439, -94154, -18285]], dtype=np.int64)
+# 128 * 256000: comutl.c adds the chroma offset before dividing, so negative
+# sums round down instead of towards zero as "128 + sum / 256000" would
+COMUTL_CHROMA_OFFSET = 32768000
+
+# Full range RGB -> YUV (BT.601 / JFIF)
+FULL_MATRIX = np.array([[0.299, 0.587, 0.114],
+                        [-0.168736, -0.331264, 0.5],
+                        [0.5, -0.418688, -0.081312]])
+
+_TABLES = {}
+
+
+def _table(name, builder):
+    """Return a cached lookup table, building it on first use"""
+    table = _TABLES.get(name)
+    if table is None:
+        table = _TABLES[name] = builder()
+    return table
+
+
+def unpack(values):
+    """Split packed 0x00AABBCC values into an (..., 3) uint8 array"""
+    values = np.asarray(values, dtype=np.uint32)
+    out = np.empty(values.shape + (3,), dtype=np.uint8)
+    out[..., 0] = values >> 16
+    out[..., 1] = values >> 8
+    out[..., 2] = values
+    return out
+
+
+def pack(components):
+    """Pack an (..., 3) array into 0x00AABBCC uint32 values"""
+    components = np.asarray(components, dtype=np.uint32)
+    return (components[..., 0] << 16) | (components[..., 1] << 8) | components[..., 2]
+
+
+def yuv_to_rgb(yuv, color_range=FULL_RANGE):
+    """
+    Convert an (..., 3) uint8 Y, U, V array to RGB.
+    FULL_RANGE reproduces the original float formula exactly:
+    R = Y + 1.402 (V-128), G = Y - 0.344136 (U-128) - 0.714136 (V-128),
+    B = Y + 1.772 (U-128), truncated and clamped like int().
+    STUDIO_RANGE (or DEVICE) inverts COMUTL_RGB2YUV, rounded.
+    """
+    yuv = np.asarray(yuv, dtype=np.uint8)
+    Y = yuv[..., 0]
+    U = yuv[..., 1]
+    V = yuv[..., 2]
+    y_hi = Y.astype(np.uint16) << 8
+
+    rgb = np.empty(yuv.shape, dtype=np.uint8)
+    if color_range == FULL_RANGE:
+        r_lut, b_lut, g_u, g_v = _table(FULL_RANGE + "_yuv2rgb", _full_yuv2rgb_tables)
+        rgb[..., 0] = r_lut[y_hi | V]
+        rgb[..., 2] = b_lut[y_hi | U]
+        # Keep the scalar operation order (Y - u term - v term) so the
+        # float64 rounding, and therefore every pixel, is unchanged
+        green = Y.astype(np.float64)
+        green -= g_u[U]
+        green -= g_v[V]
+    elif color_range in (STUDIO_RANGE, DEVICE):
+        r_lut, b_lut, g_y, g_uv = _table(STUDIO_RANGE + "_yuv2rgb", _studio_yuv2rgb_tables)
+        rgb[..., 0] = r_lut[y_hi | V]
+        rgb[..., 2] = b_lut[y_hi | U]
+        green = g_y[Y] + g_uv[(U.astype(np.uint16) << 8) | V]
+        np.rint(green, out=green)
+    else:
+        raise ValueError("Unknown colour range: {}".format(color_range))
+
+    np.clip(green, 0, 255, out=green)
+    rgb[..., 1] = green
+    return rgb
+
+
+def rgb_to_yuv(rgb, color_range=DEVICE):
+    """
+    Convert an (..., 3) uint8 R, G, B array to Y, U, V.
+    DEVICE is the integer COMUTL_RGB2YUV the firmware uses for palette
+    entries, bit for bit. STUDIO_RANGE is the same matrix rounded to
+    nearest; FULL_RANGE is JFIF BT.601, rounded.
+    """
+    rgb = np.asarray(rgb, dtype=np.uint8)
+    if color_range not in RANGES:
+        raise ValueError("Unknown colour range: {}".format(color_range))
+
+    products = _table(color_range + "_rgb2yuv", lambda: _rgb2yuv_tables(color_range))
+    # products[c][k] holds the term channel k contributes to component c
+    sums = [products[c][0][rgb[..., 0]] + products[c][1][rgb[..., 1]] + products[c][2][rgb[..., 2]]
+            for c in range(3)]
+
+    yuv = np.empty(rgb.shape, dtype=np.uint8)
+    if color_range == DEVICE:
+        yuv[..., 0] = 16 + sums[0] // COMUTL_SCALE
+        yuv[..., 1] = (COMUTL_CHROMA_OFFSET + sums[1]) // COMUTL_SCALE
+        yuv[..., 2] = (COMUTL_CHROMA_OFFSET + sums[2]) // COMUTL_SCALE
+    else:
+        offsets = (16, 128, 128) if color_range == STUDIO_RANGE else (0, 128, 128)
+        for c in range(3):
+            # Products are fixed point with 16 fractional bits
+            yuv[..., c] = np.clip(((sums[c] + 32768) >> 16) + offsets[c], 0, 255)
+    return yuv
+
+
+def comutl_rgb2yuv(values):
+    """COMUTL_RGB2YUV on packed 0x00RRGGBB values, returning packed 0x00YYUUVV"""
+    return pack(rgb_to_yuv(unpack(values), DEVICE))
+
+
+def _full_yuv2rgb_tables():
+    Y = np.arange(256, dtype=np.float64)[:, None]
+    C = np.arange(256, dtype=np.float64) - 128
+    r_lut = np.clip(np.trunc(Y + 1.402 * C), 0, 255).astype(np.uint8).ravel()
+    b_lut = np.clip(np.trunc(Y + 1.772 * C), 0, 255).astype(np.uint8).ravel()
+    return r_lut, b_lut, 0.344136 * C, 0.714136 * C
+
+
+def _studio_yuv2rgb_tables():
+    inverse = np.linalg.inv(COMUTL_MATRIX / float(COMUTL_SCALE))
+    Y = (np.arange(256, dtype=np.float64) - 16)[:, None]
+    C = np.arange(256, dtype=np.float64) - 128
+    r_lut = np.clip(np.rint(inverse[0, 0] * Y + inverse[0, 2] * C), 0, 255).astype(np.uint8).ravel()
+    b_lut = np.clip(np.rint(inverse[2, 0] * Y + inverse[2, 1] * C), 0, 255).astype(np.uint8).ravel()
+    g_y = inverse[1, 0] * Y.ravel()
+    g_uv = (inverse[1, 1] * C[:, None] + inverse[1, 2] * C[None, :]).ravel()
+    return r_lut, b_lut, g_y, g_uv
+
+
+def _rgb2yuv_tables(color_range):
+    levels = np.arange(256, dtype=np.int64)
+    if color_range == DEVICE:
+        matrix = COMUTL_MATRIX
+        return [[matrix[c, k] * levels for k in range(3)] for c in range(3)]
+
+    if color_range == STUDIO_RANGE:
+        matrix = COMUTL_MATRIX / float(COMUTL_SCALE)
+    else:
+        matrix = FULL_MATRIX
+    fixed = np.rint(matrix * 65536).astype(np.int64)
+    return [[fixed[c, k] * levels for k in range(3)] for c in range(3)]
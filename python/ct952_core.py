@@ -0,0 +1,129 @@
+"""
+GUI-free entry point to the ct952-dmp-121 parsers, decoders, colour conversion and palettes
+Every function imports its module on first call, so importing this one loads neither NumPy, PIL nor Tk
+Compatible with Python 2.7
+
+    import ct952_core
+    data, bitmap = ct952_core.load_file("BMP/Menu_Photo.txt")
+    image = ct952_core.decode(bitmap.payload, bitmap.width, bitmap.height, bitmap.format_type, lut)
+
+Run it to measure a cold import in a fresh interpreter, and the first
+decode and parse through it, which load the real modules.
+"""
+
+import importlib
+import os
+import sys
+
+IMPORT_BUDGET_MS = 50.0
+
+# Modules a core import must not load
+HEAVY_MODULES = ('numpy', 'PIL', 'Tkinter', 'tkinter')
+
+
+def _lazy(module, name):
+    """A function that imports module on its first call and forwards to module.name"""
+    def call(*args, **kwargs):
+        return getattr(importlib.import_module(module), name)(*args, **kwargs)
+    call.__name__ = name
+    call.__doc__ = "{}.{}, imported on first call".format(module, name)
+    return call
+
+
+# Parsers
+parse_hex_file = _lazy('ct952_hexparse', 'parse_hex_file')
+parse_hex_words = _lazy('ct952_hexparse', 'parse_hex_words')
+load_file = _lazy('ct952_fwbitmap', 'load_file')
+load_buffer = _lazy('ct952_fwbitmap', 'load_buffer')
+unpack = _lazy('ct952_unzip', 'unpack')
+read_sections = _lazy('ct952_romsect', 'read_sections')
+load_section = _lazy('ct952_romsect', 'load_section')
+scan_file = _lazy('ct952_romscan', 'scan_file')
+load_hit = _lazy('ct952_romscan', 'load_hit')
+
+# Decoders
+decode = _lazy('ct952_decode', 'decode')
+decode_strips = _lazy('ct952_decode', 'decode_strips')
+unpack_indices = _lazy('ct952_decode', 'unpack_indices')
+detect = _lazy('ct952_detect', 'detect')
+decode_logo = _lazy('ct952_mpeg', 'decode_logo')
+load_logo = _lazy('ct952_mpeg', 'load_logo')
+render_file = _lazy('ct952_render', 'render_file')
+
+# Colour conversion and palettes
+yuv_to_rgb = _lazy('ct952_colorspace', 'yuv_to_rgb')
+rgb_to_yuv = _lazy('ct952_colorspace', 'rgb_to_yuv')
+load_palette = _lazy('ct952_palette', 'load_palette')
+palette_for_bitmap = _lazy('ct952_palette', 'palette_for_bitmap')
+find_palette_file = _lazy('ct952_palette', 'find_palette_file')
+
+
+def browse(filename=None, yuv=False):
+    """Open the Tk bitmap browser, which is only imported now"""
+    import ct952_bmp_browse
+    app = ct952_bmp_browse.BitmapBrowser(yuv=yuv)
+    if filename:
+        app.load_file(filename)
+    app.run()
+
+
+def measure_import(module='ct952_core'):
+    """(milliseconds, heavy modules loaded) for importing module in a fresh interpreter"""
+    import subprocess
+    script = ("import sys, time\n"
+              "start = time.time()\n"
+              "import {}\n"
+              "elapsed = (time.time() - start) * 1000\n"
+              "heavy = [name for name in {!r} if name in sys.modules]\n"
+              "sys.stdout.write('{{:.2f}} {{}}'.format(elapsed, ','.join(heavy)))\n").format(
+                  module, HEAVY_MODULES)
+    output = subprocess.check_output([sys.executable, '-c', script]).decode('ascii').split(' ')
+    return float(output[0]), [name for name in output[1].split(',') if name]
+
+
+def measure_first_call(statement, setup=""):
+    """
+    Milliseconds for the first run of statement (which uses ct952_core)
+    in a fresh interpreter, after setup and the import; this is the cost
+    the lazy forwarders defer.
+    """
+    import subprocess
+    script = ("import sys, time\n"
+              "{}\n"
+              "import ct952_core\n"
+              "start = time.time()\n"
+              "{}\n"
+              "sys.stdout.write('{{:.2f}}'.format((time.time() - start) * 1000))\n").format(
+                  setup, statement)
+    return float(subprocess.check_output([sys.executable, '-c', script]).decode('ascii'))
+
+
+def first_decode_ms():
+    """The first decode through ct952_core: loads NumPy, PIL and the decoder"""
+    return measure_first_call("ct952_core.decode(b'\\0' * 64, 8, 8, '8-bit grayscale')")
+
+
+def first_parse_ms(filename):
+    """The first parse_hex_file of filename through ct952_core"""
+    return measure_first_call("ct952_core.parse_hex_file({!r})".format(filename))
+
+
+def main(argv=None):
+    milliseconds, heavy = measure_import()
+    print("ct952_core cold import: {:.2f} ms (budget {:.0f} ms){}".format(
+        milliseconds, IMPORT_BUDGET_MS, ", loaded " + ", ".join(heavy) if heavy else ""))
+    print("first decode: {:.2f} ms".format(first_decode_ms()))
+
+    import tempfile
+    handle, filename = tempfile.mkstemp(suffix=".txt")
+    try:
+        with os.fdopen(handle, 'w') as f:
+            f.write("0x00, 0x01, 0x02, 0x03,\n" * 16)
+        print("first parse_hex_file: {:.2f} ms".format(first_parse_ms(filename)))
+    finally:
+        os.remove(filename)
+    return 1 if milliseconds > IMPORT_BUDGET_MS or heavy else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
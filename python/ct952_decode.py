@@ -0,0 +1,317 @@
+"""
+Bitmap decode engine for the ct952-dmp-121 bitmap browser
+Turns raw bitmap bytes into PIL images using whole-array NumPy operations
+Large images are decoded in row strips, so memory use stays near the size of the output
+Compatible with Python 2.7
+"""
+
+import numpy as np
+from PIL import Image
+
+import ct952_colorspace
+
+FORMAT_1BIT = "1-bit monochrome"
+FORMAT_8BIT_GRAY = "8-bit grayscale"
+FORMAT_RGB565 = "16-bit RGB565"
+FORMAT_RGB24 = "24-bit RGB"
+FORMAT_YUV24 = "24-bit YUV (YUV)"
+FORMAT_2BIT_INDEXED = "2-bit indexed"
+FORMAT_4BIT_INDEXED = "4-bit indexed"
+FORMAT_8BIT_INDEXED = "8-bit indexed"
+
+# gdi.h: palette entry 0 is always transparent
+PAL_ENTRY_COLOR_TRANSPARENT = 0
+
+# Firmware OSD bitmaps by bits per pixel
+INDEXED_FORMATS = {
+    2: FORMAT_2BIT_INDEXED,
+    4: FORMAT_4BIT_INDEXED,
+    8: FORMAT_8BIT_INDEXED,
+}
+
+# Bits per pixel of every format
+FORMAT_BITS = {
+    FORMAT_1BIT: 1,
+    FORMAT_8BIT_GRAY: 8,
+    FORMAT_RGB565: 16,
+    FORMAT_RGB24: 24,
+    FORMAT_YUV24: 24,
+    FORMAT_2BIT_INDEXED: 2,
+    FORMAT_4BIT_INDEXED: 4,
+    FORMAT_8BIT_INDEXED: 8,
+}
+
+# Formats handed to PIL as they are, with no NumPy temporaries to bound:
+# 8-bit images map the data, 24-bit RGB is copied once by PIL
+DIRECT_FORMATS = (FORMAT_8BIT_GRAY, FORMAT_RGB24, FORMAT_8BIT_INDEXED)
+
+# Source bytes decoded at once; a strip's temporaries are a few times this
+STRIP_BYTES = 1 << 20
+
+
+def as_array(data):
+    """Return a uint8 view of data without copying it"""
+    if isinstance(data, np.ndarray):
+        return data.reshape(-1).view(np.uint8)
+    return np.frombuffer(data, dtype=np.uint8)
+
+
+def to_image(mode, width, height, array):
+    """
+    Wrap a C-contiguous pixel array in a PIL image. 'L' and 'P' images
+    map the array without copying; PIL has no mapped 'RGB' layout (it
+    stores RGB as RGBX), so those are copied once.
+    """
+    array = np.ascontiguousarray(array)
+    return Image.frombuffer(mode, (width, height), array, 'raw', mode, 0, 1)
+
+
+def _require(data, expected_bytes, width, height, label):
+    buf = as_array(data)
+    if len(buf) < expected_bytes:
+        raise ValueError("Not enough data for {}x{} {} image".format(width, height, label))
+    return buf[:expected_bytes]
+
+
+def _pixels_1bit(data, width, height):
+    expected_bytes = (width * height + 7) // 8
+    buf = _require(data, expected_bytes, width, height, "1-bit")
+
+    bits = np.unpackbits(buf)[:width * height]
+    return bits * np.uint8(255)
+
+
+def decode_1bit(data, width, height):
+    """Decode 1-bit monochrome bitmap, MSB first, rows packed without padding"""
+    return to_image('L', width, height, _pixels_1bit(data, width, height))
+
+
+def decode_8bit_gray(data, width, height):
+    """Decode 8-bit grayscale bitmap"""
+    expected_bytes = width * height
+    buf = _require(data, expected_bytes, width, height, "8-bit")
+    return to_image('L', width, height, buf)
+
+
+def _pixels_rgb565(data, width, height):
+    expected_bytes = width * height * 2
+    buf = _require(data, expected_bytes, width, height, "16-bit")
+
+    rgb565 = buf.view('<u2')
+    pixels = np.empty((width * height, 3), dtype=np.uint8)
+    pixels[:, 0] = (rgb565 >> 11) << 3
+    pixels[:, 1] = ((rgb565 >> 5) & 0x3F) << 2
+    pixels[:, 2] = (rgb565 & 0x1F) << 3
+    return pixels
+
+
+def decode_rgb565(data, width, height):
+    """Decode little endian 16-bit RGB565 bitmap"""
+    return to_image('RGB', width, height, _pixels_rgb565(data, width, height))
+
+
+def decode_rgb24(data, width, height):
+    """Decode 24-bit RGB bitmap"""
+    expected_bytes = width * height * 3
+    buf = _require(data, expected_bytes, width, height, "24-bit")
+    return to_image('RGB', width, height, buf)
+
+
+def _pixels_yuv24(data, width, height):
+    expected_bytes = width * height * 3
+    buf = _require(data, expected_bytes, width, height, "24-bit YUV")
+    return ct952_colorspace.yuv_to_rgb(buf.reshape(-1, 3), ct952_colorspace.FULL_RANGE)
+
+
+def decode_yuv24(data, width, height):
+    """
+    Decode 24-bit YUV bitmap stored as Y, U, V bytes.
+    Uses BT.601 full range conversion, truncated and clamped like int().
+    """
+    return to_image('RGB', width, height, _pixels_yuv24(data, width, height))
+
+
+def unpack_indices(data, width, height, bits):
+    """
+    Unpack 2/4/8-bit palette indices, most significant pixel first
+    as the OSD reads them, into one uint8 per pixel.
+    """
+    pixel_count = width * height
+    expected_bytes = (pixel_count * bits + 7) // 8
+    buf = _require(data, expected_bytes, width, height, "{}-bit".format(bits))
+    if bits == 8:
+        return buf
+
+    per_byte = 8 // bits
+    mask = (1 << bits) - 1
+    indices = np.empty(expected_bytes * per_byte, dtype=np.uint8)
+    for k in range(per_byte):
+        indices[k::per_byte] = (buf >> (8 - bits * (k + 1))) & mask
+    return indices[:pixel_count]
+
+
+def _index_ramp(data, width, height, bits):
+    """Palette indices spread over 0-255, for showing them without a palette"""
+    indices = unpack_indices(data, width, height, bits)
+    if bits < 8:
+        indices = indices * np.uint8(255 // ((1 << bits) - 1))
+    return indices
+
+
+def decode_indexed(data, width, height, bits, palette=None):
+    """
+    Decode palette indices. With a 768 byte RGB palette the result is a
+    'P' image, so colours come from the palette rather than per-pixel math;
+    without one the indices are shown as a grayscale ramp.
+    """
+    if palette is not None:
+        return _palette_image(width, height, unpack_indices(data, width, height, bits), palette)
+    return to_image('L', width, height, _index_ramp(data, width, height, bits))
+
+
+def _palette_image(width, height, indices, palette):
+    image = to_image('P', width, height, indices)
+    image.putpalette(palette)
+    image.info['transparency'] = PAL_ENTRY_COLOR_TRANSPARENT
+    return image
+
+
+def decode_2bit_indexed(data, width, height, palette=None):
+    """Decode 2-bit (4 colour) OSD bitmap"""
+    return decode_indexed(data, width, height, 2, palette)
+
+
+def decode_4bit_indexed(data, width, height, palette=None):
+    """Decode 4-bit (16 colour) OSD bitmap"""
+    return decode_indexed(data, width, height, 4, palette)
+
+
+def decode_8bit_indexed(data, width, height, palette=None):
+    """Decode 8-bit (256 colour) OSD bitmap"""
+    return decode_indexed(data, width, height, 8, palette)
+
+
+DECODERS = {
+    FORMAT_1BIT: decode_1bit,
+    FORMAT_8BIT_GRAY: decode_8bit_gray,
+    FORMAT_RGB565: decode_rgb565,
+    FORMAT_RGB24: decode_rgb24,
+    FORMAT_YUV24: decode_yuv24,
+    FORMAT_2BIT_INDEXED: decode_2bit_indexed,
+    FORMAT_4BIT_INDEXED: decode_4bit_indexed,
+    FORMAT_8BIT_INDEXED: decode_8bit_indexed,
+}
+
+
+def decode(data, width, height, format_type, palette=None):
+    """
+    Decode data as format_type and return a PIL image.
+    palette is only used by the indexed formats. Images of more than one
+    strip are decoded by decode_strips.
+    """
+    try:
+        decoder = DECODERS[format_type]
+    except KeyError:
+        raise ValueError("Unknown format: {}".format(format_type))
+    if format_type not in DIRECT_FORMATS and height > strip_rows(width, FORMAT_BITS[format_type]):
+        return decode_strips(data, width, height, format_type, palette)
+    if format_type in INDEXED_FORMATS.values():
+        return decoder(data, width, height, palette)
+    return decoder(data, width, height)
+
+
+def _pixel_decoder(format_type, palette):
+    """(mode, function(data, width, height)) returning the pixel array of format_type"""
+    bits = FORMAT_BITS.get(format_type)
+    if bits is None:
+        raise ValueError("Unknown format: {}".format(format_type))
+    if format_type in INDEXED_FORMATS.values():
+        if palette is not None:
+            return 'P', lambda data, width, height: unpack_indices(data, width, height, bits)
+        return 'L', lambda data, width, height: _index_ramp(data, width, height, bits)
+    return {
+        FORMAT_1BIT: ('L', _pixels_1bit),
+        FORMAT_8BIT_GRAY: ('L', lambda data, width, height: _require(
+            data, width * height, width, height, "8-bit")),
+        FORMAT_RGB565: ('RGB', _pixels_rgb565),
+        FORMAT_RGB24: ('RGB', lambda data, width, height: _require(
+            data, width * height * 3, width, height, "24-bit")),
+        FORMAT_YUV24: ('RGB', _pixels_yuv24),
+    }[format_type]
+
+
+def strip_rows(width, bits, strip_bytes=STRIP_BYTES):
+    """
+    Rows per strip: about strip_bytes of source, and a whole number of
+    bytes, since 1, 2 and 4-bit rows are packed without padding.
+    """
+    row_bits = max(1, width * bits)
+    align = 1
+    while (align * row_bits) % 8:
+        align *= 2
+    rows = max(align, strip_bytes * 8 // row_bits)
+    return rows - rows % align
+
+
+def _iter_source(data, expected_bytes, strip_size, label):
+    """Yield strip_size byte pieces of a buffer, or of an iterable of byte blocks"""
+    try:
+        buf = as_array(data)
+    except TypeError:
+        buf = None
+    if buf is not None:
+        if len(buf) < expected_bytes:
+            raise ValueError("Not enough data for {} image".format(label))
+        for start in range(0, expected_bytes, strip_size):
+            yield buf[start:min(start + strip_size, expected_bytes)]
+        return
+
+    pending = bytearray()
+    remaining = expected_bytes
+    for block in data:
+        pending += block
+        while remaining and len(pending) >= min(strip_size, remaining):
+            size = min(strip_size, remaining)
+            yield as_array(pending[:size])
+            del pending[:size]
+            remaining -= size
+        if not remaining:
+            return
+    if remaining:
+        raise ValueError("Not enough data for {} image".format(label))
+
+
+def decode_strips(data, width, height, format_type, palette=None, strip_bytes=STRIP_BYTES):
+    """
+    Decode like decode(), a strip of rows at a time into one preallocated
+    output, so apart from the output only one strip's temporaries are held.
+    'L' and 'P' strips fill an array the image maps; 'RGB' strips are
+    pasted into the image, as PIL would copy a whole RGB array.
+    data is a buffer, such as a memory mapped dump, or an iterable of byte
+    blocks such as ct952_hexparse.iter_hex_blocks(); blocks are only read
+    as far as the image needs.
+    """
+    mode, pixels = _pixel_decoder(format_type, palette)
+    bits = FORMAT_BITS[format_type]
+    rows = strip_rows(width, bits, strip_bytes)
+    expected_bytes = (width * height * bits + 7) // 8
+    label = "{}x{} {}".format(width, height, format_type)
+
+    if mode == 'RGB':
+        image = Image.new(mode, (width, height))
+    else:
+        output = np.empty(width * height, dtype=np.uint8)
+    top = 0
+    for strip in _iter_source(data, expected_bytes, rows * width * bits // 8, label):
+        count = min(rows, height - top)
+        if mode == 'RGB':
+            image.paste(to_image(mode, width, count, pixels(strip, width, count)), (0, top))
+        else:
+            output[top * width:(top + count) * width] = pixels(strip, width, count)
+        top += count
+
+    if mode == 'RGB':
+        return image
+    if mode == 'P':
+        return _palette_image(width, height, output, palette)
+    return to_image(mode, width, height, output)
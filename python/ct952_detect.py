@@ -0,0 +1,194 @@
+"""
+Stride and format detection for raw ct952-dmp-121 bitmap dumps
+Ranks (width, depth, offset) candidates by how much each row looks like the one above it
+Compatible with Python 2.7
+"""
+
+import collections
+
+import numpy as np
+
+import ct952_decode
+
+# Depths tried, and the browser format each one is shown with
+DEPTH_FORMATS = collections.OrderedDict([
+    (1, ct952_decode.FORMAT_1BIT),
+    (2, ct952_decode.FORMAT_2BIT_INDEXED),
+    (4, ct952_decode.FORMAT_4BIT_INDEXED),
+    (8, ct952_decode.FORMAT_8BIT_GRAY),
+    (16, ct952_decode.FORMAT_RGB565),
+    (24, ct952_decode.FORMAT_RGB24),
+])
+
+MIN_WIDTH = 16
+MAX_WIDTH = 4096
+SAMPLE_PIXELS = 1 << 16     # pixels examined per depth
+LAG_CANDIDATES = 24         # autocorrelation peaks rescored per depth
+MAX_HEADER = 64             # leading bytes a dump may have before the pixels
+MULTIPLE_TOLERANCE = 0.93   # a width this close to a divisor's score is a multiple of it
+EXACT_FIT_BONUS = 0.05      # dumps usually hold exactly width * height pixels
+
+# Depths that pack two (or three) of this depth's units into one pixel
+COARSER = {1: (2,), 2: (4,), 4: (8,), 8: (16, 24), 16: (), 24: ()}
+
+Candidate = collections.namedtuple('Candidate', 'width height bits offset score')
+
+
+def detect(data, top=10, depths=None, min_width=MIN_WIDTH, max_width=MAX_WIDTH):
+    """
+    Return up to top Candidates for raw pixel data, best first.
+    For each depth one FFT autocorrelation finds the lags at which rows
+    could repeat; those few widths are then scored by how alike each pixel
+    is to the one a row above it (similarity()). The score averages that
+    with the similarity of horizontal neighbours, plus depth_evidence().
+    """
+    data = ct952_decode.as_array(data)
+    samples = {}
+    for bits in DEPTH_FORMATS:
+        pixels = _sample(data, bits)
+        if len(pixels) >= 4 * min_width and pixels.min() != pixels.max():
+            samples[bits] = pixels
+
+    evidence = depth_evidence(samples)
+    candidates = []
+    for bits in (depths or DEPTH_FORMATS):
+        pixels = samples.get(bits)
+        if pixels is None:
+            continue
+        bonus = evidence.get(bits, 0.0) - max([evidence.get(coarser, 0.0)
+                                               for coarser in COARSER[bits]] or [0.0])
+        neighbour = similarity(pixels, 1)
+        for width, row_score in _widths(pixels, min_width, max_width):
+            score = (row_score + neighbour) / 2.0 + bonus
+            candidates.append(_candidate(len(data), width, bits, score))
+
+    candidates.sort(key=lambda candidate: candidate.score, reverse=True)
+    return candidates[:top]
+
+
+def similarity(pixels, lag):
+    """
+    1 - mean |p[i] - p[i + lag]| relative to unrelated pixel pairs:
+    1 when every pixel equals the one lag later, about 0 for no relation.
+    """
+    pixels = pixels.astype(np.int32)
+    baseline = _baseline(pixels)
+    if not baseline or lag >= len(pixels):
+        return 0.0
+    difference = np.abs(pixels[lag:] - pixels[:-lag]).mean()
+    return 1.0 - difference / baseline
+
+
+def _baseline(pixels):
+    # Pairs half the sample apart stand in for unrelated pixels
+    half = len(pixels) // 2
+    return float(np.abs(pixels[half:2 * half] - pixels[:half]).mean())
+
+
+def depth_evidence(samples):
+    """
+    How much better each depth explains the data than the next finer one.
+    If pixels are really b bits wide, the b/2 bit halves of a pixel are less
+    alike than halves two apart, so similarity at lag 2 beats lag 1 at depth
+    b/2; 24-bit pixels make bytes repeat every 3.
+    """
+    def at(bits, lag):
+        pixels = samples.get(bits)
+        return 0.0 if pixels is None else similarity(pixels, lag)
+
+    evidence = {}
+    for bits, finer in ((2, 1), (4, 2), (8, 4), (16, 8)):
+        evidence[bits] = at(finer, 2) - at(finer, 1)
+    evidence[24] = at(8, 3) - max(at(8, 1), at(8, 2))
+    return evidence
+
+
+def _widths(pixels, min_width, max_width):
+    """(width, row similarity) for the likely row lengths of one depth's pixels"""
+    max_lag = min(max_width, len(pixels) // 4)
+    correlation = autocorrelation(pixels, max_lag + 1)
+    if correlation is None or max_lag <= min_width:
+        return []
+
+    lags = np.arange(min_width, max_lag)
+    values = correlation[lags]
+    is_peak = (values >= correlation[lags - 1]) & (values >= correlation[lags + 1])
+    peaks = lags[is_peak]
+    peaks = peaks[np.argsort(correlation[peaks])[::-1][:LAG_CANDIDATES]]
+
+    # The correlation peak can sit a pixel off the real width on slanted edges
+    widths = set()
+    for width in peaks:
+        widths.update(lag for lag in (width - 1, width, width + 1) if min_width <= lag < max_lag)
+
+    scores = dict((width, similarity(pixels, width)) for width in widths)
+    results = []
+    for width in sorted(widths):
+        score = scores[width]
+        if score <= 0:
+            continue
+        if any(width % k == 0 and width // k in scores
+               and scores[width // k] >= score * MULTIPLE_TOLERANCE
+               for k in (2, 3, 4)):
+            continue
+        results.append((int(width), score))
+    return results
+
+
+def autocorrelation(pixels, max_lag):
+    """
+    Normalised autocorrelation of a 1-D signal for lags 0..max_lag,
+    or None for a constant signal.
+    """
+    signal = pixels.astype(np.float64)
+    signal -= signal.mean()
+    energy = np.dot(signal, signal)
+    if energy == 0:
+        return None
+
+    size = 1
+    while size < 2 * len(signal):
+        size <<= 1
+    spectrum = np.fft.rfft(signal, size)
+    correlation = np.fft.irfft(spectrum * np.conj(spectrum), size)[:max_lag + 1]
+
+    # Unbiased: each lag has fewer overlapping pixels
+    overlap = len(signal) - np.arange(max_lag + 1)
+    return correlation / overlap * (len(signal) / energy)
+
+
+def _sample(data, bits):
+    """Up to SAMPLE_PIXELS pixel values from the middle of data"""
+    bytes_per_sample = max(1, SAMPLE_PIXELS * bits // 8)
+    start = max(0, (len(data) - bytes_per_sample) // 2)
+    if bits == 24:
+        start -= start % 3
+    elif bits == 16:
+        start -= start % 2
+    chunk = data[start:start + bytes_per_sample]
+
+    if bits == 1:
+        return np.unpackbits(chunk)
+    if bits < 8:
+        # Same MSB first order the indexed decoders use
+        return ct952_decode.unpack_indices(chunk, len(chunk) * 8 // bits, 1, bits)
+    if bits == 16:
+        return chunk[:len(chunk) // 2 * 2].view('<u2')
+    if bits == 24:
+        return chunk[:len(chunk) // 3 * 3].reshape(-1, 3).sum(axis=1)
+    return chunk
+
+
+def _candidate(size, width, bits, score):
+    # Rows are packed without padding, so only whole byte strides can tell
+    # a header from the pixels: a short DWORD aligned remainder is most
+    # likely one. Widths that use every byte after it get a small bonus.
+    offset = 0
+    if width * bits % 8 == 0:
+        remainder = size % (width * bits // 8)
+        if remainder <= MAX_HEADER and remainder % 4 == 0:
+            offset = remainder
+    height = (size - offset) * 8 // (width * bits)
+    if height and (size - offset) * 8 == height * width * bits:
+        score += EXACT_FIT_BONUS
+    return Candidate(width, height, bits, offset, round(float(score), 4))
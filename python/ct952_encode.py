@@ -0,0 +1,339 @@
+"""
+Encoder from PNG artwork to ct952-dmp-121 firmware DWORD bitmaps (BMP/*.txt)
+Quantizes whole images to a palette slice at once and packs the pixels as GDI_DrawBitmapBySW reads them
+Compatible with Python 2.7
+"""
+
+import argparse
+import multiprocessing
+import os
+import struct
+import sys
+import time
+
+import numpy as np
+from PIL import Image
+
+import ct952_colorspace
+import ct952_decode
+import ct952_fwbitmap
+import ct952_palette
+
+# Header colour mode for each depth (inverse of ct952_fwbitmap.MODE_BITS)
+BITS_MODE = dict((bits, mode) for mode, bits in ct952_fwbitmap.MODE_BITS.items())
+
+# gdi.c GDI_DrawBitmapBySW: "x position and width of BMP must be DWORD
+# alignment", so a width is a whole number of pixels per DWORD
+ALIGNMENT = {8: 4, 4: 8, 2: 16}
+
+ALPHA_THRESHOLD = 128           # less opaque pixels become the transparent entry
+WORDS_PER_LINE = 5              # layout of the BMP/*.txt dumps
+NEAREST_CHUNK = 4096            # colours compared with the palette per pass
+
+
+def check_width(width, bits):
+    """Raise ValueError unless width meets GDI_DrawBitmapBySW's alignment for bits"""
+    if bits not in ALIGNMENT:
+        raise ValueError("Firmware bitmaps are 2, 4 or 8-bit, not {}-bit".format(bits))
+    if width % ALIGNMENT[bits]:
+        raise ValueError("{}-bit bitmap width must be a multiple of {}, not {}".format(
+            bits, ALIGNMENT[bits], width))
+
+
+def load_rgba(filename, bits=None, pad=False):
+    """
+    An image as an (height, width, 4) uint8 array. With pad, the width is
+    rounded up to the alignment for bits with transparent columns.
+    """
+    pixels = np.asarray(Image.open(filename).convert('RGBA'))
+    if pad and bits in ALIGNMENT:
+        extra = -pixels.shape[1] % ALIGNMENT[bits]
+        if extra:
+            pixels = np.pad(pixels, ((0, 0), (0, extra), (0, 0)), 'constant')
+    return pixels
+
+
+def load_indices(filename, bits, pad=False):
+    """
+    The pixel values of a palette ('P') image as they are, for artwork
+    already drawn in firmware palette indices (such as decoded bitmaps).
+    """
+    image = Image.open(filename)
+    if image.mode != 'P':
+        raise ValueError("{}: {} image has no palette indices to keep".format(filename, image.mode))
+    indices = np.asarray(image)
+    if indices.max() >= 1 << bits:
+        raise ValueError("{}: index {} does not fit in {} bits".format(filename, indices.max(), bits))
+    if pad and bits in ALIGNMENT:
+        indices = np.pad(indices, ((0, 0), (0, -indices.shape[1] % ALIGNMENT[bits])), 'constant',
+                         constant_values=ct952_palette.PAL_ENTRY_COLOR_TRANSPARENT)
+    return indices
+
+
+def slice_indices(bits, start, count):
+    """Palette indices a bitmap of this depth can use from count entries at start"""
+    stop = min(start + count, 1 << bits, ct952_palette.PALETTE_SIZE)
+    indices = np.arange(start, stop)
+    # Entry 0 is drawn transparent; opaque pixels never use it
+    indices = indices[indices != ct952_palette.PAL_ENTRY_COLOR_TRANSPARENT]
+    if not len(indices):
+        raise ValueError("No {}-bit palette entries between {} and {}".format(
+            bits, start, start + count - 1))
+    return indices
+
+
+def nearest_indices(rgb, palette_rgb, indices):
+    """
+    For every pixel of an (..., 3) RGB array, the entry of indices whose
+    palette_rgb colour is nearest. Each distinct colour is compared with
+    every candidate once, in one array operation per chunk.
+    """
+    packed = ct952_colorspace.pack(rgb)
+    colors, inverse = np.unique(packed.ravel(), return_inverse=True)
+    colors = ct952_colorspace.unpack(colors).astype(np.int32)
+    candidates = np.asarray(palette_rgb, dtype=np.int32)[indices]
+
+    best = np.empty(len(colors), dtype=np.intp)
+    for first in range(0, len(colors), NEAREST_CHUNK):
+        chunk = colors[first:first + NEAREST_CHUNK]
+        distances = ((chunk[:, np.newaxis, :] - candidates[np.newaxis, :, :]) ** 2).sum(axis=2)
+        best[first:first + NEAREST_CHUNK] = distances.argmin(axis=1)
+    return indices[best][inverse].reshape(packed.shape).astype(np.uint8)
+
+
+def median_cut(rgb, count):
+    """
+    Up to count colours for the pixels of an (n, 3) RGB array: the colour
+    box holding the most weighted spread is split at its weighted median
+    until there are count boxes, and each box gives its mean colour.
+    """
+    colors, weights = np.unique(ct952_colorspace.pack(rgb), return_counts=True)
+    colors = ct952_colorspace.unpack(colors).astype(np.int64)
+    if len(colors) <= count:
+        return colors.astype(np.uint8)
+
+    boxes = [np.arange(len(colors))]
+    while len(boxes) < count:
+        scores = []
+        for box in boxes:
+            spread = colors[box].max(axis=0) - colors[box].min(axis=0) if len(box) > 1 else [0]
+            scores.append(max(spread) * weights[box].sum())
+        largest = int(np.argmax(scores))
+        if not scores[largest]:
+            break
+        box = boxes.pop(largest)
+        channel = int(np.argmax(colors[box].max(axis=0) - colors[box].min(axis=0)))
+        box = box[np.argsort(colors[box, channel], kind='mergesort')]
+        running = np.cumsum(weights[box])
+        split = int(np.searchsorted(running, running[-1] / 2.0)) + 1
+        split = min(max(split, 1), len(box) - 1)
+        boxes.extend((box[:split], box[split:]))
+
+    return np.array([np.round(np.average(colors[box], axis=0, weights=weights[box]))
+                     for box in boxes], dtype=np.uint8)
+
+
+def make_palette(images, bits, start, count=None):
+    """
+    A Palette shared by several (height, width, 4) images: median cut of
+    their opaque pixels into the entries a bits deep bitmap can use from start.
+    """
+    if count is None:
+        count = ct952_palette.PALETTE_SIZE
+    usable = len(slice_indices(bits, start, count))
+    opaque = np.concatenate([image[image[..., 3] >= ALPHA_THRESHOLD][:, :3] for image in images]
+                            or [np.zeros((0, 3), dtype=np.uint8)])
+    if not len(opaque):
+        opaque = np.zeros((1, 3), dtype=np.uint8)
+    rgb = median_cut(opaque, usable)
+    # The firmware loads palettes as YCbCr: entries go through COMUTL_RGB2YUV
+    first = start + (start == ct952_palette.PAL_ENTRY_COLOR_TRANSPARENT)
+    return ct952_palette.Palette(ct952_palette.rgb_to_ycbcr(ct952_colorspace.pack(rgb)), first)
+
+
+def quantize(pixels, bits, palette, start=None, count=None):
+    """
+    Palette indices for a (height, width, 4) image: count entries of
+    palette from start (default: the whole table where it is loaded),
+    transparent pixels mapped to PAL_ENTRY_COLOR_TRANSPARENT.
+    """
+    if start is None:
+        start = palette.start
+    if count is None:
+        count = palette.start + len(palette) - start
+    # The colours the decoder shows: the table placed at its start index
+    lut = np.frombuffer(palette.lut(), dtype=np.uint8).reshape(-1, 3)
+    indices = slice_indices(bits, max(start, palette.start), count)
+    result = nearest_indices(pixels[..., :3], lut, indices)
+    result[pixels[..., 3] < ALPHA_THRESHOLD] = ct952_palette.PAL_ENTRY_COLOR_TRANSPARENT
+    return result
+
+
+def pack_indices(indices, bits):
+    """
+    Pack a (height, width) array of palette indices most significant
+    pixel first, the inverse of ct952_decode.unpack_indices, padded to DWORDs.
+    """
+    flat = np.ascontiguousarray(indices, dtype=np.uint8).ravel()
+    per_word = 32 // bits
+    flat = np.concatenate((flat, np.zeros(-len(flat) % per_word, dtype=np.uint8)))
+    if bits == 8:
+        return flat.tobytes()
+    per_byte = 8 // bits
+    groups = flat.reshape(-1, per_byte).astype(np.uint8)
+    packed = np.zeros(len(groups), dtype=np.uint8)
+    for k in range(per_byte):
+        packed |= (groups[:, k] & ((1 << bits) - 1)) << (8 - bits * (k + 1))
+    return packed.tobytes()
+
+
+def encode(indices, bits):
+    """Header and pixel words of a firmware bitmap, in device (big endian) order"""
+    height, width = indices.shape
+    check_width(width, bits)
+    payload = pack_indices(indices, bits)
+    header = struct.pack(ct952_fwbitmap.HEADER_FORMAT, len(payload) // 4, BITS_MODE[bits],
+                         width, height)
+    return header + payload
+
+
+def to_c_array(data):
+    """
+    Words as the BMP/*.txt dumps write them: the four header words on the
+    first line, then five per line, every one followed by a comma.
+    """
+    words = struct.unpack('>{}I'.format(len(data) // 4), data)
+    lines = [",".join("0x{:08x}".format(word) for word in words[:4]) + ","]
+    for first in range(4, len(words), WORDS_PER_LINE):
+        lines.append(",".join("0x{:08x}".format(word)
+                              for word in words[first:first + WORDS_PER_LINE]) + ",")
+    return "\r\n".join(lines) + "\r\n"
+
+
+def palette_to_c_array(palette):
+    """A count-prefixed palette table in the BMP/pal*.txt layout"""
+    entries = [int(entry) for entry in palette.entries]
+    lines = ["0x{:08x},".format(len(entries))]
+    for first in range(0, len(entries), WORDS_PER_LINE):
+        lines.append(",".join("0x{:08x}".format(entry)
+                              for entry in entries[first:first + WORDS_PER_LINE]) + ",")
+    return "\r\n".join(lines) + "\r\n"
+
+
+def write_text(filename, text):
+    # BMP/*.txt use CRLF whatever the platform
+    with open(filename, 'wb') as f:
+        f.write(text.encode('ascii'))
+
+
+def verify(filename, data, indices, bits):
+    """Read a written dump back through the decoder; raise ValueError on any difference"""
+    decoded, bitmap = ct952_fwbitmap.load_hex_dump(filename)
+    if bytes(decoded) != data:
+        raise ValueError("{}: dump does not read back as the encoded words".format(filename))
+    height, width = indices.shape
+    unpacked = ct952_decode.unpack_indices(bitmap.payload, bitmap.width, bitmap.height, bitmap.bits)
+    if (bitmap.width, bitmap.height, bitmap.bits) != (width, height, bits) or \
+            not np.array_equal(unpacked.reshape(height, width), indices):
+        raise ValueError("{}: decoded pixels differ from the encoded ones".format(filename))
+
+
+def encode_file(job):
+    """
+    Encode one PNG: job is (source, output, bits, palette entries, palette
+    start, slice start, slice count, pad, keep indices, check). Runs in
+    pool workers, so everything it needs travels in the tuple.
+    """
+    source, output, bits, entries, palette_start, start, count, pad, keep, check = job
+    if keep:
+        indices = load_indices(source, bits, pad)
+    else:
+        palette = ct952_palette.Palette(entries, palette_start)
+        indices = quantize(load_rgba(source, bits, pad), bits, palette, start, count)
+    data = encode(indices, bits)
+    write_text(output, to_c_array(data))
+    if check:
+        verify(output, data, indices, bits)
+    return output, indices.shape[1], indices.shape[0]
+
+
+def encode_files(jobs, processes=None):
+    """Run encode_file over jobs, in a process pool when there are several"""
+    if processes == 1 or len(jobs) < 2:
+        return [encode_file(job) for job in jobs]
+    pool = multiprocessing.Pool(processes)
+    try:
+        return pool.map(encode_file, jobs)
+    finally:
+        pool.close()
+        pool.join()
+
+
+def default_start(bits):
+    """Where a generated palette goes: the bitmap range for 8-bit, after entry 0 otherwise"""
+    if bits == 8:
+        return ct952_palette.GDI_BITMAP_PALETTE_INDEX_START
+    return ct952_palette.PAL_ENTRY_COLOR_TRANSPARENT + 1
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Encode PNG images as firmware DWORD bitmaps (BMP/*.txt) "
+                    "quantized to a firmware palette, or to one made for them.")
+    parser.add_argument('images', nargs='+', help="PNG (or any PIL readable) images")
+    parser.add_argument('-b', '--bits', type=int, choices=sorted(ALIGNMENT), default=8,
+                        help="pixel depth (default: %(default)s)")
+    parser.add_argument('-p', '--palette',
+                        help="palette table such as BMP/palMenu.txt; without one a palette "
+                             "is made for all images together")
+    parser.add_argument('-s', '--start', type=int,
+                        help="first palette index to use (default: where the palette loads)")
+    parser.add_argument('-n', '--count', type=int, help="palette entries to use from start")
+    parser.add_argument('-P', '--palette-output',
+                        help="where to write a generated palette (default: pal.txt in the output directory)")
+    parser.add_argument('-o', '--output-dir', default="encoded", help="default: %(default)s")
+    parser.add_argument('--pad', action='store_true',
+                        help="pad widths to the DWORD alignment instead of refusing them")
+    parser.add_argument('-k', '--keep-indices', action='store_true',
+                        help="take the pixel values of palette images as they are, unquantized")
+    parser.add_argument('-j', '--jobs', type=int, help="worker processes (default: one per CPU)")
+    parser.add_argument('--verify', action='store_true',
+                        help="read every output back through the decoder")
+    args = parser.parse_args(argv)
+
+    start_time = time.time()
+    if not os.path.isdir(args.output_dir):
+        os.makedirs(args.output_dir)
+
+    if args.palette:
+        palette = ct952_palette.load_palette(args.palette)
+    elif args.keep_indices:
+        palette = ct952_palette.Palette([], 0)
+    else:
+        start = default_start(args.bits) if args.start is None else args.start
+        palette = make_palette([load_rgba(image, args.bits, args.pad) for image in args.images],
+                               args.bits, start, args.count)
+        output = args.palette_output or os.path.join(args.output_dir, "pal.txt")
+        write_text(output, palette_to_c_array(palette))
+        print("{}: {} entries at {}".format(output, len(palette), palette.start))
+
+    jobs = []
+    for image in args.images:
+        name = os.path.splitext(os.path.basename(image))[0] + ".txt"
+        jobs.append((image, os.path.join(args.output_dir, name), args.bits,
+                     palette.entries.tolist(), palette.start, args.start, args.count,
+                     args.pad, args.keep_indices, args.verify))
+
+    try:
+        results = encode_files(jobs, args.jobs)
+    except ValueError as e:
+        sys.stderr.write("{}\n".format(e))
+        return 1
+    for output, width, height in results:
+        print("{}: {}x{} {}-bit".format(output, width, height, args.bits))
+    sys.stderr.write("{} bitmaps encoded in {:.2f} s\n".format(len(results), time.time() - start_time))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,355 @@
+"""
+OSD font renderer for the ct952-dmp-121 fontables (OSDString/*Fontable*.txt)
+Decodes each table once into a glyph atlas and lays out whole strings in one array pass
+Compatible with Python 2.7
+"""
+
+import argparse
+import collections
+import os
+import re
+import sys
+import time
+
+import numpy as np
+from PIL import Image
+
+import ct952_decode
+import ct952_hexparse
+import ct952_unzip
+
+GLYPH_WIDTH = 32            # every glyph cell is one DWORD of pixels wide
+GLYPH_INDEX_MASK = 0x01FF   # gdi.c: (pwString[i] & 0x01FF) is the glyph number
+CODE_PAGE_FIRST = 0x20
+
+# Preview colours for the 2-bit glyph values: background, fill, border, shadow.
+# 1-bit glyphs only use background and fill.
+FONT_COLORS = ((40, 40, 40), (255, 255, 255), (0, 0, 0), (128, 128, 128))
+
+# osdfont1.c tables: name -> (fontable, FontIndx .def, glyph depth)
+FONTABLES = collections.OrderedDict([
+    ('OSD_2BIT', ('Fontable_2bit.txt', 'FontIndx_2bit.def', 2)),
+    ('OSD_1BIT', ('Fontable_1bit.txt', 'FontIndx_1bit.def', 1)),
+    ('ISO_8859_15', ('ISO_8859_15_Fontable.txt', 'ISO_8859_15_FontIndx.def', 1)),
+    ('ISO_8859_2', ('ISO_8859_2_Fontable.txt', 'ISO_8859_2_FontIndx.def', 1)),
+    ('ISO_8859_7', ('ISO_8859_7_Fontable.txt', 'ISO_8859_7_FontIndx.def', 1)),
+    ('ISO_8859_8', ('ISO_8859_8_Fontable.txt', 'ISO_8859_8_FontIndx.def', 1)),
+    ('ISO_8859_9', ('ISO_8859_9_Fontable.txt', 'ISO_8859_9_FontIndx.def', 1)),
+    ('CP_1251', ('CP_1251_Fontable.txt', 'CP_1251_FontIndx.def', 1)),
+])
+
+# Code pages: name -> (mapping table, fontable it indexes, Python codec)
+CODE_PAGES = collections.OrderedDict([
+    ('ISO_8859_15', ('ISO_8859_15_Mapping.txt', 'ISO_8859_15', 'iso8859_15')),
+    ('ISO_8859_2', ('ISO_8859_2_Mapping.txt', 'ISO_8859_2', 'iso8859_2')),
+    ('ISO_8859_7', ('ISO_8859_7_Mapping.txt', 'ISO_8859_7', 'iso8859_7')),
+    ('ISO_8859_8', ('ISO_8859_8_Mapping.txt', 'ISO_8859_8', 'iso8859_8')),
+    ('ISO_8859_9', ('ISO_8859_9_Mapping.txt', 'ISO_8859_9', 'iso8859_9')),
+    ('CP_1250', ('CP_1250_Mapping.txt', 'ISO_8859_2', 'cp1250')),    # shares the 8859-2 glyphs
+    ('CP_1251', ('CP_1251_Mapping.txt', 'CP_1251', 'cp1251')),
+])
+ASCII_MAPPING = 'Ascii_Mapping.txt'
+ASCII_REMAPPING = 'Ascii_Remapping.txt'
+DEFAULT_CODE_PAGE = 'ISO_8859_15'
+
+DEFINE = re.compile(r'^\s*#define\s+(\w+)\s+(.+?)\s*(?://.*)?$', re.MULTILINE)
+MAPPING_ENTRY = re.compile(r'\{\s*(\w+)\s*,\s*(\w+)\s*\}')
+TOKEN = re.compile(r'\s*(0[xX][0-9a-fA-F]+|\d+|\w+|[()+-])')
+
+
+def char_width(code):
+    """
+    Pixel width a glyph code draws: bits [13:9] hold the even width, cut
+    at the 32-pixel cell, and 0 draws the full cell. Unlike gdi.c's
+    GDI_GetCharWidth, which returns 64 for 0; ct952_strwidth measures
+    strings the way gdi.c does.
+    """
+    width = (code & 0x3E00) >> 8
+    return min(width, GLYPH_WIDTH) if width else GLYPH_WIDTH
+
+
+def read_defines(filenames):
+    """Values of the #defines in .def files, resolving names defined in any of them"""
+    expressions = {}
+    for filename in filenames:
+        with open(filename) as f:
+            for name, expression in DEFINE.findall(f.read()):
+                expressions[name] = expression
+
+    values = {}
+
+    def resolve(name, seen=()):
+        if name not in values:
+            if name in seen or name not in expressions:
+                raise ValueError("Cannot resolve {}".format(name))
+            values[name] = _evaluate(expressions[name], lambda other: resolve(other, seen + (name,)))
+        return values[name]
+
+    for name in expressions:
+        try:
+            resolve(name)
+        except ValueError:
+            pass            # defines that are not numbers (or use a missing file)
+    return values
+
+
+def _evaluate(expression, lookup):
+    """Sum of numbers and names with + - and parentheses, as the .def files use"""
+    tokens = TOKEN.findall(expression)
+    position = [0]
+
+    def term():
+        token = tokens[position[0]]
+        position[0] += 1
+        if token == '(':
+            value = total()
+            position[0] += 1    # ')'
+            return value
+        if token == '-':
+            return -term()
+        if token[0].isdigit():
+            return int(token, 0)
+        return lookup(token)
+
+    def total():
+        value = term()
+        while position[0] < len(tokens) and tokens[position[0]] in '+-':
+            sign = tokens[position[0]]
+            position[0] += 1
+            value = value + term() if sign == '+' else value - term()
+        return value
+
+    if ''.join(tokens) != re.sub(r'\s', '', expression):
+        raise ValueError("Unsupported expression: {}".format(expression))
+    return total()
+
+
+def read_mapping(filename, defines):
+    """{character code: glyph code} of a *_Mapping.txt table, without its count entry"""
+    with open(filename) as f:
+        entries = MAPPING_ENTRY.findall(f.read())
+    mapping = {}
+    for source, target in entries[1:]:
+        value = int(target, 0) if target[0].isdigit() else defines.get(target)
+        if value is not None:
+            mapping[int(source, 0)] = value
+    return mapping
+
+
+class Fontable(object):
+    """
+    One fontable decoded once into an atlas: atlas[i] is the height x 32
+    array of glyph i's pixel values. Zipped tables are unpacked first, as
+    UTL_Decompress would.
+    """
+
+    def __init__(self, name, data, bits, height):
+        data = ct952_unzip.unpack(data)
+        glyph_bytes = GLYPH_WIDTH * bits * height // 8
+        count = len(data) // glyph_bytes
+        packed = ct952_decode.as_array(data)[:count * glyph_bytes]
+        if bits == 1:
+            pixels = np.unpackbits(packed)
+        else:
+            pixels = ct952_decode.unpack_indices(packed, GLYPH_WIDTH, count * height, bits)
+
+        self.name = name
+        self.bits = bits
+        self.height = height
+        self.atlas = pixels.reshape(count, height, GLYPH_WIDTH)
+
+    def __len__(self):
+        return len(self.atlas)
+
+    def __repr__(self):
+        return "Fontable({!r}, {} glyphs, {}-bit, height {})".format(
+            self.name, len(self), self.bits, self.height)
+
+
+def load_fontable(directory, name):
+    """Fontable by FONTABLES name, with its glyph count and height from the .def file"""
+    fontable_file, index_file, bits = FONTABLES[name]
+    # The OSD tables share OSD_FONT_HEIGHT; code page tables define their own
+    defines = read_defines([os.path.join(directory, FONTABLES['OSD_2BIT'][1]),
+                            os.path.join(directory, index_file)])
+    height = defines.get(name + '_FONT_HEIGHT', defines['OSD_FONT_HEIGHT'])
+    data = ct952_hexparse.parse_hex_file(os.path.join(directory, fontable_file))
+    return Fontable(name, data, bits, height)
+
+
+class OsdFont(object):
+    """
+    The glyph space GDI_DrawString sees: the 2-bit table, the 1-bit table,
+    then the code page table the current OSD language selects. Glyph codes
+    carry the width in bits [13:9] and the glyph number in bits [8:0].
+    """
+
+    def __init__(self, directory, code_page=DEFAULT_CODE_PAGE):
+        self.directory = directory
+        self.code_page = code_page
+        mapping_file, fontable_name, self.codec = CODE_PAGES[code_page]
+
+        self.tables = [load_fontable(directory, 'OSD_2BIT'), load_fontable(directory, 'OSD_1BIT'),
+                       load_fontable(directory, fontable_name)]
+        self.starts = np.cumsum([0] + [len(table) for table in self.tables])
+        self.height = max(table.height for table in self.tables)
+
+        # One atlas for the whole glyph space, in 2-bit values
+        self.atlas = np.zeros((self.starts[-1], self.height, GLYPH_WIDTH), dtype=np.uint8)
+        for start, table in zip(self.starts, self.tables):
+            self.atlas[start:start + len(table), :table.height] = table.atlas
+
+        defines = read_defines(
+            [os.path.join(directory, FONTABLES[name][1]) for name in ('OSD_2BIT', 'OSD_1BIT')]
+            + [os.path.join(directory, FONTABLES[fontable_name][1]),
+               os.path.join(directory, ASCII_REMAPPING)])
+        self.ascii = read_mapping(os.path.join(directory, ASCII_MAPPING), defines)
+        self.mapping = read_mapping(os.path.join(directory, mapping_file), defines)
+        self.fallback = self.ascii.get(ord('?'), 0)
+        self._glyphs = {}
+
+    def glyph_index(self, code):
+        """(table, index in that table) of a glyph code"""
+        number = code & GLYPH_INDEX_MASK
+        table = int(np.searchsorted(self.starts, number, side='right')) - 1
+        return self.tables[table], number - int(self.starts[table])
+
+    def glyph(self, code):
+        """The glyph's pixels cropped to its width, cached by (table, index)"""
+        table, index = self.glyph_index(code)
+        key = (table.name, index, char_width(code))
+        glyph = self._glyphs.get(key)
+        if glyph is None:
+            glyph = table.atlas[index, :, :key[2]].copy()
+            glyph.flags.writeable = False
+            self._glyphs[key] = glyph
+        return glyph
+
+    def encode(self, text):
+        """Glyph codes for a unicode string, through the ASCII and code page tables"""
+        codes = []
+        for char in text:
+            try:
+                byte = bytearray(char.encode(self.codec))[0]
+            except UnicodeEncodeError:
+                byte = None
+            code = self.ascii.get(byte) if byte is not None and byte < 0x80 else self.mapping.get(byte)
+            codes.append(self.fallback if code is None else code)
+        return codes
+
+    def layout(self, codes):
+        """
+        Pixel values of a row of glyphs, height x total width. Every glyph
+        is gathered from the atlas at once and its unused columns dropped
+        with one mask, so the cost barely depends on the string length.
+        """
+        codes = np.asarray(codes, dtype=np.int64)
+        if not len(codes):
+            return np.zeros((self.height, 0), dtype=np.uint8)
+        numbers = np.minimum(codes & GLYPH_INDEX_MASK, len(self.atlas) - 1)
+        widths = (codes & 0x3E00) >> 8                              # as char_width()
+        widths = np.where(widths == 0, GLYPH_WIDTH, np.minimum(widths, GLYPH_WIDTH))
+
+        glyphs = self.atlas[numbers]                                # n x height x 32
+        keep = np.arange(GLYPH_WIDTH)[np.newaxis, :] < widths[:, np.newaxis]
+        return glyphs.transpose(1, 0, 2)[:, keep]
+
+    def width(self, codes):
+        return sum(char_width(code) for code in codes)
+
+    def render_text(self, text):
+        return to_image(self.layout(self.encode(text)))
+
+    def render_lines(self, lines, spacing=2):
+        """Several strings stacked into one image"""
+        rows = [self.layout(self.encode(line)) for line in lines]
+        width = max([row.shape[1] for row in rows] + [1])
+        sheet = np.zeros((len(rows) * (self.height + spacing), width), dtype=np.uint8)
+        for i, row in enumerate(rows):
+            top = i * (self.height + spacing)
+            sheet[top:top + self.height, :row.shape[1]] = row
+        return to_image(sheet)
+
+    def code_page_sheet(self, columns=16):
+        """Every character from 0x20 up, one row per 16 codes; unmapped ones are blank"""
+        blank = self.ascii.get(ord(' '), 0)
+        rows = []
+        for first in range(CODE_PAGE_FIRST, 0x100, columns):
+            codes = []
+            for byte in range(first, first + columns):
+                code = self.ascii.get(byte) if byte < 0x80 else self.mapping.get(byte)
+                codes.append(blank if code is None else code)
+            rows.append(self.layout(codes))
+        return _stack(rows, self.height)
+
+
+def atlas_sheet(fontable, columns=16):
+    """All glyphs of a fontable at full cell width, columns per row"""
+    count = len(fontable)
+    rows = -(-count // columns)
+    atlas = np.zeros((rows * columns, fontable.height, GLYPH_WIDTH), dtype=np.uint8)
+    atlas[:count] = fontable.atlas
+    sheet = atlas.reshape(rows, columns, fontable.height, GLYPH_WIDTH).transpose(0, 2, 1, 3)
+    return to_image(sheet.reshape(rows * fontable.height, columns * GLYPH_WIDTH))
+
+
+def _stack(rows, height):
+    width = max(row.shape[1] for row in rows)
+    sheet = np.zeros((len(rows) * height, width), dtype=np.uint8)
+    for i, row in enumerate(rows):
+        sheet[i * height:(i + 1) * height, :row.shape[1]] = row
+    return to_image(sheet)
+
+
+def to_image(pixels):
+    """A 'P' image of glyph pixel values in FONT_COLORS"""
+    image = Image.fromarray(np.ascontiguousarray(pixels, dtype=np.uint8), 'P')
+    palette = []
+    for color in FONT_COLORS:
+        palette.extend(color)
+    image.putpalette(palette + [0] * (768 - len(palette)))
+    return image
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Render the OSD fontables: glyph atlases, code page charts "
+                    "and sample strings, for every language table at once.")
+    parser.add_argument('-d', '--directory', default="OSDString",
+                        help="fontable and mapping directory (default: %(default)s)")
+    parser.add_argument('-o', '--output-dir', default="fonts", help="default: %(default)s")
+    parser.add_argument('-c', '--code-page', action='append', choices=list(CODE_PAGES),
+                        help="code pages to render (default: all)")
+    parser.add_argument('-t', '--text', action='append', default=[],
+                        help="string to render with each code page (repeatable)")
+    args = parser.parse_args(argv)
+
+    if not os.path.isdir(args.output_dir):
+        os.makedirs(args.output_dir)
+
+    start = time.time()
+    outputs = []
+    for name in ('OSD_2BIT', 'OSD_1BIT'):
+        output = os.path.join(args.output_dir, "atlas_{}.png".format(name))
+        atlas_sheet(load_fontable(args.directory, name)).save(output)
+        outputs.append(output)
+
+    for code_page in args.code_page or CODE_PAGES:
+        font = OsdFont(args.directory, code_page)
+        output = os.path.join(args.output_dir, "codepage_{}.png".format(code_page))
+        font.code_page_sheet().save(output)
+        outputs.append(output)
+        if args.text:
+            texts = [text.decode(sys.getfilesystemencoding()) if isinstance(text, bytes) else text
+                     for text in args.text]
+            output = os.path.join(args.output_dir, "text_{}.png".format(code_page))
+            font.render_lines(texts).save(output)
+            outputs.append(output)
+
+    print("Rendered {} images to {} in {:.3f} s".format(len(outputs), args.output_dir,
+                                                        time.time() - start))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,116 @@
+"""
+Loader for the firmware DWORD bitmaps in BMP/*.txt
+Reads the size, mode, width, height header that GDI_DrawBitmapBySW uses
+Compatible with Python 2.7
+"""
+
+import mmap
+import os
+import struct
+
+import ct952_decode
+import ct952_hexparse
+import ct952_unzip
+
+HEADER_FORMAT = '>4I'
+HEADER_SIZE = struct.calcsize(HEADER_FORMAT)
+
+# Header colour mode (GDI_IMAGE_INFO.bColorMode): 0: 4 color, 1: 16 color, 2: 256 color
+MODE_BITS = {0: 2, 1: 4, 2: 8}
+
+# .bin files this big are memory mapped instead of read, e.g. frame buffer and ROM dumps
+MAP_BYTES = 16 << 20
+
+
+class FirmwareBitmap(object):
+    """
+    A firmware bitmap in device memory order: four big endian header words
+    (size in DWORDs, colour mode, width, height) followed by the pixel words.
+    payload is a zero-copy memoryview of the pixel bytes.
+    """
+
+    def __init__(self, buffer, offset=0):
+        header = parse_header(buffer, offset)
+        if header is None:
+            raise ValueError("No firmware bitmap header at offset {}".format(offset))
+
+        self.buffer = buffer
+        self.offset = offset
+        self.size, self.mode, self.width, self.height = header
+        self.bits = MODE_BITS[self.mode]
+
+        start = offset + HEADER_SIZE
+        self.payload = memoryview(buffer)[start:start + self.size * 4]
+
+    @property
+    def format_type(self):
+        """The browser format name for this bitmap's depth"""
+        return ct952_decode.INDEXED_FORMATS[self.bits]
+
+    def decode(self, palette=None):
+        """Decode the payload, through palette (768 RGB bytes) if given"""
+        return ct952_decode.decode(self.payload, self.width, self.height,
+                                   self.format_type, palette)
+
+    def __repr__(self):
+        return "FirmwareBitmap({}x{}, {}-bit, {} words)".format(
+            self.width, self.height, self.bits, self.size)
+
+
+def parse_header(buffer, offset=0):
+    """
+    Return (size, mode, width, height) if buffer holds a plausible bitmap
+    header at offset, else None. Only the header words are inspected.
+    """
+    if len(buffer) - offset < HEADER_SIZE:
+        return None
+
+    size, mode, width, height = struct.unpack_from(HEADER_FORMAT, buffer, offset)
+    if mode not in MODE_BITS or not width or not height:
+        return None
+
+    # The payload must hold every pixel and fit in the buffer
+    if size * 32 < width * height * MODE_BITS[mode]:
+        return None
+    if offset + HEADER_SIZE + size * 4 > len(buffer):
+        return None
+    return size, mode, width, height
+
+
+def load_hex_dump(filename):
+    """
+    Load a C-array dump. Word arrays are decoded as big endian DWORDs;
+    compressed byte arrays are unpacked first. Returns (data, bitmap);
+    bitmap is None if the data is not a firmware bitmap.
+    """
+    if ct952_hexparse.first_token_digits(filename) != 8:
+        return load_buffer(ct952_hexparse.parse_hex_file(filename))
+    return load_buffer(ct952_hexparse.parse_hex_words(filename))
+
+
+def load_file(filename):
+    """
+    Like load_hex_dump, but raw .bin images are read as they are, or
+    memory mapped from MAP_BYTES on so that only the pages decoded are read.
+    """
+    if os.path.splitext(filename)[1].lower() != '.bin':
+        return load_hex_dump(filename)
+
+    if os.path.getsize(filename) >= MAP_BYTES:
+        return load_buffer(map_file(filename))
+    with open(filename, 'rb') as f:
+        return load_buffer(f.read())
+
+
+def map_file(filename):
+    """A read-only memory map of filename; it stays valid after the file is closed"""
+    with open(filename, 'rb') as f:
+        return mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+
+def load_buffer(data):
+    """Unpack data if it is a zipped bitmap and look for a bitmap header"""
+    data = ct952_unzip.unpack(data)
+    if parse_header(data) is None:
+        return data, None
+    return data, FirmwareBitmap(data)
@@ -0,0 +1,281 @@
+"""
+Thumbnail gallery for whole ct952-dmp-121 asset directories
+Decodes only the visible thumbnails on worker threads and hands them to Tk through a queue
+Compatible with Python 2.7
+"""
+
+import collections
+import os
+import threading
+import time
+
+try:
+    import Queue as queue
+    import Tkinter as tk
+except ImportError:
+    import queue
+    import tkinter as tk
+
+from PIL import Image, ImageTk
+
+import ct952_decode
+import ct952_fwbitmap
+import ct952_palette
+import ct952_render
+
+THUMB_SIZE = 96
+CELL_WIDTH = THUMB_SIZE + 16
+CELL_HEIGHT = THUMB_SIZE + 28
+WORKER_COUNT = 4
+TILE_CACHE_SIZE = 512       # PhotoImages kept; must exceed a screenful
+POLL_MS = 15
+FRAME_BUDGET = 0.008        # seconds of main thread work per poll
+BACKGROUND = "#303030"
+TEXT_COLOR = "#e0e0e0"
+ERROR_COLOR = "#ff8080"
+
+
+def make_thumbnail(filename, size=THUMB_SIZE):
+    """
+    Decode a bitmap file into an RGBA thumbnail no larger than size x size.
+    Firmware bitmaps are drawn with the palette the firmware uses for them.
+    Raises ValueError for files that are not firmware bitmaps.
+    """
+    data, bitmap = ct952_fwbitmap.load_file(filename)
+    if bitmap is None:
+        raise ValueError("no bitmap header")
+
+    palette = None
+    palette_file = ct952_palette.find_palette_file(filename)
+    if palette_file is not None:
+        palette = _palette(palette_file).lut()
+
+    image = ct952_decode.decode(bitmap.payload, bitmap.width, bitmap.height,
+                                bitmap.format_type, palette).convert('RGBA')
+    image.thumbnail((size, size), Image.NEAREST)
+    return image
+
+
+_PALETTES = {}
+_PALETTES_LOCK = threading.Lock()
+
+
+def _palette(filename):
+    with _PALETTES_LOCK:
+        palette = _PALETTES.get(filename)
+        if palette is None:
+            palette = _PALETTES[filename] = ct952_palette.load_palette(filename)
+        return palette
+
+
+class TileCache(object):
+    """Least recently used thumbnails by file index"""
+
+    def __init__(self, max_tiles=TILE_CACHE_SIZE):
+        self.max_tiles = max_tiles
+        self._tiles = collections.OrderedDict()
+
+    def get(self, index):
+        tile = self._tiles.pop(index, None)
+        if tile is not None:
+            self._tiles[index] = tile
+        return tile
+
+    def put(self, index, tile):
+        self._tiles.pop(index, None)
+        self._tiles[index] = tile
+        while len(self._tiles) > self.max_tiles:
+            self._tiles.popitem(last=False)
+
+    def __contains__(self, index):
+        return index in self._tiles
+
+
+class ThumbnailGallery(object):
+    """
+    A Toplevel with one thumbnail per asset in a directory. Canvas items and
+    decode requests only exist for the rows in view; on_select(filename) is
+    called when a thumbnail is clicked.
+    """
+
+    def __init__(self, master, directory, on_select=None):
+        self.directory = directory
+        self.on_select = on_select
+        self.filenames = ct952_render.find_assets([directory])
+
+        self.tiles = TileCache()
+        self.failed = {}            # index -> error message
+        self.items = {}             # index -> (image item, text item)
+        self.columns = 1
+        self.visible = []
+
+        # Requests are replaced wholesale on every scroll, so workers only
+        # ever decode what is (or was just) on screen
+        self._wanted = []
+        self._pending = set()
+        self._condition = threading.Condition()
+        self._results = queue.Queue()
+        self._closed = False
+
+        self.window = tk.Toplevel(master)
+        self.window.title("{} ({} files)".format(directory, len(self.filenames)))
+        self.window.geometry("{}x600".format(CELL_WIDTH * 6 + 24))
+        self.window.protocol("WM_DELETE_WINDOW", self.close)
+
+        self.scrollbar = tk.Scrollbar(self.window, orient=tk.VERTICAL)
+        self.scrollbar.pack(side=tk.RIGHT, fill=tk.Y)
+        self.canvas = tk.Canvas(self.window, bg=BACKGROUND, highlightthickness=0,
+                                yscrollcommand=self.on_scroll)
+        self.canvas.pack(side=tk.LEFT, fill=tk.BOTH, expand=True)
+        self.scrollbar.config(command=self.canvas.yview)
+
+        self.canvas.bind("<Configure>", self.on_resize)
+        self.canvas.bind("<Button-1>", self.on_click)
+        self.canvas.bind("<MouseWheel>", self.on_wheel)
+        self.canvas.bind("<Button-4>", lambda event: self.canvas.yview_scroll(-1, "units"))
+        self.canvas.bind("<Button-5>", lambda event: self.canvas.yview_scroll(1, "units"))
+
+        self.workers = []
+        for _ in range(WORKER_COUNT):
+            worker = threading.Thread(target=self._work)
+            worker.daemon = True
+            worker.start()
+            self.workers.append(worker)
+
+        self.window.after(POLL_MS, self.poll)
+
+    # Layout
+
+    def cell_origin(self, index):
+        row, column = divmod(index, self.columns)
+        return column * CELL_WIDTH, row * CELL_HEIGHT
+
+    def index_at(self, x, y):
+        column = int(x) // CELL_WIDTH
+        if column >= self.columns:
+            return None
+        index = (int(y) // CELL_HEIGHT) * self.columns + column
+        return index if 0 <= index < len(self.filenames) else None
+
+    def visible_range(self):
+        """Indices of the rows in view, plus one row either side"""
+        top = self.canvas.canvasy(0)
+        bottom = top + self.canvas.winfo_height()
+        first_row = max(0, int(top) // CELL_HEIGHT - 1)
+        last_row = int(bottom) // CELL_HEIGHT + 1
+        return range(first_row * self.columns,
+                     min(len(self.filenames), (last_row + 1) * self.columns))
+
+    def on_resize(self, event):
+        columns = max(1, event.width // CELL_WIDTH)
+        if columns != self.columns:
+            self.columns = columns
+            for index in list(self.items):
+                self._drop_items(index)
+            rows = -(-len(self.filenames) // columns)
+            self.canvas.config(scrollregion=(0, 0, columns * CELL_WIDTH, rows * CELL_HEIGHT))
+        self.update_visible()
+
+    def on_scroll(self, first, last):
+        self.scrollbar.set(first, last)
+        self.update_visible()
+
+    def on_wheel(self, event):
+        self.canvas.yview_scroll(-1 if event.delta > 0 else 1, "units")
+
+    def on_click(self, event):
+        index = self.index_at(self.canvas.canvasx(event.x), self.canvas.canvasy(event.y))
+        if index is not None and self.on_select is not None:
+            self.on_select(self.filenames[index])
+
+    def update_visible(self):
+        """Create items for the rows in view, drop the rest and queue missing tiles"""
+        self.visible = self.visible_range()
+        visible = set(self.visible)
+
+        for index in list(self.items):
+            if index not in visible:
+                self._drop_items(index)
+
+        wanted = []
+        for index in self.visible:
+            if index not in self.items:
+                self._create_items(index)
+            tile = self.tiles.get(index)
+            if tile is not None:
+                self.canvas.itemconfig(self.items[index][0], image=tile)
+            elif index not in self.failed and index not in self._pending:
+                wanted.append(index)
+
+        with self._condition:
+            self._wanted = wanted
+            self._condition.notify_all()
+
+    def _create_items(self, index):
+        x, y = self.cell_origin(index)
+        image_item = self.canvas.create_image(x + CELL_WIDTH // 2, y + 4 + THUMB_SIZE // 2)
+        name = os.path.basename(self.filenames[index])
+        text_item = self.canvas.create_text(
+            x + CELL_WIDTH // 2, y + THUMB_SIZE + 14, text=name, width=CELL_WIDTH - 4,
+            fill=ERROR_COLOR if index in self.failed else TEXT_COLOR)
+        self.items[index] = (image_item, text_item)
+
+    def _drop_items(self, index):
+        for item in self.items.pop(index):
+            self.canvas.delete(item)
+
+    # Decoding
+
+    def _work(self):
+        while True:
+            with self._condition:
+                while not self._wanted and not self._closed:
+                    self._condition.wait()
+                if self._closed:
+                    return
+                index = self._wanted.pop(0)
+                self._pending.add(index)
+
+            try:
+                result = make_thumbnail(self.filenames[index])
+            except Exception as e:
+                result = e
+            self._results.put((index, result))
+
+    def poll(self):
+        """Turn finished thumbnails into PhotoImages, within the frame budget"""
+        if self._closed:
+            return
+
+        deadline = time.time() + FRAME_BUDGET
+        delay = POLL_MS
+        while True:
+            if time.time() > deadline:
+                delay = 1
+                break
+            try:
+                index, result = self._results.get_nowait()
+            except queue.Empty:
+                break
+
+            with self._condition:
+                self._pending.discard(index)
+            if isinstance(result, Exception):
+                self.failed[index] = str(result)
+                if index in self.items:
+                    self.canvas.itemconfig(self.items[index][1], fill=ERROR_COLOR)
+                continue
+
+            tile = ImageTk.PhotoImage(result)
+            self.tiles.put(index, tile)
+            if index in self.items:
+                self.canvas.itemconfig(self.items[index][0], image=tile)
+
+        self.window.after(delay, self.poll)
+
+    def close(self):
+        with self._condition:
+            self._closed = True
+            self._wanted = []
+            self._condition.notify_all()
+        self.window.destroy()
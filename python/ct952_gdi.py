@@ -0,0 +1,286 @@
+"""
+GDI region model for previewing ct952-dmp-121 OSD screens without hardware
+Composites bitmaps, fills and strings into region buffers of palette indices and converts to RGB once at the end
+Compatible with Python 2.7
+
+A layout file lists what a screen draws, in order (coordinates are region pixels):
+
+    {"region": {"width": 616, "height": 400, "mode": 0},
+     "palettes": [{"file": "BMP/palPowerOnMenu.txt", "start": 55}],
+     "entries": [{"index": 60, "value": "0x5a000000"}],
+     "ops": [
+        {"op": "fill", "rect": [0, 0, 615, 399], "color": 0},
+        {"op": "bitmap", "file": "BMP/Menu_Photo.txt", "x": 30, "y": 30},
+        {"op": "text", "text": "Photo", "x": 50, "y": 114, "colors": [0, 1, 2, 3]},
+        {"op": "copy", "rect": [30, 30, 149, 109], "x": 170, "y": 30}
+     ]}
+"""
+
+import argparse
+import json
+import os
+import sys
+import time
+
+import numpy as np
+from PIL import Image
+
+import ct952_decode
+import ct952_encode
+import ct952_font
+import ct952_fwbitmap
+import ct952_palette
+
+# gdi.h region colour modes (bColorMode); a pixel address is (y * width + x) >> mode
+GDI_OSD_8B_MODE = 0
+GDI_OSD_4B_MODE = 1
+GDI_OSD_2B_MODE = 2
+MODE_BITS = {GDI_OSD_8B_MODE: 8, GDI_OSD_4B_MODE: 4, GDI_OSD_2B_MODE: 2}
+
+GDI_GENERAL_MIX_RATIO = 24      # gdi.h
+MIX_RATIO_SCALE = 32            # assumed full scale of DISP_OSDSetMixRatio, for previews only
+GDI_VALUE_YUV = ct952_palette.GDI_VALUE_YUV
+
+
+class PaletteRam(object):
+    """
+    The 256 entry OSD palette as DISP_SetPalette receives it: hardware
+    YCbCr values with the mix enable in bit 24. Entry 0 is transparent.
+    """
+
+    def __init__(self, mix_ratio=GDI_GENERAL_MIX_RATIO):
+        self.entries = np.zeros(ct952_palette.PALETTE_SIZE, dtype=np.uint32)
+        self.mix_ratio = mix_ratio
+        self._rgba = None
+
+    def load(self, palette, start=None):
+        """GDI_LoadPalette: copy a palette table to start (default: its bStartNumber)"""
+        if start is None:
+            start = palette.start
+        count = max(0, min(len(palette), ct952_palette.PALETTE_SIZE - start))
+        self.entries[start:start + count] = palette.entries[:count]
+        self._rgba = None
+
+    def change_entry(self, index, value, mix=False):
+        """GDI_ChangePALEntry: value is 0x00RRGGBB, or YCbCr when its top byte is 0x5A"""
+        self.entries[index] = ct952_palette.entries_to_ycbcr([value])[0] & 0xFFFFFF | (mix << 24)
+        self._rgba = None
+
+    def rgba(self):
+        """(256, 4) RGBA lookup table: entry 0 clear, mixed entries at the mix ratio"""
+        if self._rgba is None:
+            rgba = np.empty((ct952_palette.PALETTE_SIZE, 4), dtype=np.uint8)
+            rgba[:, :3] = ct952_palette.ycbcr_to_rgb(self.entries & 0xFFFFFF)
+            rgba[:, 3] = 255
+            mixed = (self.entries >> 24) & 1 == 1
+            rgba[mixed, 3] = min(255, 255 * self.mix_ratio // MIX_RATIO_SCALE)
+            rgba[ct952_palette.PAL_ENTRY_COLOR_TRANSPARENT, 3] = 0
+            self._rgba = rgba
+        return self._rgba
+
+
+class Region(object):
+    """
+    One __RegionList entry: width, height and bColorMode, and its buffer
+    as one palette index per pixel. Indices never exceed the region's depth,
+    so dram() packs the buffer exactly as the region's memory holds it.
+    Coordinates outside the region are clipped.
+    """
+
+    def __init__(self, width, height, color_mode=GDI_OSD_8B_MODE):
+        if color_mode not in MODE_BITS:
+            raise ValueError("Unknown region colour mode {}".format(color_mode))
+        self.width = width
+        self.height = height
+        self.color_mode = color_mode
+        self.bits = MODE_BITS[color_mode]
+        self.pixels = np.zeros((height, width), dtype=np.uint8)
+
+    @property
+    def alignment(self):
+        """Pixels per DWORD: GDI_DrawBitmapBySW's dwAlignment"""
+        return 4 << self.color_mode
+
+    def clear(self, color=ct952_palette.PAL_ENTRY_COLOR_TRANSPARENT):
+        self.pixels.fill(color & self._mask)
+
+    @property
+    def _mask(self):
+        return (1 << self.bits) - 1
+
+    def fill_rect(self, left, top, right, bottom, color):
+        """GDI_FillRect: an inclusive rectangle, cut at the region's edges"""
+        left, top = max(left, 0), max(top, 0)
+        if left >= self.width or top >= self.height or left > right or top > bottom:
+            return
+        self.pixels[top:min(bottom, self.height - 1) + 1,
+                    left:min(right, self.width - 1) + 1] = color & self._mask
+
+    def blit(self, indices, x, y, color_key=None):
+        """
+        Copy a (height, width) array of indices to x, y. Pixels equal to
+        color_key are skipped, as the GPU colour key does.
+        """
+        top, left = max(y, 0), max(x, 0)
+        bottom = min(y + indices.shape[0], self.height)
+        right = min(x + indices.shape[1], self.width)
+        if top >= bottom or left >= right:
+            return
+        source = indices[top - y:bottom - y, left - x:right - x]
+        target = self.pixels[top:bottom, left:right]
+        if color_key is None:
+            target[...] = source
+        else:
+            np.copyto(target, source, where=source != color_key)
+
+    def draw_bitmap(self, bitmap, x, y, software=False):
+        """
+        GDI_DrawBitmap (GPU copy) of a FirmwareBitmap, or GDI_DrawBitmapBySW,
+        which moves x down to a DWORD boundary. The pixels are copied as they
+        are, so the bitmap must have the region's depth.
+        """
+        if bitmap.bits != self.bits:
+            raise ValueError("{}-bit bitmap in a {}-bit region".format(bitmap.bits, self.bits))
+        if software:
+            x -= x % self.alignment
+        self.blit(bitmap_indices(bitmap), x, y)
+
+    def bitmap_copy(self, source, left, top, right, bottom, x, y):
+        """GDI_BitmapCopy: an inclusive rectangle of source (or this region) to x, y"""
+        if source.bits != self.bits:
+            raise ValueError("Copy from a {}-bit to a {}-bit region".format(source.bits, self.bits))
+        # Cut at the source's edges, moving the target with the rectangle
+        x, y = x + max(-left, 0), y + max(-top, 0)
+        left, top = max(left, 0), max(top, 0)
+        right = min(right, source.width - 1)
+        bottom = min(bottom, source.height - 1)
+        if right < left or bottom < top:
+            return
+        # Copied first: source and destination may overlap
+        self.blit(source.pixels[top:bottom + 1, left:right + 1].copy(), x, y)
+
+    def draw_string(self, font, codes, x, y, background, text, shadow1, shadow2, color_key=0):
+        """
+        GDI_DrawString: glyph values 0-3 are drawn with the background,
+        text and shadow colours; a non-zero color_key is left undrawn.
+        """
+        colors = np.array([background, text, shadow1, shadow2], dtype=np.uint8) & self._mask
+        self.blit(colors[font.layout(codes)], x, y, color_key or None)
+
+    def dram(self):
+        """The region's memory: pixels packed at its depth, most significant first"""
+        return ct952_encode.pack_indices(self.pixels, self.bits)
+
+    def to_image(self, palette_ram):
+        """RGBA image through the palette: one table lookup for the whole region"""
+        return Image.fromarray(palette_ram.rgba()[self.pixels], 'RGBA')
+
+
+def bitmap_indices(bitmap):
+    """(height, width) palette indices of a FirmwareBitmap"""
+    return ct952_decode.unpack_indices(bitmap.payload, bitmap.width, bitmap.height,
+                                       bitmap.bits).reshape(bitmap.height, bitmap.width)
+
+
+class Layout(object):
+    """
+    A screen described by a layout file. Bitmaps, palettes and fonts are
+    loaded once by the constructor, so render() only composites.
+    """
+
+    def __init__(self, filename):
+        with open(filename) as f:
+            self.spec = json.load(f)
+        self.root = os.path.dirname(os.path.abspath(filename))
+        self.palettes = [(ct952_palette.load_palette(self._path(entry['file']), entry.get('start')),
+                          entry.get('start'))
+                         for entry in self.spec.get('palettes', [])]
+        self.bitmaps = {}
+        self.fonts = {}
+        for op in self.spec.get('ops', []):
+            if op['op'] == 'bitmap' and op['file'] not in self.bitmaps:
+                data, bitmap = ct952_fwbitmap.load_file(self._path(op['file']))
+                if bitmap is None:
+                    raise ValueError("{}: not a firmware bitmap".format(op['file']))
+                self.bitmaps[op['file']] = bitmap
+            elif op['op'] == 'text':
+                key = self._font_key(op)
+                if key not in self.fonts:
+                    self.fonts[key] = ct952_font.OsdFont(self._path(key[0]), key[1])
+
+    def _path(self, path):
+        return os.path.join(self.root, path)
+
+    def _font_key(self, op):
+        return (op.get('font', self.spec.get('font', "OSDString")),
+                op.get('code_page', self.spec.get('code_page', ct952_font.DEFAULT_CODE_PAGE)))
+
+    def render(self):
+        """(Region, PaletteRam) after running every op"""
+        spec = self.spec.get('region', {})
+        region = Region(spec.get('width', 616), spec.get('height', 400),
+                        spec.get('mode', GDI_OSD_8B_MODE))
+        palette_ram = PaletteRam(self.spec.get('mix_ratio', GDI_GENERAL_MIX_RATIO))
+        for palette, start in self.palettes:
+            palette_ram.load(palette, start)
+        for entry in self.spec.get('entries', []):
+            palette_ram.change_entry(entry['index'], _number(entry['value']), entry.get('mix', False))
+
+        for op in self.spec.get('ops', []):
+            kind = op['op']
+            if kind == 'fill':
+                region.fill_rect(*(list(op['rect']) + [op['color']]))
+            elif kind == 'bitmap':
+                region.draw_bitmap(self.bitmaps[op['file']], op['x'], op['y'],
+                                   op.get('software', False))
+            elif kind == 'copy':
+                region.bitmap_copy(region, *(list(op['rect']) + [op['x'], op['y']]))
+            elif kind == 'text':
+                font = self.fonts[self._font_key(op)]
+                codes = op['codes'] if 'codes' in op else font.encode(op['text'])
+                region.draw_string(font, codes, op['x'], op['y'], *op.get('colors', (0, 1, 2, 3)),
+                                   color_key=op.get('color_key', 0))
+            else:
+                raise ValueError("Unknown layout op {!r}".format(kind))
+        return region, palette_ram
+
+
+def _number(value):
+    return int(value, 0) if not isinstance(value, int) else value
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Composite an OSD screen from a layout file the way the GDI "
+                    "draws it, and save it as PNG.")
+    parser.add_argument('layout', help="JSON layout file")
+    parser.add_argument('-o', '--output', help="PNG file (default: the layout name + .png)")
+    parser.add_argument('--dram', help="also save the region memory, packed at its depth")
+    parser.add_argument('--repeat', type=int, default=1, help="render this many times, for timing")
+    args = parser.parse_args(argv)
+
+    start = time.time()
+    try:
+        layout = Layout(args.layout)
+    except (IOError, OSError, ValueError, KeyError) as e:
+        sys.stderr.write("{}\n".format(e))
+        return 1
+    loaded = time.time()
+    for _ in range(max(1, args.repeat)):
+        region, palette_ram = layout.render()
+        image = region.to_image(palette_ram)
+    rendered = time.time()
+
+    output = args.output or os.path.splitext(args.layout)[0] + ".png"
+    image.save(output)
+    if args.dram:
+        with open(args.dram, 'wb') as f:
+            f.write(region.dram())
+    print("{}: {}x{} {}-bit region, assets loaded in {:.1f} ms, composited in {:.2f} ms".format(
+        output, region.width, region.height, region.bits, (loaded - start) * 1000,
+        (rendered - loaded) * 1000 / max(1, args.repeat)))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
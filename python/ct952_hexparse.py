@@ -0,0 +1,151 @@
+"""
+Bulk hex tokenizer for ct952-dmp-121 C-array dumps
+Decodes "0xHH, 0xHH, ..." and "0xHHHHHHHH, ..." text through binascii in large chunks
+Compatible with Python 2.7
+"""
+
+import binascii
+import mmap
+import os
+import re
+
+# Tokens never contain these, so a chunk can be cut after any of them
+SEPARATORS = b' \t\r\n,'
+_SEPARATOR_BYTES = [SEPARATORS[i:i + 1] for i in range(len(SEPARATORS))]
+DEFAULT_BLOCK_SIZE = 4 << 20
+
+# Same token grammar as the original per-byte parser
+HEX_BYTE_PATTERN = re.compile(b'0x([0-9A-Fa-f]{2})')
+# Firmware DWORD arrays, e.g. "0x000004d8,0x00000001,"
+HEX_WORD_PATTERN = re.compile(b'0x([0-9A-Fa-f]{1,8})(?![0-9A-Fa-f])')
+
+
+def parse_hex_file(filename, block_size=DEFAULT_BLOCK_SIZE):
+    """Parse hexadecimal data from file"""
+    data = bytearray()
+    for block in iter_hex_blocks(filename, block_size):
+        data += block
+
+    if not data:
+        raise ValueError("No hexadecimal data found in file")
+    return data
+
+
+def iter_hex_blocks(filename, block_size=DEFAULT_BLOCK_SIZE):
+    """
+    Yield the decoded bytes of filename one block at a time.
+    The file is memory mapped, so only one text chunk is held at once.
+    """
+    return _iter_decoded(filename, block_size, decode_hex_text)
+
+
+def parse_hex_words(filename, block_size=DEFAULT_BLOCK_SIZE):
+    """Parse 32-bit hex words from file, returned as big endian bytes"""
+    data = bytearray()
+    for block in iter_word_blocks(filename, block_size):
+        data += block
+
+    if not data:
+        raise ValueError("No hexadecimal data found in file")
+    return data
+
+
+def iter_word_blocks(filename, block_size=DEFAULT_BLOCK_SIZE):
+    """Like iter_hex_blocks, but for 32-bit word tokens"""
+    return _iter_decoded(filename, block_size, decode_hex_words)
+
+
+def first_token_digits(filename, peek=4096):
+    """Return the digit count of the first hex token in filename, or 0"""
+    with open(filename, 'rb') as f:
+        match = re.search(b'0x([0-9A-Fa-f]+)', f.read(peek))
+    return len(match.group(1)) if match else 0
+
+
+def _iter_decoded(filename, block_size, decoder):
+    if os.path.getsize(filename) == 0:
+        return
+
+    with open(filename, 'rb') as f:
+        mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        try:
+            for chunk in _iter_chunks(mm, block_size):
+                block = decoder(chunk)
+                if block:
+                    yield block
+        finally:
+            mm.close()
+
+
+def decode_hex_text(text):
+    """Decode every 0xHH token in text, keeping the first two digits of longer tokens"""
+    packed = text.translate(None, SEPARATORS)
+    block = _decode_uniform(packed, text.count(b'0x'), 2)
+    if block is None:
+        # Comments or mixed token widths: fall back to one regex pass,
+        # still without a Python level loop per byte
+        block = binascii.unhexlify(b''.join(HEX_BYTE_PATTERN.findall(text)))
+    return block
+
+
+def decode_hex_words(text):
+    """Decode every 0xHHHHHHHH token in text into 4 big endian bytes"""
+    packed = text.translate(None, SEPARATORS)
+    block = _decode_uniform(packed, text.count(b'0x'), 8)
+    if block is None:
+        words = HEX_WORD_PATTERN.findall(text)
+        block = binascii.unhexlify(b''.join(word.rjust(8, b'0') for word in words))
+    return block
+
+
+def _decode_uniform(packed, token_count, digits):
+    """
+    Fast path for dumps where every token has the same width,
+    e.g. "0x39,0x5A,..." or "0x000004d8,0x00000001,...".
+    Keeps the first digits characters of each token.
+    Returns None if packed is not made of such tokens only.
+    """
+    if not packed.startswith(b'0x'):
+        return None
+
+    stride = packed.find(b'0x', 2)
+    if stride < 0:
+        stride = len(packed)
+    if stride < digits + 2 or len(packed) % stride:
+        return None
+    if digits > 2 and stride != digits + 2:
+        # Word tokens must be zero padded to the full width
+        return None
+
+    count = len(packed) // stride
+    if (count != token_count
+            or packed.count(b'x') != count
+            or packed[0::stride] != b'0' * count
+            or packed[1::stride] != b'x' * count):
+        return None
+
+    hex_digits = bytearray(count * digits)
+    for i in range(digits):
+        hex_digits[i::digits] = packed[2 + i::stride]
+    try:
+        return binascii.unhexlify(bytes(hex_digits))
+    except (binascii.Error, TypeError):
+        return None
+
+
+def _iter_chunks(mm, block_size):
+    """Split the mapped text into chunks that end on a separator"""
+    size = len(mm)
+    start = 0
+    while start < size:
+        end = min(start + block_size, size)
+        while end < size:
+            cut = max(mm.rfind(sep, start, end) for sep in _SEPARATOR_BYTES)
+            if cut >= start:
+                end = cut + 1
+                break
+            # No separator in this window yet, widen it
+            end = min(end + block_size, size)
+        yield mm[start:end]
+        start = end
+
@@ -0,0 +1,554 @@
+"""
+Boot logo decoder for ct952-dmp-121 (LOGO.TXT, logo_dbg.txt, logo*.bin)
+Parses the VLCs of an MPEG-1/MPEG-2 intra picture slice by slice, then dequantizes, inverse transforms and colour converts every macroblock at once
+Compatible with Python 2.7
+
+A logo starts with an 8 byte header: a tag, 'M' for an MPEG elementary
+stream or 'Z' for a JFIF image (which PIL decodes), the payload size in
+DWORDs (24 bits, big endian) and four zero bytes.
+"""
+
+import argparse
+import io
+import os
+import struct
+import sys
+import time
+
+import numpy as np
+from PIL import Image
+
+import ct952_colorspace
+import ct952_hexparse
+
+LOGO_HEADER_SIZE = 8
+LOGO_MPEG = 0x4D        # 'M'
+LOGO_JPEG = 0x5A        # 'Z'
+LOGO_KINDS = {LOGO_MPEG: "MPEG", LOGO_JPEG: "JPEG"}
+
+# Start codes (ISO/IEC 13818-2 table 6-1)
+PICTURE_START = 0x00
+SLICE_FIRST = 0x01
+SLICE_LAST = 0xAF
+SEQUENCE_HEADER = 0xB3
+EXTENSION_START = 0xB5
+SEQUENCE_END = 0xB7
+
+SEQUENCE_EXTENSION = 1
+QUANT_MATRIX_EXTENSION = 3
+PICTURE_CODING_EXTENSION = 8
+
+I_PICTURE = 1
+FRAME_PICTURE = 3
+CHROMA_420 = 1
+
+ZIGZAG_SCAN = np.array([
+    0, 1, 8, 16, 9, 2, 3, 10, 17, 24, 32, 25, 18, 11, 4, 5,
+    12, 19, 26, 33, 40, 48, 41, 34, 27, 20, 13, 6, 7, 14, 21, 28,
+    35, 42, 49, 56, 57, 50, 43, 36, 29, 22, 15, 23, 30, 37, 44, 51,
+    58, 59, 52, 45, 38, 31, 39, 46, 53, 60, 61, 54, 47, 55, 62, 63])
+ALTERNATE_SCAN = np.array([
+    0, 8, 16, 24, 1, 9, 2, 10, 17, 25, 32, 40, 48, 56, 57, 49,
+    41, 33, 26, 18, 3, 11, 4, 12, 19, 27, 34, 42, 50, 58, 35, 43,
+    51, 59, 20, 28, 5, 13, 6, 14, 21, 29, 36, 44, 52, 60, 37, 45,
+    53, 61, 22, 30, 7, 15, 23, 31, 38, 46, 54, 62, 39, 47, 55, 63])
+
+# In raster order
+DEFAULT_INTRA_MATRIX = np.array([
+    8, 16, 19, 22, 26, 27, 29, 34,
+    16, 16, 22, 24, 27, 29, 34, 37,
+    19, 22, 26, 27, 29, 34, 34, 38,
+    22, 22, 26, 27, 29, 34, 37, 40,
+    22, 26, 27, 29, 32, 35, 40, 48,
+    26, 27, 29, 32, 35, 40, 48, 58,
+    26, 27, 29, 34, 38, 46, 56, 69,
+    27, 29, 35, 38, 46, 56, 69, 83])
+
+# quantiser_scale_code to quantiser_scale when q_scale_type is 1 (table 7-6)
+NON_LINEAR_QUANTISER_SCALE = [
+    0, 1, 2, 3, 4, 5, 6, 7, 8, 10, 12, 14, 16, 18, 20, 22,
+    24, 28, 32, 36, 40, 44, 48, 52, 56, 64, 72, 80, 88, 96, 104, 112]
+
+STUFFING = 'stuffing'
+ESCAPE = 'escape'
+END_OF_BLOCK = 'eob'
+
+# Table B-1, macroblock_address_increment (stuffing is MPEG-1 only)
+MACROBLOCK_ADDRESS_INCREMENT = [
+    ('1', 1), ('011', 2), ('010', 3), ('0011', 4), ('0010', 5), ('00011', 6), ('00010', 7),
+    ('0000111', 8), ('0000110', 9), ('00001011', 10), ('00001010', 11), ('00001001', 12),
+    ('00001000', 13), ('00000111', 14), ('00000110', 15), ('0000010111', 16),
+    ('0000010110', 17), ('0000010101', 18), ('0000010100', 19), ('0000010011', 20),
+    ('0000010010', 21), ('00000100011', 22), ('00000100010', 23), ('00000100001', 24),
+    ('00000100000', 25), ('00000011111', 26), ('00000011110', 27), ('00000011101', 28),
+    ('00000011100', 29), ('00000011011', 30), ('00000011010', 31), ('00000011001', 32),
+    ('00000011000', 33), ('00000001111', STUFFING), ('00000001000', ESCAPE)]
+
+# Tables B-12 and B-13, dct_dc_size_luminance and dct_dc_size_chrominance
+DC_SIZE_LUMINANCE = [
+    ('100', 0), ('00', 1), ('01', 2), ('101', 3), ('110', 4), ('1110', 5), ('11110', 6),
+    ('111110', 7), ('1111110', 8), ('11111110', 9), ('111111110', 10), ('111111111', 11)]
+DC_SIZE_CHROMINANCE = [
+    ('00', 0), ('01', 1), ('10', 2), ('110', 3), ('1110', 4), ('11110', 5), ('111110', 6),
+    ('1111110', 7), ('11111110', 8), ('111111110', 9), ('1111111110', 10), ('1111111111', 11)]
+
+# Table B-14, DCT coefficients table zero, as (code without the sign bit, run, level).
+# The first coefficient's '1s' code does not apply: intra DC is coded apart.
+DCT_TABLE_ZERO = [
+    ('10', END_OF_BLOCK, 0), ('000001', ESCAPE, 0),
+    ('11', 0, 1), ('011', 1, 1), ('0100', 0, 2), ('0101', 2, 1), ('00101', 0, 3),
+    ('00111', 3, 1), ('00110', 4, 1), ('000110', 1, 2), ('000111', 5, 1), ('000101', 6, 1),
+    ('000100', 7, 1), ('0000110', 0, 4), ('0000100', 2, 2), ('0000111', 8, 1),
+    ('0000101', 9, 1), ('00100110', 0, 5), ('00100001', 0, 6), ('00100101', 1, 3),
+    ('00100100', 3, 2), ('00100111', 10, 1), ('00100011', 11, 1), ('00100010', 12, 1),
+    ('00100000', 13, 1), ('0000001010', 0, 7), ('0000001100', 1, 4), ('0000001011', 2, 3),
+    ('0000001111', 4, 2), ('0000001001', 5, 2), ('0000001110', 14, 1), ('0000001101', 15, 1),
+    ('0000001000', 16, 1), ('000000011101', 0, 8), ('000000011000', 0, 9),
+    ('000000010011', 0, 10), ('000000010000', 0, 11), ('000000011011', 1, 5),
+    ('000000010100', 2, 4), ('000000011100', 3, 3), ('000000010010', 4, 3),
+    ('000000011110', 6, 2), ('000000010101', 7, 2), ('000000010001', 8, 2),
+    ('000000011111', 17, 1), ('000000011010', 18, 1), ('000000011001', 19, 1),
+    ('000000010111', 20, 1), ('000000010110', 21, 1), ('0000000011010', 0, 12),
+    ('0000000011001', 0, 13), ('0000000011000', 0, 14), ('0000000010111', 0, 15),
+    ('0000000010110', 1, 6), ('0000000010101', 1, 7), ('0000000010100', 2, 5),
+    ('0000000010011', 3, 4), ('0000000010010', 5, 3), ('0000000010001', 9, 2),
+    ('0000000010000', 10, 2), ('0000000011111', 22, 1), ('0000000011110', 23, 1),
+    ('0000000011101', 24, 1), ('0000000011100', 25, 1), ('0000000011011', 26, 1)]
+DCT_TABLE_ZERO += [(format(0x1F - i, '014b'), 0, 16 + i) for i in range(16)]
+DCT_TABLE_ZERO += [(format(0x18 - i, '015b'), 0, 32 + i) for i in range(9)]
+DCT_TABLE_ZERO += [(format(0x1F - i, '015b'), 1, 8 + i) for i in range(7)]
+DCT_TABLE_ZERO += [(format(0x13 - i, '016b'), 1, 15 + i) for i in range(4)]
+DCT_TABLE_ZERO += [('0000000000010100', 6, 3)]
+DCT_TABLE_ZERO += [(format(0x1A - i, '016b'), 11 + i, 2) for i in range(6)]
+DCT_TABLE_ZERO += [(format(0x1F - i, '016b'), 27 + i, 1) for i in range(5)]
+
+# Table B-15, DCT coefficients table one (intra_vlc_format 1): table zero
+# with new codes for the most frequent run/level pairs
+_TABLE_ONE_CODES = [
+    ('0110', END_OF_BLOCK, 0), ('000001', ESCAPE, 0),
+    ('10', 0, 1), ('110', 0, 2), ('0111', 0, 3), ('11100', 0, 4), ('11101', 0, 5),
+    ('000101', 0, 6), ('000100', 0, 7), ('1111011', 0, 8), ('1111100', 0, 9),
+    ('00100011', 0, 10), ('00100010', 0, 11), ('11111010', 0, 12), ('11111011', 0, 13),
+    ('11111110', 0, 14), ('11111111', 0, 15), ('010', 1, 1), ('00110', 1, 2),
+    ('1111001', 1, 3), ('00100111', 1, 4), ('00100000', 1, 5), ('00101', 2, 1),
+    ('0000111', 2, 2), ('11111100', 2, 3), ('0000001100', 2, 4), ('00111', 3, 1),
+    ('00100110', 3, 2), ('000110', 4, 1), ('11111101', 4, 2), ('000111', 5, 1),
+    ('000000100', 5, 2), ('0000110', 6, 1), ('0000100', 7, 1), ('0000101', 8, 1),
+    ('1111000', 9, 1), ('1111010', 10, 1), ('00100001', 11, 1), ('00100101', 12, 1),
+    ('00100100', 13, 1), ('000000101', 14, 1), ('000000111', 15, 1), ('0000001101', 16, 1)]
+_REPLACED = set((run, level) for code, run, level in _TABLE_ONE_CODES)
+DCT_TABLE_ONE = _TABLE_ONE_CODES + [entry for entry in DCT_TABLE_ZERO
+                                    if (entry[1], entry[2]) not in _REPLACED]
+
+# Longest codes, and so the peek each lookup table is indexed by
+ADDRESS_BITS = 11
+DC_LUMINANCE_BITS = 9
+DC_CHROMINANCE_BITS = 10
+DCT_BITS = 16
+
+_TABLES = {}
+
+
+def _lookup(codes, bits):
+    """List indexed by the next bits of the stream: (value, code length), None for invalid codes"""
+    table = [None] * (1 << bits)
+    for code, value in codes:
+        shift = bits - len(code)
+        first = int(code, 2) << shift
+        table[first:first + (1 << shift)] = [(value, len(code))] * (1 << shift)
+    return table
+
+
+def _tables():
+    """VLC lookup tables, built on first use"""
+    if not _TABLES:
+        _TABLES['address'] = _lookup(MACROBLOCK_ADDRESS_INCREMENT, ADDRESS_BITS)
+        _TABLES['dc'] = (_lookup(DC_SIZE_LUMINANCE, DC_LUMINANCE_BITS),
+                         _lookup(DC_SIZE_CHROMINANCE, DC_CHROMINANCE_BITS))
+        for name, codes in (('dct0', DCT_TABLE_ZERO), ('dct1', DCT_TABLE_ONE)):
+            _TABLES[name] = _lookup([(code, (run, level)) for code, run, level in codes], DCT_BITS)
+    return _TABLES
+
+
+class BitReader(object):
+    """Most significant bit first reads of up to 25 bits from a byte string"""
+
+    def __init__(self, data, offset=0):
+        # Padded so a peek past the end reads zeros, which look like a start code
+        self.data = bytes(data) + b'\0' * 4
+        self.position = offset * 8
+
+    def peek(self, count):
+        word = struct.unpack_from('>I', self.data, self.position >> 3)[0]
+        return (word >> (32 - (self.position & 7) - count)) & ((1 << count) - 1)
+
+    def read(self, count):
+        value = self.peek(count)
+        self.position += count
+        return value
+
+    def skip(self, count):
+        self.position += count
+
+
+def start_codes(data):
+    """(code, offset of the byte after it) of every start code in data"""
+    data = bytes(data)
+    codes = []
+    offset = data.find(b'\0\0\1')
+    while 0 <= offset < len(data) - 3:
+        codes.append((bytearray(data[offset + 3:offset + 4])[0], offset + 4))
+        offset = data.find(b'\0\0\1', offset + 3)
+    return codes
+
+
+def _quant_matrix(reader):
+    """A 64 entry matrix in zigzag order, returned in raster order"""
+    matrix = np.empty(64, dtype=np.int64)
+    matrix[ZIGZAG_SCAN] = [reader.read(8) for _ in range(64)]
+    return matrix
+
+
+class IntraPicture(object):
+    """
+    The first picture of an MPEG-1 or MPEG-2 video stream, which must be an
+    I picture, 4:2:0 and frame coded. The constructor parses the headers and
+    every slice into per block DC values, quantiser scales and (flat index,
+    level) pairs; the transform stages then work on all blocks at once.
+    """
+
+    def __init__(self, data):
+        self.data = bytes(data)
+        self.mpeg2 = False
+        self.width = self.height = 0
+        self.intra_matrix = DEFAULT_INTRA_MATRIX
+        self.chroma_format = CHROMA_420
+        self.intra_dc_precision = 0
+        self.picture_structure = FRAME_PICTURE
+        self.frame_pred_frame_dct = True
+        self.concealment_motion_vectors = False
+        self.q_scale_type = 0
+        self.intra_vlc_format = 0
+        self.alternate_scan = False
+
+        slices = []
+        picture = False
+        for code, offset in start_codes(self.data):
+            reader = BitReader(self.data, offset)
+            if code == SEQUENCE_HEADER and not picture:
+                self._sequence_header(reader)
+            elif code == EXTENSION_START:
+                self._extension(reader)
+            elif code == PICTURE_START:
+                if picture:
+                    break
+                picture = True
+                reader.skip(10)
+                if reader.read(3) != I_PICTURE:
+                    raise ValueError("First picture is not an I picture")
+            elif picture and SLICE_FIRST <= code <= SLICE_LAST:
+                slices.append((code, offset))
+            elif code == SEQUENCE_END:
+                break
+
+        if not self.width or not picture:
+            raise ValueError("No sequence header or picture")
+        if self.chroma_format != CHROMA_420 or self.picture_structure != FRAME_PICTURE:
+            raise ValueError("Only 4:2:0 frame pictures are supported")
+        if self.concealment_motion_vectors:
+            raise ValueError("Concealment motion vectors are not supported")
+
+        self.mb_width = (self.width + 15) // 16
+        self.mb_height = (self.height + 15) // 16
+        macroblocks = self.mb_width * self.mb_height
+        self.dc = np.zeros(macroblocks * 6, dtype=np.int64)
+        self.quantiser_scale = np.zeros(macroblocks, dtype=np.int64)
+        self.field_dct = np.zeros(macroblocks, dtype=bool)
+        self.indices = []
+        self.levels = []
+        self.decoded = 0
+        scan = (ALTERNATE_SCAN if self.alternate_scan else ZIGZAG_SCAN).tolist()
+        for code, offset in slices:
+            self._slice(BitReader(self.data, offset), code - 1, scan)
+
+    def _sequence_header(self, reader):
+        self.width = reader.read(12)
+        self.height = reader.read(12)
+        reader.skip(4 + 4 + 18 + 1 + 10 + 1)
+        if reader.read(1):
+            self.intra_matrix = _quant_matrix(reader)
+        else:
+            self.intra_matrix = DEFAULT_INTRA_MATRIX
+
+    def _extension(self, reader):
+        kind = reader.read(4)
+        if kind == SEQUENCE_EXTENSION:
+            self.mpeg2 = True
+            reader.skip(8 + 1)
+            self.chroma_format = reader.read(2)
+            self.width |= reader.read(2) << 12
+            self.height |= reader.read(2) << 12
+        elif kind == QUANT_MATRIX_EXTENSION:
+            if reader.read(1):
+                self.intra_matrix = _quant_matrix(reader)
+        elif kind == PICTURE_CODING_EXTENSION:
+            reader.skip(16)
+            self.intra_dc_precision = reader.read(2)
+            self.picture_structure = reader.read(2)
+            reader.skip(1)
+            self.frame_pred_frame_dct = bool(reader.read(1))
+            self.concealment_motion_vectors = bool(reader.read(1))
+            self.q_scale_type = reader.read(1)
+            self.intra_vlc_format = reader.read(1)
+            self.alternate_scan = bool(reader.read(1))
+
+    def _quantiser_scale(self, code):
+        if self.q_scale_type:
+            return NON_LINEAR_QUANTISER_SCALE[code]
+        return code * 2
+
+    def _slice(self, reader, row, scan):
+        """Decode the macroblocks of one slice; row is its slice_vertical_position - 1"""
+        tables = _tables()
+        address_table = tables['address']
+        dc_tables = tables['dc']
+        dct_table = tables['dct1' if self.intra_vlc_format else 'dct0']
+        indices, levels, dc = self.indices, self.levels, self.dc
+        peek, read, skip = reader.peek, reader.read, reader.skip
+        mpeg2 = self.mpeg2
+        dct_type_coded = mpeg2 and not self.frame_pred_frame_dct
+        reset = 1 << (7 + self.intra_dc_precision)
+        macroblocks = len(self.quantiser_scale)
+
+        quantiser_scale = self._quantiser_scale(read(5))
+        while read(1):
+            skip(8)     # extra_information_slice
+        address = row * self.mb_width - 1
+        first = True
+        predictors = [reset] * 3
+        while True:
+            increment = 0
+            while True:
+                entry = address_table[peek(ADDRESS_BITS)]
+                if entry is None:
+                    raise ValueError("Bad macroblock address increment at bit {}".format(reader.position))
+                skip(entry[1])
+                if entry[0] is ESCAPE:
+                    increment += 33
+                elif entry[0] is not STUFFING:
+                    increment += entry[0]
+                    break
+            if increment > 1 and not first:
+                predictors = [reset] * 3
+            first = False
+            address += increment
+            if address >= macroblocks:
+                raise ValueError("Macroblock address {} outside the picture".format(address))
+
+            # macroblock_type of an I picture: '1' intra, '01' intra with quantiser_scale_code
+            quant = not read(1)
+            if quant and not read(1):
+                raise ValueError("Not an intra macroblock at bit {}".format(reader.position))
+            if dct_type_coded:
+                self.field_dct[address] = read(1)
+            if quant:
+                quantiser_scale = self._quantiser_scale(read(5))
+            self.quantiser_scale[address] = quantiser_scale
+
+            for block in range(6):
+                component = 0 if block < 4 else block - 3
+                entry = dc_tables[component != 0][peek(DC_CHROMINANCE_BITS if component else DC_LUMINANCE_BITS)]
+                if entry is None:
+                    raise ValueError("Bad DC size at bit {}".format(reader.position))
+                skip(entry[1])
+                size = entry[0]
+                if size:
+                    differential = read(size)
+                    if differential < 1 << (size - 1):
+                        differential -= (1 << size) - 1
+                    predictors[component] += differential
+                base = (address * 6 + block) * 64
+                dc[address * 6 + block] = predictors[component]
+
+                position = 0
+                while True:
+                    entry = dct_table[peek(DCT_BITS)]
+                    if entry is None:
+                        raise ValueError("Bad DCT coefficient code at bit {}".format(reader.position))
+                    skip(entry[1])
+                    run, level = entry[0]
+                    if run is END_OF_BLOCK:
+                        break
+                    if run is ESCAPE:
+                        run = read(6)
+                        if mpeg2:
+                            level = read(12)
+                            if level >= 2048:
+                                level -= 4096
+                        else:
+                            level = read(8)
+                            if level == 0:
+                                level = read(8)
+                            elif level == 128:
+                                level = read(8) - 256
+                            elif level > 128:
+                                level -= 256
+                    elif read(1):
+                        level = -level
+                    position += run + 1
+                    if position > 63:
+                        raise ValueError("Too many DCT coefficients at bit {}".format(reader.position))
+                    indices.append(base + scan[position])
+                    levels.append(level)
+            self.decoded += 1
+
+            # Slices end at the next start code, whose 23 zero bits cannot start a macroblock
+            if peek(23) == 0:
+                break
+
+    def coefficients(self):
+        """Dequantized (blocks, 64) coefficients in raster order (ISO/IEC 13818-2 7.4)"""
+        quantized = np.zeros(len(self.dc) * 64, dtype=np.int64)
+        quantized[np.array(self.indices, dtype=np.int64)] = self.levels
+        quantized = quantized.reshape(-1, 64)
+        # Linear scales are stored doubled, which gives MPEG-1's 2 * level * scale * W / 16
+        scale = np.repeat(self.quantiser_scale, 6)[:, np.newaxis]
+        product = quantized * self.intra_matrix * scale * 2
+        coefficients = np.sign(product) * (np.abs(product) // 32)
+        if not self.mpeg2:
+            # MPEG-1 oddification: even reconstructed levels move towards zero
+            even = (coefficients & 1) == 0
+            coefficients[even] -= np.sign(coefficients[even])
+        coefficients[:, 0] = self.dc * (8 >> self.intra_dc_precision)
+        np.clip(coefficients, -2048, 2047, out=coefficients)
+        if self.mpeg2:
+            # Mismatch control: toggle the last coefficient's LSB when the sum is even
+            even = (coefficients.sum(axis=1) & 1) == 0
+            coefficients[even, 63] ^= 1
+        return coefficients
+
+    def blocks(self):
+        """(blocks, 8, 8) uint8 samples: one inverse DCT for every block"""
+        coefficients = self.coefficients().reshape(-1, 8, 8).astype(np.float64)
+        samples = np.matmul(np.matmul(IDCT_MATRIX.T, coefficients), IDCT_MATRIX)
+        return np.clip(np.rint(samples), 0, 255).astype(np.uint8)
+
+    def planes(self):
+        """Y, Cb and Cr planes, cropped to the picture size (chroma at half size)"""
+        rows, columns = self.mb_height, self.mb_width
+        blocks = self.blocks().reshape(rows, columns, 6, 8, 8)
+
+        luma = blocks[:, :, :4].reshape(rows, columns, 2, 2, 8, 8)
+        luma = luma.transpose(0, 1, 2, 4, 3, 5).reshape(rows, columns, 16, 16)
+        if self.field_dct.any():
+            # Field DCT macroblocks hold the top field in blocks 0 and 1
+            fields = np.empty_like(luma)
+            fields[:, :, 0::2] = luma[:, :, :8]
+            fields[:, :, 1::2] = luma[:, :, 8:]
+            field_dct = self.field_dct.reshape(rows, columns)[:, :, np.newaxis, np.newaxis]
+            luma = np.where(field_dct, fields, luma)
+        luma = luma.transpose(0, 2, 1, 3).reshape(rows * 16, columns * 16)
+
+        chroma = [blocks[:, :, block].transpose(0, 2, 1, 3).reshape(rows * 8, columns * 8)
+                  for block in (4, 5)]
+        chroma_height, chroma_width = (self.height + 1) // 2, (self.width + 1) // 2
+        return (luma[:self.height, :self.width],
+                chroma[0][:chroma_height, :chroma_width],
+                chroma[1][:chroma_height, :chroma_width])
+
+    def to_image(self):
+        """RGB image: chroma upsampled by repetition, then studio range BT.601"""
+        luma, cb, cr = self.planes()
+        yuv = np.empty(luma.shape + (3,), dtype=np.uint8)
+        yuv[..., 0] = luma
+        for channel, plane in ((1, cb), (2, cr)):
+            yuv[..., channel] = plane.repeat(2, axis=0).repeat(2, axis=1)[:self.height, :self.width]
+        return Image.fromarray(ct952_colorspace.yuv_to_rgb(yuv, ct952_colorspace.STUDIO_RANGE), 'RGB')
+
+
+def _idct_matrix():
+    n = np.arange(8)
+    matrix = np.cos((2 * n[np.newaxis, :] + 1) * n[:, np.newaxis] * np.pi / 16) / 2
+    matrix[0] /= np.sqrt(2)
+    return matrix
+
+
+# IDCT_MATRIX[k, n]: basis function k at sample n, so f = C.T F C
+IDCT_MATRIX = _idct_matrix()
+
+
+def logo_kind(data):
+    """LOGO_MPEG or LOGO_JPEG for a logo (with its header or a bare stream), else None"""
+    head = bytearray(data[:LOGO_HEADER_SIZE])
+    if len(head) == LOGO_HEADER_SIZE and head[0] in LOGO_KINDS and not any(head[4:]):
+        return head[0]
+    if head[:4] == bytearray(b'\0\0\1\xb3'):
+        return LOGO_MPEG
+    if head[:2] == bytearray(b'\xff\xd8'):
+        return LOGO_JPEG
+    return None
+
+
+def logo_payload(data):
+    """The stream of a logo, without its header"""
+    head = bytearray(data[:LOGO_HEADER_SIZE])
+    if len(head) == LOGO_HEADER_SIZE and head[0] in LOGO_KINDS and not any(head[4:]):
+        size = (head[1] << 16 | head[2] << 8 | head[3]) * 4
+        return data[LOGO_HEADER_SIZE:LOGO_HEADER_SIZE + size]
+    return data
+
+
+def decode_logo(data):
+    """RGB image of a logo: MPEG decoded here, JPEG through PIL; bad data raises ValueError"""
+    kind = logo_kind(data)
+    if kind is None:
+        raise ValueError("Not an MPEG or JPEG logo")
+    payload = bytes(logo_payload(data))
+    if kind == LOGO_JPEG:
+        try:
+            return Image.open(io.BytesIO(payload)).convert('RGB')
+        except IOError as e:
+            raise ValueError("Bad JPEG logo: {}".format(e))
+    return IntraPicture(payload).to_image()
+
+
+def load_logo(filename):
+    """Logo bytes of a hex dump (.txt) or a binary file"""
+    if os.path.splitext(filename)[1].lower() == '.txt':
+        return ct952_hexparse.parse_hex_file(filename)
+    with open(filename, 'rb') as f:
+        return f.read()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Decode boot logos (LOGO.TXT, logo_dbg.txt, logo*.bin) and save them as PNG.")
+    parser.add_argument('files', nargs='+', help="logo hex dumps or binaries")
+    parser.add_argument('-o', '--output', help="PNG file, for a single logo (default: the name + .png)")
+    parser.add_argument('--repeat', type=int, default=1, help="decode this many times, for timing")
+    args = parser.parse_args(argv)
+
+    if args.output and len(args.files) > 1:
+        parser.error("-o needs a single logo")
+
+    status = 0
+    for filename in args.files:
+        try:
+            data = load_logo(filename)
+            start = time.time()
+            for _ in range(max(1, args.repeat)):
+                image = decode_logo(data)
+            elapsed = (time.time() - start) / max(1, args.repeat)
+        except (IOError, OSError, ValueError) as e:
+            sys.stderr.write("{}: {}\n".format(filename, e))
+            status = 1
+            continue
+        output = args.output or os.path.splitext(filename)[0] + ".png"
+        image.save(output)
+        print("{}: {}x{} {} logo decoded in {:.1f} ms".format(
+            output, image.size[0], image.size[1], LOGO_KINDS[logo_kind(data)], elapsed * 1000))
+    return status
+
+
+if __name__ == "__main__":
+    sys.exit(main())
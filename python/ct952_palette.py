@@ -0,0 +1,154 @@
+"""
+Firmware palettes (BMP/pal*.txt) for the ct952-dmp-121 bitmap browser
+Converts a count-prefixed palette table into an RGB lookup table once
+Compatible with Python 2.7
+"""
+
+import os
+
+import numpy as np
+
+import ct952_colorspace
+import ct952_hexparse
+
+PALETTE_SIZE = 256
+
+# gdi.h
+GDI_BITMAP_PALETTE_INDEX_START = 155
+PAL_ENTRY_COLOR_TRANSPARENT = 0
+GDI_VALUE_YUV = 0x5A000000
+
+# bStartNumber of the GDI_PALETTE_INFO each palette is loaded with
+PALETTE_START = {
+    'palmenu.txt': GDI_BITMAP_PALETTE_INDEX_START,      # dvdsetup.c toolbar
+    'palng.txt': GDI_BITMAP_PALETTE_INDEX_START,        # osddsply.c navigator
+    'palnumber.txt': 8,                                 # CLOCK_BITMAP_PALETTE_INDEX_START
+    'palpoweronmenu.txt': 55,                           # POWERONMENU_BITMAP_PALETTE_INDEX_START
+    'palradiobg.txt': 85,                               # RADIO_BITMAP_PALETTE_INDEX_START
+    'palsetup.txt': 95,                                 # setup.c
+    'palscr.txt': 95,                                   # osdss.c
+}
+
+
+# Palette each BMP/ bitmap is drawn with, from the #include lists of the
+# module that owns it (lower case, without extension)
+_POWERONMENU_ICONS = ('photo', 'music', 'photo_audio', 'movie', 'setup', 'calender',
+                      'clock', 'alarm', 'autopower', 'edit', 'favor', 'radio', 'stb', 'game')
+BITMAP_PALETTE = {}
+BITMAP_PALETTE.update(('menu_' + name + suffix, 'palpoweronmenu.txt')    # poweronmenu.c
+                      for name in _POWERONMENU_ICONS for suffix in ('', '_h'))
+BITMAP_PALETTE.update(('menu_' + name, 'palmenu.txt')                    # dvdsetup.c
+                      for name in ('photosetting', 'autoplay', 'display', 'custom', 'exit'))
+BITMAP_PALETTE.update((name, 'palnumber.txt')                            # clock.c
+                      for name in [str(digit) for digit in range(10)] + ['colon'])
+BITMAP_PALETTE['speaker'] = 'palsetup.txt'                              # setup.c
+
+# Whole families that share one palette
+BITMAP_PALETTE_PREFIX = (
+    ('ng_', 'palng.txt'),               # osddsply.c
+    ('radio_', 'palradiobg.txt'),       # radio.c
+)
+
+
+class Palette(object):
+    """
+    A palette table as GDI_LoadPalette copies it into _dwGDIPalette.
+    Entries are hardware values: [24] mix enable, [23:16] Y, [15:8] Cb, [7:0] Cr.
+    The RGB conversion is done once, here; placing it at a start index is a copy.
+    """
+
+    def __init__(self, entries, start=GDI_BITMAP_PALETTE_INDEX_START, name=""):
+        self.entries = np.asarray(entries, dtype=np.uint32)
+        self.start = start
+        self.name = name
+        self.mix = ((self.entries >> 24) & 1).astype(bool)
+        self.rgb = ycbcr_to_rgb(self.entries)
+        self._luts = {}
+
+    def __len__(self):
+        return len(self.entries)
+
+    def lut(self, start=None):
+        """
+        Return the 256 entry RGB palette as 768 bytes for Image.putpalette,
+        with this table placed at start (bStartNumber).
+        """
+        if start is None:
+            start = self.start
+        lut = self._luts.get(start)
+        if lut is None:
+            table = np.zeros((PALETTE_SIZE, 3), dtype=np.uint8)
+            count = max(0, min(len(self.rgb), PALETTE_SIZE - start))
+            table[start:start + count] = self.rgb[:count]
+            lut = table.tobytes()
+            self._luts[start] = lut
+        return lut
+
+    def __repr__(self):
+        return "Palette({!r}, {} entries at {})".format(self.name, len(self), self.start)
+
+
+def load_palette(filename, start=None):
+    """Load a count-prefixed palette table such as BMP/palMenu.txt"""
+    data = ct952_hexparse.parse_hex_words(filename)
+    words = np.frombuffer(data, dtype='>u4')
+    count = int(words[0])
+    if count == 0 or count > PALETTE_SIZE or count >= len(words):
+        raise ValueError("Not a palette table: first word is {:#x}".format(count))
+
+    if start is None:
+        start = default_start(filename)
+    return Palette(words[1:1 + count], start, os.path.basename(filename))
+
+
+def default_start(filename):
+    """bStartNumber the firmware loads this palette file at"""
+    return PALETTE_START.get(os.path.basename(filename).lower(),
+                             GDI_BITMAP_PALETTE_INDEX_START)
+
+
+def palette_for_bitmap(filename):
+    """Lower case file name of the palette the firmware draws this bitmap with, or None"""
+    name = os.path.splitext(os.path.basename(filename))[0].lower()
+    if name in BITMAP_PALETTE:
+        return BITMAP_PALETTE[name]
+    for prefix, palette in BITMAP_PALETTE_PREFIX:
+        if name.startswith(prefix):
+            return palette
+    return None
+
+
+def find_palette_file(filename):
+    """Path of the palette for this bitmap in the same directory, or None"""
+    palette = palette_for_bitmap(filename)
+    if palette is None:
+        return None
+
+    directory = os.path.dirname(filename) or os.curdir
+    for name in os.listdir(directory):
+        if name.lower() == palette:
+            return os.path.join(directory, name)
+    return None
+
+
+def entries_to_ycbcr(values):
+    """
+    Convert GDI_ChangePALEntry arguments to hardware entries: values whose
+    top byte is 0x5A (bit 24 is the mix flag) are already YCbCr, the rest are
+    RGB and go through COMUTL_RGB2YUV. The mix flag is kept.
+    """
+    values = np.asarray(values, dtype=np.uint32)
+    is_yuv = (values & 0xFE000000) == GDI_VALUE_YUV
+    mix = values & 0x01000000
+    return np.where(is_yuv, values & 0xFFFFFF, rgb_to_ycbcr(values)) | mix
+
+
+def rgb_to_ycbcr(values):
+    """Integer COMUTL_RGB2YUV (NO_FLOAT_POINT) on packed 0x00RRGGBB values"""
+    return ct952_colorspace.comutl_rgb2yuv(np.asarray(values, dtype=np.uint32) & 0xFFFFFF)
+
+
+def ycbcr_to_rgb(entries):
+    """Convert packed 0x00YYUUVV entries to an (n, 3) uint8 RGB array (BT.601 studio range)"""
+    ycbcr = ct952_colorspace.unpack(entries)
+    return ct952_colorspace.yuv_to_rgb(ycbcr, ct952_colorspace.STUDIO_RANGE)
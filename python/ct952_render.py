@@ -0,0 +1,226 @@
+"""
+Headless batch renderer for ct952-dmp-121 bitmaps
+Decodes files or whole asset directories to PNG across a process pool, without Tkinter
+Compatible with Python 2.7
+"""
+
+import argparse
+import json
+import multiprocessing
+import os
+import sys
+import time
+
+import ct952_decode
+import ct952_fwbitmap
+import ct952_palette
+
+# Files picked up when a directory is given
+ASSET_EXTENSIONS = ('.txt', '.bin')
+
+# Short names for --format
+FORMAT_ALIASES = {
+    '1bit': ct952_decode.FORMAT_1BIT,
+    'gray8': ct952_decode.FORMAT_8BIT_GRAY,
+    'rgb565': ct952_decode.FORMAT_RGB565,
+    'rgb24': ct952_decode.FORMAT_RGB24,
+    'yuv24': ct952_decode.FORMAT_YUV24,
+    'idx2': ct952_decode.FORMAT_2BIT_INDEXED,
+    'idx4': ct952_decode.FORMAT_4BIT_INDEXED,
+    'idx8': ct952_decode.FORMAT_8BIT_INDEXED,
+}
+
+SUMMARY_NAME = "render_summary.json"
+
+# Palettes already loaded by this process, by (path, start)
+_PALETTES = {}
+
+
+def find_assets(paths):
+    """Expand directories to the bitmap dumps they hold, skipping palette tables"""
+    filenames = []
+    for path in paths:
+        if not os.path.isdir(path):
+            filenames.append(path)
+            continue
+        for name in sorted(os.listdir(path), key=str.lower):
+            lower = name.lower()
+            if lower.endswith(ASSET_EXTENSIONS) and not lower.startswith('pal'):
+                filenames.append(os.path.join(path, name))
+    return filenames
+
+
+def output_names(filenames):
+    """
+    PNG name of each file under the output directory: its path below the
+    files' common directory, so same-named files in different directories
+    do not overwrite each other
+    """
+    paths = [os.path.splitdrive(os.path.abspath(filename))[1].split(os.sep)
+             for filename in filenames]
+    common = len(os.path.commonprefix([path[:-1] for path in paths]))
+    return [os.path.join(*path[common:]) + ".png" for path in paths]
+
+
+def parse_size(text):
+    """Parse "WIDTHxHEIGHT" into a tuple of ints"""
+    try:
+        width, height = [int(part) for part in text.lower().split('x')]
+    except ValueError:
+        raise argparse.ArgumentTypeError("size must look like 320x240, not {!r}".format(text))
+    return width, height
+
+
+def parse_format(text):
+    """Accept a browser format name or one of FORMAT_ALIASES"""
+    if text in ct952_decode.DECODERS:
+        return text
+    if text.lower() in FORMAT_ALIASES:
+        return FORMAT_ALIASES[text.lower()]
+    raise argparse.ArgumentTypeError("unknown format {!r}, use one of: {}".format(
+        text, ", ".join(sorted(FORMAT_ALIASES))))
+
+
+def load_palette(filename, start=None):
+    key = (filename, start)
+    palette = _PALETTES.get(key)
+    if palette is None:
+        palette = _PALETTES[key] = ct952_palette.load_palette(filename, start)
+    return palette
+
+
+def render_file(job):
+    """
+    Decode one file and save it as a PNG. Runs in the worker processes,
+    so errors are reported in the returned summary instead of raised.
+    """
+    filename, options = job
+    record = {'file': filename}
+    start = time.time()
+    try:
+        try:
+            data, bitmap = ct952_fwbitmap.load_file(filename)
+        except ValueError as e:
+            # Not a hex dump at all, e.g. a makefile fragment
+            record['status'] = "skipped"
+            record['error'] = str(e)
+            return record
+
+        format_type = options.get('format_type')
+        size = options.get('size')
+
+        if bitmap is not None:
+            data = bitmap.payload
+            width, height = bitmap.width, bitmap.height
+            format_type = format_type or bitmap.format_type
+        elif format_type and size:
+            width, height = size
+        else:
+            record['status'] = "skipped"
+            record['error'] = "no bitmap header; give --format and --size to render raw data"
+            return record
+        if size:
+            width, height = size
+
+        palette = None
+        palette_file = options.get('palette')
+        if palette_file is None and format_type in ct952_decode.INDEXED_FORMATS.values():
+            palette_file = ct952_palette.find_palette_file(filename)
+        if palette_file is not None:
+            palette = load_palette(palette_file, options.get('palette_start'))
+            record['palette'] = palette.name
+
+        image = ct952_decode.decode(data, width, height, format_type,
+                                    palette.lut() if palette is not None else None)
+        output = os.path.join(options['output_dir'],
+                              options.get('output') or os.path.basename(filename) + ".png")
+        directory = os.path.dirname(output)
+        if directory and not os.path.isdir(directory):
+            try:
+                os.makedirs(directory)
+            except OSError:
+                # Made by another worker in the meantime
+                if not os.path.isdir(directory):
+                    raise
+        image.save(output)
+
+        record.update(status="ok", output=output, width=width, height=height,
+                      format=format_type, bytes=len(data))
+    except Exception as e:
+        record['status'] = "error"
+        record['error'] = str(e)
+    record['seconds'] = round(time.time() - start, 4)
+    return record
+
+
+def render_all(filenames, options, jobs=None):
+    """Render every file across a process pool, returning the summaries in file order"""
+    if jobs is None:
+        jobs = multiprocessing.cpu_count()
+    jobs = max(1, min(jobs, len(filenames)))
+    work = [(filename, dict(options, output=output))
+            for filename, output in zip(filenames, output_names(filenames))]
+    if jobs == 1:
+        return [render_file(job) for job in work]
+
+    pool = multiprocessing.Pool(jobs)
+    try:
+        return pool.map(render_file, work, chunksize=1)
+    finally:
+        pool.close()
+        pool.join()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        prog="render",
+        description="Decode bitmap dumps to PNG without the GUI. Firmware bitmaps "
+                    "use their header and the palette the firmware draws them "
+                    "with; other files need --format and --size.")
+    parser.add_argument('paths', nargs='+', help="bitmap files or directories (e.g. BMP/)")
+    parser.add_argument('-o', '--output-dir', default="render",
+                        help="where PNGs and {} go (default: %(default)s)".format(SUMMARY_NAME))
+    parser.add_argument('-f', '--format', dest='format_type', type=parse_format,
+                        help="override the format ({})".format(", ".join(sorted(FORMAT_ALIASES))))
+    parser.add_argument('-s', '--size', type=parse_size, help="override the size, WIDTHxHEIGHT")
+    parser.add_argument('-p', '--palette', help="palette table for indexed formats")
+    parser.add_argument('--palette-start', type=int,
+                        help="palette start index (default: the firmware's bStartNumber)")
+    parser.add_argument('-j', '--jobs', type=int, default=None,
+                        help="worker processes (default: one per CPU)")
+    args = parser.parse_args(argv)
+
+    if not os.path.isdir(args.output_dir):
+        os.makedirs(args.output_dir)
+
+    options = {
+        'output_dir': args.output_dir,
+        'format_type': args.format_type,
+        'size': args.size,
+        'palette': args.palette,
+        'palette_start': args.palette_start,
+    }
+
+    start = time.time()
+    records = render_all(find_assets(args.paths), options, args.jobs)
+    elapsed = time.time() - start
+
+    counts = {}
+    for record in records:
+        counts[record['status']] = counts.get(record['status'], 0) + 1
+        if record['status'] == "error":
+            sys.stderr.write("{}: {}\n".format(record['file'], record['error']))
+
+    summary = {'seconds': round(elapsed, 3), 'counts': counts, 'files': records}
+    summary_file = os.path.join(args.output_dir, SUMMARY_NAME)
+    with open(summary_file, 'w') as f:
+        json.dump(summary, f, indent=1, sort_keys=True)
+
+    print("Rendered {} of {} files in {:.2f} s ({} skipped, {} errors), summary in {}".format(
+        counts.get("ok", 0), len(records), elapsed, counts.get("skipped", 0),
+        counts.get("error", 0), summary_file))
+    return 1 if counts.get("error") else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,210 @@
+"""
+Scanner for bitmaps and palettes embedded in ct952-dmp-121 ROM and flash images
+Filters every DWORD of a memory mapped image at once and caches the hits in an index in the user cache directory
+Compatible with Python 2.7
+"""
+
+import collections
+import json
+import mmap
+import os
+import re
+
+import numpy as np
+
+import ct952_cachedir
+import ct952_fwbitmap
+import ct952_palette
+import ct952_unzip
+
+INDEX_SUFFIX = ".bmpidx.json"
+INDEX_VERSION = 1
+
+BITMAP = "bitmap"
+ZIPPED = "zipped"
+PALETTE = "palette"
+
+MIN_DIMENSION = 4               # smaller headers are mostly coincidences in code
+MAX_DIMENSION = 2048
+MIN_PALETTE = 4
+PALETTE_MATCH = 0.9             # share of entries that must look like YCbCr
+ZIP_PATTERN = re.compile(re.escape(ct952_unzip.UNZIP2006_SIGNATURE))
+MAX_ZIPPED_SIZE = 4 << 20       # bigger unpacked sizes are not bitmaps
+
+Hit = collections.namedtuple('Hit', 'kind offset length width height bits count')
+
+
+def scan_file(filename, use_index=True):
+    """
+    Return the Hits in a binary image, best read from the cached index.
+    A missing or stale index is rebuilt, and written if the directory allows.
+    """
+    if use_index:
+        hits = read_index(filename)
+        if hits is not None:
+            return hits
+
+    with open(filename, 'rb') as f:
+        if os.fstat(f.fileno()).st_size == 0:
+            return []
+        mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        try:
+            hits = scan(mm)
+        finally:
+            mm.close()
+
+    if use_index:
+        write_index(filename, hits)
+    return hits
+
+
+def scan(buffer):
+    """Find bitmap headers, zipped bitmaps and palette tables in buffer, by offset"""
+    hits = []
+    # Firmware arrays are DWORD aligned
+    words = np.frombuffer(buffer, dtype='>u4', count=len(buffer) // 4)
+    hits.extend(find_bitmaps(words))
+    hits.extend(find_palettes(words))
+    hits.extend(find_zipped(buffer))
+    hits.sort(key=lambda hit: hit.offset)
+    return hits
+
+
+def find_bitmaps(words):
+    """Headers whose size word is exactly the pixel words that width x height x bits need"""
+    if len(words) < 4:
+        return []
+    size, mode, width, height = [words[k:len(words) - 3 + k].astype(np.int64) for k in range(4)]
+
+    bits = np.zeros(len(mode), dtype=np.int64)
+    for value, depth in ct952_fwbitmap.MODE_BITS.items():
+        bits[mode == value] = depth
+
+    index = np.arange(len(mode))
+    candidates = ((bits > 0)
+                  & (width >= MIN_DIMENSION) & (width <= MAX_DIMENSION)
+                  & (height >= MIN_DIMENSION) & (height <= MAX_DIMENSION)
+                  & (size == (width * height * bits + 31) // 32)
+                  & (index + 4 + size <= len(words)))
+
+    return [Hit(BITMAP, int(i) * 4, (4 + int(size[i])) * 4, int(width[i]), int(height[i]),
+                int(bits[i]), 0)
+            for i in np.flatnonzero(candidates)]
+
+
+def find_palettes(words):
+    """
+    Count-prefixed tables where nearly every entry is a studio range
+    YCbCr value with only the mix bit above it.
+    """
+    if len(words) < MIN_PALETTE + 1:
+        return []
+    y = (words >> 16) & 0xFF
+    u = (words >> 8) & 0xFF
+    v = words & 0xFF
+    looks_yuv = (((words >> 25) == 0)
+                 & (y >= 16) & (y <= 235) & (u >= 16) & (u <= 240) & (v >= 16) & (v <= 240))
+    running = np.concatenate(([0], np.cumsum(looks_yuv)))
+
+    count = words.astype(np.int64)
+    index = np.arange(len(words))
+    end = index + 1 + count
+    candidates = ((count >= MIN_PALETTE) & (count <= ct952_palette.PALETTE_SIZE)
+                  & (end <= len(words)))
+    positions = np.flatnonzero(candidates)
+    matches = running[end[positions]] - running[positions + 1]
+    positions = positions[matches >= PALETTE_MATCH * count[positions]]
+
+    hits = []
+    for i in positions:
+        entries = words[i + 1:i + 1 + count[i]]
+        # Tables of one repeated value are fill patterns, not palettes
+        if len(np.unique(entries)) * 2 < len(entries):
+            continue
+        hits.append(Hit(PALETTE, int(i) * 4, (1 + int(count[i])) * 4, 0, 0, 0, int(count[i])))
+    return hits
+
+
+def find_zipped(buffer):
+    """UNZIP2006 streams that unpack to a firmware bitmap"""
+    hits = []
+    for match in ZIP_PATTERN.finditer(buffer):
+        offset = match.start()
+        header = bytearray(buffer[offset:offset + ct952_unzip.LZMA_HEADER_SIZE])
+        if len(header) < ct952_unzip.LZMA_HEADER_SIZE:
+            continue
+        unpacked = sum((header[5 + k] ^ ct952_unzip.UNZIP2006_KEY) << (8 * k) for k in range(8))
+        if not 16 < unpacked <= MAX_ZIPPED_SIZE:
+            continue
+
+        # The stream length is not stored; decode to find the header and the end
+        try:
+            data, bitmap = ct952_fwbitmap.load_buffer(buffer[offset:offset + unpacked + (64 << 10)])
+        except Exception:
+            # Corrupt stream (lzma.LZMAError, EOFError...), or no LZMA support
+            continue
+        if bitmap is not None:
+            hits.append(Hit(ZIPPED, offset, unpacked, bitmap.width, bitmap.height, bitmap.bits, 0))
+    return hits
+
+
+def load_hit(filename, hit):
+    """
+    Read one hit back: (data, bitmap) for bitmaps, as ct952_fwbitmap.load_buffer
+    returns, or a ct952_palette.Palette for palette tables.
+    """
+    with open(filename, 'rb') as f:
+        f.seek(hit.offset)
+        if hit.kind == ZIPPED:
+            # Compressed length is unknown; it never exceeds the unpacked size by much
+            data = f.read(hit.length + (64 << 10))
+        else:
+            data = f.read(hit.length)
+
+    name = "{}@{:#x}".format(os.path.basename(filename), hit.offset)
+    if hit.kind == PALETTE:
+        words = np.frombuffer(data, dtype='>u4')
+        return ct952_palette.Palette(words[1:1 + hit.count], name=name)
+    return ct952_fwbitmap.load_buffer(data)
+
+
+def describe(hit):
+    """One line summary of a hit, for lists"""
+    if hit.kind == PALETTE:
+        return "{:#08x}  palette  {} entries".format(hit.offset, hit.count)
+    return "{:#08x}  {:<7}  {}x{} {}-bit".format(hit.offset, hit.kind, hit.width, hit.height, hit.bits)
+
+
+def index_filename(filename):
+    return ct952_cachedir.index_path(filename, INDEX_SUFFIX)
+
+
+def read_index(filename):
+    """Hits from the cached index, or None if it is missing or stale"""
+    try:
+        with open(index_filename(filename)) as f:
+            index = json.load(f)
+    except (IOError, OSError, ValueError):
+        return None
+
+    stat = os.stat(filename)
+    if (index.get('version') != INDEX_VERSION or index.get('size') != stat.st_size
+            or index.get('mtime') != int(stat.st_mtime)):
+        return None
+    return [Hit(*hit) for hit in index['hits']]
+
+
+def write_index(filename, hits):
+    stat = os.stat(filename)
+    index = {
+        'version': INDEX_VERSION,
+        'size': stat.st_size,
+        'mtime': int(stat.st_mtime),
+        'fields': list(Hit._fields),
+        'hits': [list(hit) for hit in hits],
+    }
+    try:
+        with open(index_filename(filename), 'w') as f:
+            json.dump(index, f, separators=(',', ':'))
+    except (IOError, OSError):
+        pass
@@ -0,0 +1,384 @@
+"""
+Section tables of ct952-dmp-121 ROM images (DVD909.rom) and upgrade images (UPG952A.AP)
+Maps the image once and hands out sections as memoryviews, unzipping on demand
+Compatible with Python 2.7
+"""
+
+import argparse
+import collections
+import mmap
+import os
+import re
+import struct
+import sys
+
+import ct952_unzip
+
+# romld.h: SECTION_ENTRY table at ROMLD_SECTION_TABLE_ADDR, up to
+# ROMLD_SECTION_TABLE_SIZE entries, ended early by a zero name
+TABLE_OFFSET = 0x10
+TABLE_SIZE = 32
+ENTRY_FORMAT = '>4s5I'
+ENTRY_SIZE = struct.calcsize(ENTRY_FORMAT)
+
+FLAG_LOAD = 1
+FLAG_PROGENTRY = 2
+FLAG_ZIP = 4
+FLAG_RESERVED = 0xFFF8
+
+# aploader.h: an AP_INFO header, then an image with its own section table
+AP_IDENTIFY = b'CT909-AP'
+AP_INFO_FORMAT = '>8s5I16s3I'
+AP_INFO_FIELDS = ('identify', 'ap_type', 'ap_size', 'external_flag', 'version_ap',
+                  'chip_version', 'description', 'checksum', 'ap_sp', 'ap_unzip_buf')
+AP_INFO_SIZE = 512
+
+SECTION_NAME = re.compile(br'^[\x20-\x7e]{4}$')
+
+ConfigEntry = collections.namedtuple('ConfigEntry', 'source name section lma rma zipped load entry')
+
+
+class Section(object):
+    """
+    One SECTION_ENTRY. raw is a memoryview of the stored bytes; data()
+    unpacks zipped sections on first use and keeps the result.
+    """
+
+    def __init__(self, image, name, lma, rma, lsize, rsize, checksum_flag):
+        self.image = image
+        self.name = name
+        self.lma = lma
+        self.rma = rma
+        self.lsize = lsize
+        self.rsize = rsize
+        self.checksum = checksum_flag >> 16
+        self.flags = checksum_flag & 0xFFFF
+        self._data = None
+
+    @property
+    def zipped(self):
+        return bool(self.flags & FLAG_ZIP)
+
+    @property
+    def load(self):
+        return bool(self.flags & FLAG_LOAD)
+
+    @property
+    def entry(self):
+        return bool(self.flags & FLAG_PROGENTRY)
+
+    @property
+    def offset(self):
+        """File offset of the stored bytes"""
+        return self.image.base + self.rma
+
+    @property
+    def raw(self):
+        return self.image.view(self.offset, self.rsize)
+
+    def data(self):
+        """The section as loaded at its LMA: raw, or unzipped through ct952_unzip's LRU"""
+        if not self.zipped:
+            return self.raw[:self.lsize]
+        if self._data is None:
+            self._data = ct952_unzip.decompress(self.raw)
+        return self._data
+
+    def verify(self):
+        """
+        Whether the byte sum of data() matches the stored 16-bit checksum,
+        or None for reserved sections, which carry no checksum.
+        """
+        if self.checksum == 0:
+            return None
+        data = bytearray(self.data())
+        return sum(data) & 0xFFFF == self.checksum
+
+    def __repr__(self):
+        return "Section({!r}, rma={:#x}, size={})".format(self.name, self.rma, self.lsize)
+
+
+class RomImage(object):
+    """
+    A memory mapped image and its section table. Upgrade images are read
+    past their AP_INFO header; nested() opens an image stored in a section,
+    such as the "ROM " section of an AP, over the same mapping.
+    """
+
+    def __init__(self, filename=None, buffer=None, base=None):
+        self.filename = filename
+        self._file = None
+        self._mmap = None
+        if buffer is None:
+            self._file = open(filename, 'rb')
+            if os.fstat(self._file.fileno()).st_size:
+                self._mmap = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+                buffer = self._mmap
+            else:
+                buffer = b''
+        try:
+            self.buffer = memoryview(buffer)
+        except TypeError:
+            self.buffer = buffer    # Python 2 mmap: slices are copies
+
+        self.ap_info = None
+        if base is None:
+            base = 0
+            if bytes(self.buffer[:len(AP_IDENTIFY)]) == AP_IDENTIFY:
+                self.ap_info = parse_ap_info(self.buffer)
+                base = AP_INFO_SIZE
+        self.base = base
+        self.sections = parse_table(self, self.buffer, base)
+
+    def view(self, offset, size):
+        return self.buffer[offset:offset + size]
+
+    def section(self, name):
+        """Section by name, ignoring case and trailing spaces ("Engl" finds "ENGL")"""
+        wanted = name.strip().upper()
+        for section in self.sections:
+            if section.name.strip().upper() == wanted:
+                return section
+        raise KeyError("No section {!r} in {}".format(name, self.filename or "image"))
+
+    def nested(self, name):
+        """The image stored unzipped in section name"""
+        section = self.section(name)
+        image = RomImage(self.filename, self.buffer, section.offset)
+        if not image.sections:
+            raise ValueError("Section {!r} holds no section table".format(name))
+        return image
+
+    def walk(self, prefix=""):
+        """(path, section) for every section, descending into nested images"""
+        for section in self.sections:
+            path = prefix + section.name.rstrip()
+            yield path, section
+            if not section.zipped:
+                image = RomImage(self.filename, self.buffer, section.offset)
+                if image.sections:
+                    for item in image.walk(path + "/"):
+                        yield item
+
+    def close(self):
+        self.sections = []
+        if isinstance(self.buffer, memoryview):
+            self.buffer.release()
+        if self._mmap is not None:
+            try:
+                self._mmap.close()
+            except BufferError:
+                pass        # views still held by callers; freed with them
+        if self._file is not None:
+            self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+def parse_ap_info(buffer):
+    """The leading AP_INFO fields of an upgrade image, as a dict"""
+    values = struct.unpack_from(AP_INFO_FORMAT, buffer, 0)
+    info = dict(zip(AP_INFO_FIELDS, values))
+    info['identify'] = info['identify'].decode('ascii')
+    info['description'] = info['description'].rstrip(b'\0').decode('ascii', 'replace')
+    return info
+
+
+def parse_table(image, buffer, base):
+    """
+    Sections of the table at base + TABLE_OFFSET. An implausible entry
+    (unprintable name, reserved flag bits, data past the end) ends the
+    table, so code or pixels are never mistaken for one.
+    """
+    sections = []
+    for i in range(TABLE_SIZE):
+        offset = base + TABLE_OFFSET + i * ENTRY_SIZE
+        if offset + ENTRY_SIZE > len(buffer):
+            break
+        name, lma, rma, lsize, rsize, checksum_flag = struct.unpack_from(ENTRY_FORMAT, buffer, offset)
+        if name == b'\0\0\0\0':
+            break
+        if (not SECTION_NAME.match(name) or checksum_flag & FLAG_RESERVED
+                or base + rma + rsize > len(buffer)):
+            return []
+        sections.append(Section(image, name.decode('ascii'), lma, rma, lsize, rsize, checksum_flag))
+    return sections
+
+
+def parse_config(filename):
+    """
+    ConfigEntries of a makerom romcfg*.txt / upgcfg.txt, following include()s.
+    Entries inside a "file.tsim" { ... } block have that file as source.
+    """
+    with open(filename) as f:
+        text = f.read()
+    text = re.sub(r'#[^\n]*', '', text)
+
+    entries = []
+    source = None
+    for statement in re.findall(r'[^;{}]*[;{}]', text):
+        statement = statement.strip()
+        if statement.endswith('{'):
+            source = _unquote(statement[:-1])
+            continue
+        if statement.endswith('}'):
+            source = None
+            continue
+
+        statement = statement[:-1].strip()
+        include = re.match(r'include\s*\(\s*"([^"]*)"\s*\)$', statement)
+        if include:
+            path = include.group(1).replace('\\', '/')
+            entries.extend(parse_config(os.path.join(os.path.dirname(filename), path)))
+            continue
+        if statement:
+            entries.append(_config_entry(statement, source))
+    return entries
+
+
+def _config_entry(statement, source):
+    fields = [field.strip() for field in statement.split(',')]
+    if len(fields) != 7:
+        raise ValueError("Expected 7 fields: {}".format(statement))
+    name, section, lma, rma = [_unquote(field) for field in fields[:4]]
+    return ConfigEntry(source, name, section,
+                       int(lma, 0) if lma else None, int(rma, 0) if rma else None,
+                       fields[4] == '1', fields[5] == '1', fields[6] == '1')
+
+
+def _unquote(text):
+    text = text.strip()
+    if len(text) >= 2 and text[0] == text[-1] == '"':
+        return text[1:-1]
+    return text
+
+
+def compare(image, entries):
+    """
+    Differences between an image's table and the config that should have
+    built it, as messages; an empty list means the config matches.
+    """
+    problems = []
+    listed = set()
+    for entry in entries:
+        key = entry.section.upper()
+        listed.add(key)
+        try:
+            section = image.section(entry.section)
+        except KeyError:
+            problems.append("{}: missing".format(entry.section))
+            continue
+        for label, expected, actual in (("zip", entry.zipped, section.zipped),
+                                        ("load", entry.load, section.load),
+                                        ("entry", entry.entry, section.entry)):
+            if expected != actual:
+                problems.append("{}: {} flag is {:d}, config says {:d}".format(
+                    entry.section, label, actual, expected))
+        for label, expected, actual in (("LMA", entry.lma, section.lma),
+                                        ("RMA", entry.rma, section.rma)):
+            if expected is not None and expected != actual:
+                problems.append("{}: {} is {:#x}, config says {:#x}".format(
+                    entry.section, label, actual, expected))
+
+    for section in image.sections:
+        if section.name.upper() not in listed:
+            problems.append("{}: not in config".format(section.name))
+    return problems
+
+
+def read_sections(filename):
+    """(path, describe() line) for every section of an image, nested ones included"""
+    with RomImage(filename) as image:
+        return [(path, describe(path, section)) for path, section in image.walk()]
+
+
+def load_section(filename, path):
+    """Bytes of a section by its walk() path, e.g. "RODA" or "ROM/ENGL" """
+    with RomImage(filename) as image:
+        for name, section in image.walk():
+            if name.upper() == path.strip().upper():
+                return bytes(section.data())
+    raise KeyError("No section {!r} in {}".format(path, filename))
+
+
+def describe(path, section):
+    """One line summary of a section, for lists"""
+    flags = "".join(flag if on else "-" for flag, on in
+                    (("Z", section.zipped), ("L", section.load), ("E", section.entry)))
+    return "{:<10} {}  rma {:#08x}  lma {:#010x}  {:>7} bytes".format(
+        path, flags, section.rma, section.lma, section.lsize)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description="List, check and extract the sections of DVD909.rom style "
+                    "images and CT909-AP upgrade images.")
+    subparsers = parser.add_subparsers(dest='command')
+
+    list_parser = subparsers.add_parser('list', help="print the section table")
+    list_parser.add_argument('image')
+    list_parser.add_argument('--verify', action='store_true',
+                             help="check each section's checksum (unzips every section)")
+
+    check_parser = subparsers.add_parser(
+        'check', help="compare the table with romcfg files, best match first")
+    check_parser.add_argument('image')
+    check_parser.add_argument('configs', nargs='+', help="romcfg*.txt / upgcfg.txt")
+    check_parser.add_argument('--section', help="nested image to check, e.g. \"ROM \"")
+
+    extract_parser = subparsers.add_parser('extract', help="write sections to files, unzipped")
+    extract_parser.add_argument('image')
+    extract_parser.add_argument('sections', nargs='*',
+                                help="section paths, e.g. RODA or ROM/ENGL (default: all)")
+    extract_parser.add_argument('-o', '--output-dir', default="sections",
+                                help="default: %(default)s")
+    args = parser.parse_args(argv)
+
+    if args.command is None:
+        parser.error("choose a command")
+
+    with RomImage(args.image) as image:
+        if args.command == 'list':
+            if image.ap_info:
+                print("{} type {} size {} \"{}\"".format(
+                    image.ap_info['identify'], image.ap_info['ap_type'],
+                    image.ap_info['ap_size'], image.ap_info['description']))
+            for path, section in image.walk():
+                line = describe(path, section)
+                if args.verify:
+                    line += {True: "  ok", False: "  BAD CHECKSUM", None: ""}[section.verify()]
+                print(line)
+            return 0
+
+        if args.command == 'check':
+            target = image.nested(args.section) if args.section else image
+            results = sorted(((compare(target, parse_config(config)), config)
+                              for config in args.configs), key=lambda result: len(result[0]))
+            for problems, config in results:
+                print("{}: {}".format(config, "matches" if not problems
+                                      else "{} differences".format(len(problems))))
+                for problem in problems:
+                    print("    " + problem)
+            return 0 if not results[0][0] else 1
+
+        wanted = set(path.strip().upper() for path in args.sections)
+        if not os.path.isdir(args.output_dir):
+            os.makedirs(args.output_dir)
+        count = 0
+        for path, section in image.walk():
+            if wanted and path.upper() not in wanted:
+                continue
+            output = os.path.join(args.output_dir, path.replace("/", "_").strip() + ".bin")
+            with open(output, 'wb') as f:
+                f.write(section.data())
+            count += 1
+        print("Extracted {} sections to {}".format(count, args.output_dir))
+        return 0 if count else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,281 @@
+"""
+OSD string width checker for the ct952-dmp-121 string tables (allstr.h, OSDString/*/Str_*.c)
+Measures every string of every language in one array pass and flags those wider than their region
+Compatible with Python 2.7
+"""
+
+import argparse
+import collections
+import glob
+import hashlib
+import json
+import os
+import re
+import sys
+import time
+
+import numpy as np
+
+import ct952_cachedir
+import ct952_font
+
+CACHE_VERSION = 1
+DEFAULT_CACHE = "strwidth.cache.json"
+
+# Regions the strings of each module are drawn in. GDI_REGION_WIDTH (gdi.h)
+# is 616 on CT909S builds; osdmm.h, thumb.h and osddg.h define their own.
+DEFAULT_REGION = ('GDI_REGION_WIDTH', 616)
+MODULE_REGIONS = {
+    'OSDMM_MAIN_FILE': ('OSDMM_REGION_WIDTH', 616),
+    'THUMB_MAIN_FILE': ('THUMB_OSD_REGION_WIDTH', 616),
+    'OSDDG_MAIN_FILE': ('OSDDG_INFO_REGION_WIDTH', 300),
+}
+
+# allstr.h names each translation aName_Language
+LANGUAGES = ('English', 'French', 'German', 'Italian', 'Spanish', 'Portuguese', 'Dutch', 'Polish')
+
+STRING_ARRAY = re.compile(r'^WORD\s+(\w+)\s*\[\s*\w*\s*\]\s*=\s*\{([^}]*)\}', re.MULTILINE)
+DIRECTIVE = re.compile(r'^\s*#\s*(if|ifdef|ifndef|else|elif|endif)\b\s*(\w*)', re.MULTILINE)
+STRING_FILE = re.compile(r'^Str_(\w+)\.c$')
+FONT_INDEX_FILE = re.compile(r'fontindx.*\.def$', re.IGNORECASE)
+
+StringWidth = collections.namedtuple('StringWidth', 'name language module width limit region')
+
+
+def defines_directory(filename):
+    """Directory whose FontIndx .def files define a string table's CHAR_ names"""
+    directory = os.path.dirname(os.path.abspath(filename))
+    if os.path.exists(os.path.join(directory, ct952_font.FONTABLES['OSD_1BIT'][1])):
+        return directory
+    # allstr.h sits at the top of the tree and includes OSDString's tables
+    return os.path.join(directory, "OSDString")
+
+
+def defines_files(directory):
+    """Every FontIndx .def of a directory, the OSD tables first, then Ascii_Remapping.txt"""
+    names = sorted(name for name in os.listdir(directory) if FONT_INDEX_FILE.search(name))
+    first = [ct952_font.FONTABLES[name][1] for name in ('OSD_2BIT', 'OSD_1BIT')]
+    names = [name for name in first if name in names] + [name for name in names if name not in first]
+    remapping = os.path.join(directory, ct952_font.ASCII_REMAPPING)
+    return ([os.path.join(directory, name) for name in names]
+            + ([remapping] if os.path.exists(remapping) else []))
+
+
+class StringTable(object):
+    """
+    The WORD strings of one source file, all glyph codes in one array:
+    codes[starts[i]:starts[i] + lengths[i]] are string i's codes.
+    """
+
+    def __init__(self, filename, defines):
+        with open(filename) as f:
+            text = f.read()
+
+        language = STRING_FILE.match(os.path.basename(filename))
+        self.filename = filename
+        self.names = []
+        self.languages = []
+        self.modules = []
+        self.unresolved = set()
+        codes = []
+        lengths = []
+
+        modules = _modules_by_position(text)
+        positions = [position for position, module in modules]
+        for match in STRING_ARRAY.finditer(text):
+            name = match.group(1)
+            if language:
+                string_language = language.group(1)
+            else:
+                name, _, string_language = name.rpartition('_')
+                if string_language not in LANGUAGES:
+                    continue
+            entries = [entry.strip() for entry in match.group(2).split(',') if entry.strip()]
+            if not entries:
+                continue
+
+            # The first WORD is the glyph count; the array may be longer
+            count = _value(entries[0], defines)
+            string_codes = []
+            for entry in entries[1:1 + (count or 0)]:
+                code = _value(entry, defines)
+                if code is None:
+                    self.unresolved.add(entry)
+                    code = 0
+                string_codes.append(code)
+
+            index = np.searchsorted(positions, match.start(), side='right') - 1
+            self.names.append(name)
+            self.languages.append(string_language)
+            self.modules.append(modules[index][1] if index >= 0 else None)
+            codes.extend(string_codes)
+            lengths.append(len(string_codes))
+
+        self.codes = np.array(codes, dtype=np.int64)
+        self.lengths = np.array(lengths, dtype=np.int64)
+        self.starts = np.concatenate(([0], np.cumsum(self.lengths)[:-1])).astype(np.int64)
+
+    def __len__(self):
+        return len(self.names)
+
+    def widths(self, two_bit=False):
+        """
+        Pixel width of every string as gdi.c measures it on CT909S:
+        GDI_GetStringWidth adds bits [13:9] of each code, 64 for 0;
+        GDI_GetStringWidth_2B also rounds each glyph up to 4 pixels.
+        """
+        glyph_widths = (self.codes & 0x3E00) >> 8
+        if two_bit:
+            glyph_widths = (glyph_widths + 3) >> 2 << 2
+        glyph_widths[glyph_widths == 0] = 64
+        running = np.concatenate(([0], np.cumsum(glyph_widths)))
+        return running[self.starts + self.lengths] - running[self.starts]
+
+
+def _value(entry, defines):
+    """A code from a number or a CHAR_ name, or None when it is not defined"""
+    if entry[0].isdigit():
+        return int(entry, 0)
+    return defines.get(entry)
+
+
+def _modules_by_position(text):
+    """(offset, innermost *_MAIN_FILE guard) at every preprocessor directive"""
+    stack = []
+    modules = []
+    for match in DIRECTIVE.finditer(text):
+        directive, name = match.groups()
+        if directive in ('if', 'ifdef', 'ifndef'):
+            stack.append(name if directive == 'ifdef' else '')
+        elif directive == 'endif' and stack:
+            stack.pop()
+        module = next((guard for guard in reversed(stack) if guard.endswith('_MAIN_FILE')), None)
+        modules.append((match.start(), module))
+    return modules
+
+
+def file_hash(filenames):
+    """sha1 over the contents of a string table and the .def files it uses"""
+    digest = hashlib.sha1()
+    for filename in filenames:
+        with open(filename, 'rb') as f:
+            digest.update(f.read())
+    return digest.hexdigest()
+
+
+class WidthCache(object):
+    """
+    Results by hash of a string table and its .def files, so unchanged
+    files are not parsed again. Only the entries used are saved back.
+    """
+
+    def __init__(self, filename=None):
+        self.filename = filename
+        self.entries = {}
+        self.used = {}
+        if filename is None:
+            return
+        try:
+            with open(filename) as f:
+                cache = json.load(f)
+        except (IOError, OSError, ValueError):
+            return
+        if cache.get('version') == CACHE_VERSION:
+            self.entries = cache.get('files', {})
+
+    def get(self, key):
+        entry = self.entries.get(key)
+        if entry is not None:
+            self.used[key] = entry
+        return entry
+
+    def put(self, key, entry):
+        self.entries[key] = self.used[key] = entry
+
+    def save(self):
+        if self.filename is None:
+            return
+        try:
+            with open(self.filename, 'w') as f:
+                json.dump({'version': CACHE_VERSION, 'files': self.used}, f, separators=(',', ':'))
+        except (IOError, OSError):
+            pass
+
+
+def measure_file(filename, cache=None, two_bit=False):
+    """(StringWidths, undefined names) of one string table, from cache when it is current"""
+    def_files = defines_files(defines_directory(filename))
+    key = "{}:{}".format(file_hash([filename] + def_files), int(two_bit))
+    entry = cache.get(key) if cache is not None else None
+    if entry is None:
+        table = StringTable(filename, ct952_font.read_defines(def_files))
+        entry = {
+            'names': table.names,
+            'languages': table.languages,
+            'modules': table.modules,
+            'widths': table.widths(two_bit).tolist(),
+            'unresolved': sorted(table.unresolved),
+        }
+        if cache is not None:
+            cache.put(key, entry)
+
+    results = []
+    for name, language, module, width in zip(entry['names'], entry['languages'],
+                                             entry['modules'], entry['widths']):
+        region, limit = MODULE_REGIONS.get(module, DEFAULT_REGION)
+        results.append(StringWidth(name, language, module, width, limit, region))
+    return results, entry['unresolved']
+
+
+def default_files():
+    files = ["allstr.h"] if os.path.exists("allstr.h") else []
+    files.extend(sorted(glob.glob(os.path.join("OSDString", "Str_*.c"))))
+    files.extend(sorted(glob.glob(os.path.join("OSDString", "*", "Str_*.c"))))
+    return files
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Measure every OSD string of allstr.h and the Str_*.c tables as the "
+                    "firmware does and list those wider than the region they are drawn in.")
+    parser.add_argument('files', nargs='*',
+                        help="string tables (default: allstr.h and OSDString/**/Str_*.c)")
+    parser.add_argument('-w', '--width', type=int,
+                        help="region width for every string, instead of each module's")
+    parser.add_argument('--2bit', dest='two_bit', action='store_true',
+                        help="measure as GDI_GetStringWidth_2B (4 pixel aligned glyphs)")
+    parser.add_argument('-a', '--all', action='store_true', help="list every string, not only overflows")
+    parser.add_argument('--cache', help="results cache (default: {} in the user cache directory)".format(
+        DEFAULT_CACHE))
+    parser.add_argument('--no-cache', action='store_true')
+    args = parser.parse_args(argv)
+
+    files = args.files or default_files()
+    if not files:
+        parser.error("no string tables found; run from the source tree or name them")
+
+    start = time.time()
+    cache = WidthCache(None if args.no_cache else args.cache or ct952_cachedir.cache_path(DEFAULT_CACHE))
+    total = overflows = 0
+    for filename in files:
+        results, unresolved = measure_file(filename, cache, args.two_bit)
+        if unresolved:
+            sys.stderr.write("{}: undefined {}\n".format(filename, ", ".join(unresolved)))
+        for result in results:
+            limit = args.width or result.limit
+            total += 1
+            if result.width > limit:
+                overflows += 1
+            elif not args.all:
+                continue
+            print("{:>5}/{:<4} {:<24} {:<11} {} {}".format(
+                result.width, limit, result.module or "-", result.language, result.name, filename))
+
+    cache.save()
+    sys.stderr.write("{} strings in {} files, {} wider than their region, in {:.2f} s\n".format(
+        total, len(files), overflows, time.time() - start))
+    return 1 if overflows else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
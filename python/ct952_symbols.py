@@ -0,0 +1,321 @@
+"""
+Symbol index for the ct952-dmp-121 firmware (DVD909.sym, nm format)
+Finds symbols by name or address with bisect, and extracts and renders the arrays they name
+Compatible with Python 2.7
+"""
+
+import argparse
+import array
+import bisect
+import collections
+import fnmatch
+import json
+import mmap
+import os
+import re
+import struct
+import sys
+import time
+
+import ct952_cachedir
+
+INDEX_SUFFIX = ".symidx.json"
+INDEX_VERSION = 1
+
+# Undefined and absolute symbols have no place in the image
+SKIPPED_KINDS = "UwAa"
+
+NM_LINE = re.compile(r'^([0-9a-fA-F]{8})\s+(\S)\s+(\S+)\s*$')
+
+# Bitmap arrays and the palette array their module loads before drawing them
+SYMBOL_PALETTE_PREFIX = (
+    ('_aCLOCK_', '_aCLOCK_Palette', 'palnumber.txt'),                   # clock.c
+    ('_aDVDSETUP_', '_aDVDSETUP_Palette', 'palmenu.txt'),               # dvdsetup.c
+    ('_aPOWERPNMENU_', '_aPOWERONMENU_Palette', 'palpoweronmenu.txt'),  # poweronmenu.c
+)
+
+# Fontables: 32 pixel wide glyphs (gdi.h OSD_2BIT_CHAR_SIZE), drawn as one tall strip.
+# The OSD tables name their depth; the code page tables (_bFontable_8859_2...) are 1-bit.
+FONT_SYMBOL = re.compile(r'^_bFontable_(?:.*_(\d)bit$)?')
+FONT_GLYPH_WIDTH = 32
+FONT_DEFAULT_BITS = 1
+
+ELF_MAGIC = b'\x7fELF'
+SHT_NOBITS = 8
+SHF_ALLOC = 2
+
+Symbol = collections.namedtuple('Symbol', 'name kind address size')
+
+
+class SymbolIndex(object):
+    """
+    Symbols sorted by address in parallel arrays. A symbol's size is the
+    distance to the next higher address, which is exact for the arrays the
+    compiler lays out back to back and an upper bound elsewhere.
+    """
+
+    def __init__(self, addresses, kinds, names):
+        self.addresses = array.array('L', addresses)
+        self.kinds = kinds
+        self.names = names
+        self._by_name = None
+
+    def __len__(self):
+        return len(self.addresses)
+
+    def symbol(self, i):
+        address = self.addresses[i]
+        end = bisect.bisect_right(self.addresses, address)
+        size = self.addresses[end] - address if end < len(self.addresses) else None
+        return Symbol(self.names[i], self.kinds[i], address, size)
+
+    def find(self, name):
+        """Symbol by exact name; raises KeyError"""
+        if self._by_name is None:
+            self._by_name = dict((name, i) for i, name in enumerate(self.names))
+        return self.symbol(self._by_name[name])
+
+    def lookup(self, address):
+        """(Symbol, offset into it) for the symbol containing address, or None"""
+        i = bisect.bisect_right(self.addresses, address) - 1
+        if i < 0:
+            return None
+        return self.symbol(i), address - self.addresses[i]
+
+    def matching(self, pattern):
+        """Symbols whose name matches a shell pattern, by address"""
+        return [self.symbol(i) for i, name in enumerate(self.names)
+                if fnmatch.fnmatchcase(name, pattern)]
+
+
+def parse_symbols(filename):
+    """SymbolIndex of an nm listing such as DVD909.sym"""
+    entries = []
+    with open(filename) as f:
+        for line in f:
+            match = NM_LINE.match(line)
+            if match and match.group(2) not in SKIPPED_KINDS:
+                entries.append((int(match.group(1), 16), match.group(2), match.group(3)))
+    entries.sort()
+    return SymbolIndex([entry[0] for entry in entries],
+                       "".join(entry[1] for entry in entries),
+                       [entry[2] for entry in entries])
+
+
+def load_symbols(filename, use_index=True):
+    """
+    SymbolIndex of an nm listing, from the cached index when it is current.
+    A missing or stale index is rebuilt, and written if the directory allows.
+    """
+    if use_index:
+        index = read_index(filename)
+        if index is not None:
+            return index
+    index = parse_symbols(filename)
+    if use_index:
+        write_index(filename, index)
+    return index
+
+
+def index_filename(filename):
+    return ct952_cachedir.index_path(filename, INDEX_SUFFIX)
+
+
+def read_index(filename):
+    """SymbolIndex from the cached index, or None if it is missing or stale"""
+    try:
+        with open(index_filename(filename)) as f:
+            index = json.load(f)
+    except (IOError, OSError, ValueError):
+        return None
+
+    stat = os.stat(filename)
+    if (index.get('version') != INDEX_VERSION or index.get('size') != stat.st_size
+            or index.get('mtime') != int(stat.st_mtime)):
+        return None
+    return SymbolIndex(index['addresses'], index['kinds'], index['names'])
+
+
+def write_index(filename, symbols):
+    stat = os.stat(filename)
+    index = {
+        'version': INDEX_VERSION,
+        'size': stat.st_size,
+        'mtime': int(stat.st_mtime),
+        'addresses': symbols.addresses.tolist(),
+        'kinds': symbols.kinds,
+        'names': symbols.names,
+    }
+    try:
+        with open(index_filename(filename), 'w') as f:
+            json.dump(index, f, separators=(',', ':'))
+    except (IOError, OSError):
+        pass
+
+
+class AddressSpace(object):
+    """
+    Firmware addresses of an image: the allocated sections of an ELF
+    build (DVD909.tsim), or the sections of a ROM image that have a load
+    address (DVD909.rom), unzipped on demand.
+    """
+
+    def __init__(self, filename):
+        self.filename = filename
+        with open(filename, 'rb') as f:
+            magic = f.read(len(ELF_MAGIC))
+        self.rom = None
+        self.regions = []       # (start, size, get bytes)
+        if magic == ELF_MAGIC:
+            self._map_elf()
+        else:
+            self._map_rom()
+        self.regions.sort(key=lambda region: region[0])
+
+    def _map_elf(self):
+        with open(self.filename, 'rb') as f:
+            self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        mm = self._mmap
+        if mm[5:6] != b'\x02':
+            raise ValueError("{}: only big endian ELF files are supported".format(self.filename))
+        shoff, = struct.unpack_from('>I', mm, 0x20)
+        shentsize, shnum = struct.unpack_from('>HH', mm, 0x2E)
+        for i in range(shnum):
+            (name, kind, flags, address, offset,
+             size) = struct.unpack_from('>6I', mm, shoff + i * shentsize)
+            if kind != SHT_NOBITS and flags & SHF_ALLOC and size:
+                self.regions.append((address, size,
+                                     lambda offset=offset, size=size: mm[offset:offset + size]))
+
+    def _map_rom(self):
+        import ct952_romsect
+        self.rom = ct952_romsect.RomImage(self.filename)
+        for section in self.rom.sections:
+            # Sections without a load address are data files (ACDT, LOGO...)
+            if section.lma:
+                self.regions.append((section.lma, section.lsize, section.data))
+
+    def read(self, address, size):
+        """Up to size bytes at address, cut at the end of its section"""
+        for start, length, data in self.regions:
+            if start <= address < start + length:
+                offset = address - start
+                return bytes(data()[offset:offset + min(size, length - offset)])
+        raise ValueError("Address {:#010x} is not in {}".format(address, self.filename))
+
+
+def symbol_palette(symbols, space, name):
+    """The palette the firmware draws a bitmap symbol with, read from the image, or None"""
+    import ct952_palette
+    for prefix, palette_name, palette_file in SYMBOL_PALETTE_PREFIX:
+        if name.startswith(prefix) and name != palette_name:
+            symbol = symbols.find(palette_name)
+            data = space.read(symbol.address, symbol.size or 4 * (ct952_palette.PALETTE_SIZE + 1))
+            count = struct.unpack_from('>I', data)[0]
+            entries = struct.unpack_from('>{}I'.format(count), data, 4)
+            return ct952_palette.Palette(entries, ct952_palette.default_start(palette_file),
+                                         palette_name)
+    return None
+
+
+def render_symbol(symbols, space, name):
+    """
+    Decode the array a symbol names into a PIL image: firmware bitmaps
+    (zipped or not) with their palette, fontables as a strip of glyphs.
+    """
+    import ct952_decode
+    import ct952_fwbitmap
+
+    symbol = symbols.find(name)
+    if symbol.size is None:
+        raise ValueError("{} is the last symbol; its size is unknown".format(name))
+    data, bitmap = ct952_fwbitmap.load_buffer(space.read(symbol.address, symbol.size))
+
+    if bitmap is not None:
+        palette = symbol_palette(symbols, space, name)
+        return bitmap.decode(palette.lut() if palette is not None else None)
+
+    font = FONT_SYMBOL.match(name)
+    if font:
+        bits = int(font.group(1) or FONT_DEFAULT_BITS)
+        format_type = ct952_decode.INDEXED_FORMATS.get(bits, ct952_decode.FORMAT_1BIT)
+        height = len(data) * 8 // (bits * FONT_GLYPH_WIDTH)
+        return ct952_decode.decode(data, FONT_GLYPH_WIDTH, height, format_type)
+    raise ValueError("{} is neither a firmware bitmap nor a fontable".format(name))
+
+
+def parse_address(text):
+    return int(text, 16)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Look up DVD909.sym symbols and render the bitmaps and "
+                    "fontables they name from DVD909.tsim or DVD909.rom.")
+    parser.add_argument('-s', '--symbols', default="DVD909.sym",
+                        help="nm listing (default: %(default)s)")
+    parser.add_argument('--no-index', action='store_true',
+                        help="parse the listing instead of using its {} cache".format(INDEX_SUFFIX))
+    subparsers = parser.add_subparsers(dest='command')
+
+    find_parser = subparsers.add_parser('find', help="list symbols matching shell patterns")
+    find_parser.add_argument('patterns', nargs='+')
+
+    lookup_parser = subparsers.add_parser('lookup', help="name the symbols containing addresses")
+    lookup_parser.add_argument('addresses', nargs='+', type=parse_address, help="hex addresses")
+
+    render_parser = subparsers.add_parser('render', help="save symbols' bitmaps as PNG")
+    render_parser.add_argument('names', nargs='+', help="symbol names or shell patterns")
+    render_parser.add_argument('-i', '--image', default="DVD909.tsim",
+                               help="DVD909.tsim or DVD909.rom (default: %(default)s)")
+    render_parser.add_argument('-o', '--output-dir', default="render",
+                               help="default: %(default)s")
+    args = parser.parse_args(argv)
+
+    if args.command is None:
+        parser.error("choose a command")
+
+    start = time.time()
+    symbols = load_symbols(args.symbols, use_index=not args.no_index)
+    sys.stderr.write("{} symbols loaded in {:.1f} ms\n".format(
+        len(symbols), (time.time() - start) * 1000))
+
+    if args.command == 'find':
+        for pattern in args.patterns:
+            for symbol in symbols.matching(pattern):
+                print("{:08x} {} {:>7} {}".format(symbol.address, symbol.kind,
+                                                  symbol.size or "", symbol.name))
+        return 0
+
+    if args.command == 'lookup':
+        for address in args.addresses:
+            found = symbols.lookup(address)
+            if found is None:
+                print("{:08x} -".format(address))
+            else:
+                print("{:08x} {}+{:#x}".format(address, found[0].name, found[1]))
+        return 0
+
+    space = AddressSpace(args.image)
+    if not os.path.isdir(args.output_dir):
+        os.makedirs(args.output_dir)
+    names = []
+    for pattern in args.names:
+        names.extend(symbol.name for symbol in symbols.matching(pattern))
+
+    failed = 0
+    for name in names:
+        try:
+            image = render_symbol(symbols, space, name)
+        except (KeyError, ValueError) as e:
+            sys.stderr.write("{}: {}\n".format(name, e))
+            failed += 1
+            continue
+        output = os.path.join(args.output_dir, name + ".png")
+        image.save(output)
+        print("{}: {}x{} saved as {}".format(name, image.width, image.height, output))
+    return 1 if failed or not names else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,207 @@
+"""
+Per-stage timing and opt-in profiling for the ct952-dmp-121 bitmap browser
+Each stage of a load or render records its time, bytes and pixels for the status bar and an optional JSON lines log
+Compatible with Python 2.7
+"""
+
+import collections
+import contextlib
+import json
+import sys
+import threading
+import time
+
+try:
+    import tracemalloc
+except ImportError:
+    tracemalloc = None
+
+try:
+    from StringIO import StringIO
+except ImportError:
+    from io import StringIO
+
+PROFILE_LINES = 30          # functions listed in a profile report
+ALLOCATION_LINES = 10       # allocation sites listed in a profile report
+TRACE_FRAMES = 8
+
+Stage = collections.namedtuple('Stage', 'name seconds bytes pixels')
+
+
+class Counts(object):
+    """What a stage processed; set inside the stage when only known at its end"""
+
+    def __init__(self, byte_count=0, pixels=0):
+        self.byte_count = byte_count
+        self.pixels = pixels
+
+
+class Timings(object):
+    """
+    The stages of one operation, in the order they ran. Stages may be
+    timed on the render thread and then on the Tk thread.
+    """
+
+    def __init__(self, label):
+        self.label = label
+        self.started = time.time()
+        self.stages = []
+
+    @contextlib.contextmanager
+    def stage(self, name, byte_count=0, pixels=0):
+        counts = Counts(byte_count, pixels)
+        start = time.time()
+        try:
+            yield counts
+        finally:
+            self.stages.append(Stage(name, time.time() - start, counts.byte_count, counts.pixels))
+
+    def extend(self, other):
+        """Take over the stages of an earlier operation, such as the load before a render"""
+        self.stages[:0] = other.stages
+
+    @property
+    def seconds(self):
+        return sum(stage.seconds for stage in self.stages)
+
+    def summary(self):
+        """'load 3.1 ms, decode 2.0 ms (0.35 MPix), ...' for the status bar"""
+        parts = []
+        for stage in self.stages:
+            amount = ""
+            if stage.pixels:
+                amount = " ({:.2f} MPix)".format(stage.pixels / 1e6)
+            elif stage.bytes:
+                amount = " ({:.2f} MB)".format(stage.bytes / float(1 << 20))
+            parts.append("{} {:.1f} ms{}".format(stage.name, stage.seconds * 1000, amount))
+        return ", ".join(parts)
+
+    def record(self):
+        """The operation as one JSON lines record"""
+        stages = []
+        for stage in self.stages:
+            entry = {'stage': stage.name, 'ms': round(stage.seconds * 1000, 3),
+                     'bytes': stage.bytes, 'pixels': stage.pixels}
+            if stage.seconds:
+                if stage.bytes:
+                    entry['mb_s'] = round(stage.bytes / float(1 << 20) / stage.seconds, 2)
+                if stage.pixels:
+                    entry['mpix_s'] = round(stage.pixels / 1e6 / stage.seconds, 2)
+            stages.append(entry)
+        return {'label': self.label, 'time': round(self.started, 3),
+                'total_ms': round(self.seconds * 1000, 3), 'stages': stages}
+
+
+@contextlib.contextmanager
+def _untimed(byte_count, pixels):
+    yield Counts(byte_count, pixels)
+
+
+def stage(timings, name, byte_count=0, pixels=0):
+    """timings.stage(), or nothing at all when timings is None"""
+    if timings is None:
+        return _untimed(byte_count, pixels)
+    return timings.stage(name, byte_count, pixels)
+
+
+class TimingLog(object):
+    """Appends each operation's Timings to a JSON lines file"""
+
+    def __init__(self, filename):
+        self.filename = filename
+        self._failed = False
+
+    def write(self, timings):
+        try:
+            with open(self.filename, 'a') as f:
+                f.write(json.dumps(timings.record(), sort_keys=True) + "\n")
+        except (IOError, OSError) as e:
+            if not self._failed:
+                sys.stderr.write("Cannot write timings to {}: {}\n".format(self.filename, e))
+            self._failed = True
+
+
+class Profiler(object):
+    """
+    Opt-in cProfile and tracemalloc around whole renders. One session is
+    open at a time; renders started meanwhile are not profiled.
+    """
+
+    def __init__(self, prefix):
+        self.prefix = prefix
+        self.count = 0
+        self._lock = threading.Lock()
+
+    def session(self):
+        """A new ProfileSession, or None while another one is open"""
+        if not self._lock.acquire(False):
+            return None
+        self.count += 1
+        return ProfileSession("{}-{:03d}".format(self.prefix, self.count), self._lock.release)
+
+
+class ProfileSession(object):
+    """
+    The profile of one render, enabled by profiling() around each part of
+    it: the decode on the render thread, then the display on the Tk thread.
+    """
+
+    def __init__(self, path, release):
+        import cProfile
+        self.path = path
+        self._release = release
+        self.profile = cProfile.Profile()
+        self.tracing = tracemalloc is not None and not tracemalloc.is_tracing()
+        if self.tracing:
+            tracemalloc.start(TRACE_FRAMES)
+
+    def close(self, label=""):
+        """Write path.prof (for pstats) and the path.txt report; returns the report's name"""
+        try:
+            report = StringIO()
+            report.write("{}\n\n".format(label))
+            if self.tracing:
+                current, peak = tracemalloc.get_traced_memory()
+                snapshot = tracemalloc.take_snapshot()
+                tracemalloc.stop()
+                self.tracing = False
+                report.write("tracemalloc: peak {} KB, {} KB still allocated\n".format(
+                    peak // 1024, current // 1024))
+                for statistic in snapshot.statistics('lineno')[:ALLOCATION_LINES]:
+                    report.write("  {}\n".format(statistic))
+                report.write("\n")
+            import pstats
+            self.profile.dump_stats(self.path + ".prof")
+            stats = pstats.Stats(self.profile, stream=report)
+            stats.sort_stats('cumulative').print_stats(PROFILE_LINES)
+            with open(self.path + ".txt", 'w') as f:
+                f.write(report.getvalue())
+            return self.path + ".txt"
+        finally:
+            self.abandon()
+
+    def abandon(self):
+        """Close without a report, e.g. when the render failed"""
+        if self.tracing:
+            tracemalloc.stop()
+            self.tracing = False
+        if self._release is not None:
+            self._release()
+            self._release = None
+
+
+@contextlib.contextmanager
+def profiling(session):
+    """Profile the current thread for the duration, when session is not None"""
+    enabled = False
+    if session is not None:
+        try:
+            session.profile.enable()
+            enabled = True
+        except ValueError:
+            pass        # Python 3.12 allows one active profiler: run unprofiled
+    try:
+        yield
+    finally:
+        if enabled:
+            session.profile.disable()
@@ -0,0 +1,160 @@
+"""
+Decompression stage for zipped firmware assets (GDI_DrawZipBitmap, OSD fontables)
+Detects the compressed stream by signature and keeps decoded buffers in an LRU cache
+Compatible with Python 2.7
+"""
+
+import collections
+import hashlib
+import struct
+import threading
+import zlib
+
+try:
+    import lzma
+except ImportError:
+    try:
+        from backports import lzma
+    except ImportError:
+        lzma = None
+
+# UNZIP2006_DECODE streams: an LZMA-alone header with every byte XORed with
+# 0x5A, so props 0x63 and a dictionary size of 8 MB read "39 5A 5A DA"
+UNZIP2006_SIGNATURE = b'\x39\x5A\x5A\xDA'
+UNZIP2006_KEY = 0x5A
+LZMA_HEADER_SIZE = 13   # props, dictionary size, 64-bit unpacked size
+
+# DECOMPRESS_METHOD_GZIP builds: UNZIP_Decompress takes a plain gzip member
+GZIP_SIGNATURE = b'\x1f\x8b'
+
+DEFAULT_CACHE_BYTES = 64 << 20
+
+# (name, signature, decompress) in detection order
+_DECOMPRESSORS = []
+
+
+def register(name, signature, decompress):
+    """
+    Add a decompressor for streams starting with signature.
+    decompress(data) takes the whole stream and returns the unpacked bytes.
+    """
+    _DECOMPRESSORS.append((name, bytes(signature), decompress))
+
+
+def detect(data):
+    """Return the name of the decompressor for data, or None if it is not compressed"""
+    entry = _find(data)
+    return entry[0] if entry else None
+
+
+def decompress(data, cache=True):
+    """
+    Unpack a compressed stream. Decoded buffers are kept in the module LRU,
+    keyed by a hash of the compressed bytes, unless cache is False.
+    """
+    entry = _find(data)
+    if entry is None:
+        raise ValueError("Unknown compressed stream signature")
+
+    if not cache:
+        return entry[2](data)
+
+    key = hashlib.sha1(data).digest()
+    result = _CACHE.get(key)
+    if result is None:
+        result = entry[2](data)
+        _CACHE.put(key, result)
+    return result
+
+
+def unpack(data, cache=True):
+    """Decompress data if it carries a known signature, else return it unchanged"""
+    if _find(data) is None:
+        return data
+    return decompress(data, cache)
+
+
+def _find(data):
+    head = bytes(data[:8])
+    for entry in _DECOMPRESSORS:
+        if head.startswith(entry[1]):
+            return entry
+    return None
+
+
+def decompress_unzip2006(data):
+    """UNZIP2006_DECODE: LZMA with an obfuscated header, possibly without end marker"""
+    if lzma is None:
+        raise ImportError("LZMA support requires Python 3.3+ or backports.lzma")
+    if len(data) < LZMA_HEADER_SIZE:
+        raise ValueError("Truncated compressed stream")
+
+    header = bytearray(data[:LZMA_HEADER_SIZE])
+    for i in range(LZMA_HEADER_SIZE):
+        header[i] ^= UNZIP2006_KEY
+    size = struct.unpack_from('<Q', bytes(header), 5)[0]
+
+    decompressor = lzma.LZMADecompressor(lzma.FORMAT_ALONE)
+    try:
+        result = decompressor.decompress(bytes(header) + bytes(data[LZMA_HEADER_SIZE:]))
+    except lzma.LZMAError as e:
+        raise ValueError("Bad UNZIP2006 stream: {}".format(e))
+    if len(result) < size:
+        raise ValueError("Compressed stream ended after {} of {} bytes".format(len(result), size))
+    return result[:size]
+
+
+def decompress_gzip(data):
+    """DECOMPRESS_METHOD_GZIP: a single gzip member"""
+    try:
+        return zlib.decompressobj(16 + zlib.MAX_WBITS).decompress(bytes(data))
+    except zlib.error as e:
+        raise ValueError("Bad gzip stream: {}".format(e))
+
+
+class DecodedCache(object):
+    """
+    Least recently used buffers, bounded by their total size in bytes.
+    Shared by the gallery and render threads, so every access is locked.
+    """
+
+    def __init__(self, max_bytes=DEFAULT_CACHE_BYTES):
+        self.max_bytes = max_bytes
+        self.size = 0
+        self._items = collections.OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            value = self._items.pop(key, None)
+            if value is not None:
+                self._items[key] = value
+            return value
+
+    def put(self, key, value):
+        with self._lock:
+            old = self._items.pop(key, None)
+            if old is not None:
+                self.size -= len(old)
+            if len(value) > self.max_bytes:
+                return
+
+            self._items[key] = value
+            self.size += len(value)
+            while self.size > self.max_bytes:
+                _, evicted = self._items.popitem(last=False)
+                self.size -= len(evicted)
+
+    def clear(self):
+        with self._lock:
+            self._items.clear()
+            self.size = 0
+
+    def __len__(self):
+        return len(self._items)
+
+
+_CACHE = DecodedCache()
+
+register("unzip2006", UNZIP2006_SIGNATURE, decompress_unzip2006)
+register("gzip", GZIP_SIGNATURE, decompress_gzip)
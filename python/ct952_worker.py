@@ -0,0 +1,135 @@
+"""
+Background rendering for the ct952-dmp-121 bitmap browser
+Runs the latest decode on a worker thread and hands the result back to the Tk loop
+Compatible with Python 2.7
+"""
+
+import sys
+import threading
+import traceback
+
+try:
+    import Queue as queue
+except ImportError:
+    import queue
+
+POLL_MS = 10
+DEBOUNCE_MS = 120
+
+
+class RenderWorker(object):
+    """
+    Runs submitted jobs on one background thread. Only the newest job is
+    kept: submitting supersedes any job that has not started, and results of
+    superseded jobs are dropped by generation. Callbacks run on the Tk
+    thread, from a root.after poll that only runs while work is in flight.
+    Errors without an errback, and errors raised by the callbacks, go to
+    report(exception).
+    """
+
+    def __init__(self, root, poll_ms=POLL_MS, report=None):
+        self.root = root
+        self.poll_ms = poll_ms
+        self.report = report or report_error
+        self.generation = 0
+        self._job = None
+        self._busy = False
+        self._polling = False
+        self._condition = threading.Condition()
+        self._results = queue.Queue()
+
+        thread = threading.Thread(target=self._run)
+        thread.daemon = True
+        thread.start()
+
+    def submit(self, func, callback, errback=None):
+        """
+        Run func() in the background, then callback(result) or
+        errback(exception) on the Tk thread. Returns the job's generation.
+        """
+        with self._condition:
+            self.generation += 1
+            self._job = (self.generation, func, callback, errback)
+            self._condition.notify()
+        self._start_polling()
+        return self.generation
+
+    def cancel(self):
+        """Drop the queued job and the result of the running one"""
+        with self._condition:
+            self.generation += 1
+            self._job = None
+
+    def _run(self):
+        while True:
+            with self._condition:
+                while self._job is None:
+                    self._condition.wait()
+                generation, func, callback, errback = self._job
+                self._job = None
+                self._busy = True
+
+            try:
+                result, error = func(), None
+            except Exception as e:
+                result, error = None, e
+            with self._condition:
+                # Queued before the worker looks idle, so _poll cannot stop in between
+                self._results.put((generation, result, error, callback, errback))
+                self._busy = False
+
+    def _start_polling(self):
+        if not self._polling:
+            self._polling = True
+            self.root.after(self.poll_ms, self._poll)
+
+    def _poll(self):
+        try:
+            while True:
+                try:
+                    generation, result, error, callback, errback = self._results.get_nowait()
+                except queue.Empty:
+                    break
+                if generation != self.generation:
+                    continue        # stale: a newer job was submitted meanwhile
+                try:
+                    if error is None:
+                        callback(result)
+                    elif errback is not None:
+                        errback(error)
+                    else:
+                        self.report(error)
+                except Exception as e:
+                    self.report(e)
+        finally:
+            with self._condition:
+                idle = self._job is None and not self._busy
+            if idle and self._results.empty():
+                self._polling = False
+            else:
+                self.root.after(self.poll_ms, self._poll)
+
+
+def report_error(error):
+    """Default RenderWorker.report: print the error and its traceback to stderr"""
+    sys.stderr.write("Render worker: {}\n".format(error))
+    traceback.print_exception(type(error), error, getattr(error, '__traceback__', None))
+
+
+class Debouncer(object):
+    """Calls func once, delay_ms after the last of a burst of trigger() calls"""
+
+    def __init__(self, root, func, delay_ms=DEBOUNCE_MS):
+        self.root = root
+        self.func = func
+        self.delay_ms = delay_ms
+        self._after_id = None
+
+    def trigger(self, *args):
+        if self._after_id is not None:
+            self.root.after_cancel(self._after_id)
+        self._after_id = self.root.after(self.delay_ms, self._fire)
+
+    def _fire(self):
+        self._after_id = None
+        self.func()
@@ -0,0 +1,228 @@
+"""
+Batch palette inspector for ct952-dmp-121 palette tables
+Renders every byte order interpretation of each palette into one contact sheet
+Compatible with Python 2.7
+"""
+
+import argparse
+import csv
+import json
+import multiprocessing
+import os
+import sys
+import time
+
+import numpy as np
+from PIL import Image, ImageDraw
+
+import ct952_colorspace
+import ct952_palette
+
+# Ways of reading a 0x00AABBCC palette word, in contact sheet order
+INTERPRETATIONS = ("RGB", "BGR", "YUV", "VUY")
+
+# The table the original paltetris_*.py scripts were written for
+LEGACY_NAME = "paltetris"
+LEGACY_PALETTE = [
+    0x00000019, 0x00108080, 0x00e98080, 0x0069cadd, 0x0047adb9, 0x00d18e91,
+    0x00628181, 0x0028ef6e, 0x001fc475, 0x00c4957c, 0x00a8a511,
+    0x006e973b, 0x00dc876b, 0x00903623, 0x005f5346, 0x00d8726f,
+    0x00c08080, 0x00873c8a, 0x00d11192, 0x00e56b84, 0x00b91fa3,
+    0x00813fcc, 0x00505cb3, 0x00515bef, 0x003869c4, 0x00cd7995,
+]
+
+DEFAULT_SWATCH = 16
+DEFAULT_COLUMNS = 32
+LABEL_WIDTH = 40
+TITLE_HEIGHT = 14
+BACKGROUND = (48, 48, 48)
+TEXT_COLOR = (255, 255, 255)
+
+
+def interpret(values):
+    """
+    Return an (len(INTERPRETATIONS), n, 3) uint8 array with the display RGB
+    of every entry under each interpretation. YUV and VUY use the BT.601
+    full range conversion of the original scripts.
+    """
+    components = ct952_colorspace.unpack(np.asarray(values, dtype=np.uint32) & 0xFFFFFF)
+    swapped = components[:, ::-1]
+
+    rgb = np.empty((len(INTERPRETATIONS),) + components.shape, dtype=np.uint8)
+    rgb[0] = components
+    rgb[1] = swapped
+    # Both YUV orders in a single table lookup
+    rgb[2:] = ct952_colorspace.yuv_to_rgb(np.stack((components, swapped)))
+    return rgb
+
+
+def inspect_palette(filename):
+    """
+    Load one palette file and interpret it. Runs in the worker processes,
+    so it returns plain data, or an error message instead of raising.
+    """
+    try:
+        palette = ct952_palette.load_palette(filename)
+    except (IOError, OSError, ValueError) as e:
+        return {'name': os.path.basename(filename), 'error': str(e)}
+
+    return {
+        'name': palette.name,
+        'path': filename,
+        'start': palette.start,
+        'values': palette.entries,
+        'rgb': interpret(palette.entries),
+    }
+
+
+def legacy_palette():
+    """The built-in 26 entry table, for running without any files"""
+    values = np.array(LEGACY_PALETTE, dtype=np.uint32)
+    return {'name': LEGACY_NAME, 'path': None, 'start': 0,
+            'values': values, 'rgb': interpret(values)}
+
+
+def find_palettes(paths):
+    """Expand directories to the pal*.txt / PALETTE.TXT files they hold"""
+    filenames = []
+    for path in paths:
+        if not os.path.isdir(path):
+            filenames.append(path)
+            continue
+        for name in sorted(os.listdir(path), key=str.lower):
+            lower = name.lower()
+            if lower.startswith('pal') and lower.endswith('.txt'):
+                filenames.append(os.path.join(path, name))
+    return filenames
+
+
+def inspect_all(filenames, jobs=None):
+    """Interpret every file, spread across a process pool"""
+    if jobs is None:
+        jobs = multiprocessing.cpu_count()
+    jobs = max(1, min(jobs, len(filenames)))
+    if jobs == 1:
+        return [inspect_palette(filename) for filename in filenames]
+
+    pool = multiprocessing.Pool(jobs)
+    try:
+        return pool.map(inspect_palette, filenames, chunksize=1)
+    finally:
+        pool.close()
+        pool.join()
+
+
+def swatch_grid(rgb, columns, swatch):
+    """Lay out an (n, 3) colour list as rows of swatch x swatch squares"""
+    rows = max(1, -(-len(rgb) // columns))
+    grid = np.zeros((rows * columns, 3), dtype=np.uint8)
+    grid[:] = BACKGROUND
+    grid[:len(rgb)] = rgb
+    grid = grid.reshape(rows, columns, 3)
+    return grid.repeat(swatch, axis=0).repeat(swatch, axis=1)
+
+
+def contact_sheet(results, columns=DEFAULT_COLUMNS, swatch=DEFAULT_SWATCH):
+    """One labelled block per palette, one swatch grid per interpretation"""
+    width = LABEL_WIDTH + columns * swatch
+    blocks = []
+    for result in results:
+        grids = [swatch_grid(rgb, columns, swatch) for rgb in result['rgb']]
+        blocks.append((result, grids))
+
+    height = sum(TITLE_HEIGHT + sum(grid.shape[0] + 2 for grid in grids)
+                 for _, grids in blocks)
+    sheet = np.zeros((max(1, height), width, 3), dtype=np.uint8)
+    sheet[:] = BACKGROUND
+
+    labels = []
+    y = 0
+    for result, grids in blocks:
+        labels.append((0, y, "{}  ({} entries at {})".format(
+            result['name'], len(result['values']), result['start'])))
+        y += TITLE_HEIGHT
+        for name, grid in zip(INTERPRETATIONS, grids):
+            labels.append((2, y, name))
+            sheet[y:y + grid.shape[0], LABEL_WIDTH:] = grid
+            y += grid.shape[0] + 2
+
+    image = Image.fromarray(sheet, 'RGB')
+    draw = ImageDraw.Draw(image)
+    for x, y, text in labels:
+        draw.text((x + 2, y + 1), text, fill=TEXT_COLOR)
+    return image
+
+
+def table_rows(results):
+    """One row per palette entry with its display colour in every interpretation"""
+    for result in results:
+        for index, value in enumerate(result['values']):
+            value = int(value)
+            row = {
+                'palette': result['name'],
+                'index': index,
+                'slot': result['start'] + index,
+                'value': "0x{:08X}".format(value),
+                'mix': (value >> 24) & 1,
+            }
+            for name, rgb in zip(INTERPRETATIONS, result['rgb']):
+                row[name] = "#{:02X}{:02X}{:02X}".format(*rgb[index])
+            yield row
+
+
+def write_table(filename, results):
+    """Write the entry table as CSV, or as JSON if filename ends in .json"""
+    fields = ['palette', 'index', 'slot', 'value', 'mix'] + list(INTERPRETATIONS)
+    rows = list(table_rows(results))
+    if filename.lower().endswith('.json'):
+        with open(filename, 'w') as f:
+            json.dump(rows, f, indent=1, sort_keys=True)
+        return
+
+    with open(filename, 'w') as f:
+        writer = csv.DictWriter(f, fieldnames=fields, lineterminator='\n')
+        writer.writeheader()
+        writer.writerows(rows)
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Render palette tables as RGB, BGR, YUV and VUY swatches. "
+                    "Directories are searched for pal*.txt; with no paths the "
+                    "built-in paltetris table is shown.")
+    parser.add_argument('paths', nargs='*', help="palette files or directories")
+    parser.add_argument('-o', '--output', default="palette_contact.png",
+                        help="contact sheet PNG (default: %(default)s)")
+    parser.add_argument('-t', '--table', default="palette_table.csv",
+                        help="entry table, .csv or .json (default: %(default)s)")
+    parser.add_argument('-j', '--jobs', type=int, default=None,
+                        help="worker processes (default: one per CPU)")
+    parser.add_argument('--columns', type=int, default=DEFAULT_COLUMNS,
+                        help="swatches per row (default: %(default)s)")
+    parser.add_argument('--swatch', type=int, default=DEFAULT_SWATCH,
+                        help="swatch size in pixels (default: %(default)s)")
+    args = parser.parse_args()
+
+    start = time.time()
+    if args.paths:
+        results = []
+        for result in inspect_all(find_palettes(args.paths), args.jobs):
+            if 'error' in result:
+                sys.stderr.write("Skipping {}: {}\n".format(result['name'], result['error']))
+            else:
+                results.append(result)
+    else:
+        results = [legacy_palette()]
+
+    if not results:
+        sys.stderr.write("No palette tables found\n")
+        sys.exit(1)
+
+    contact_sheet(results, args.columns, args.swatch).save(args.output)
+    write_table(args.table, results)
+    print("{} palettes in {:.3f} s: contact sheet saved as {}, table saved as {}".format(
+        len(results), time.time() - start, args.output, args.table))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,159 @@
+"""
+Checks for the incremental asset build (ct952_build)
+Wave ordering, no-op rebuilds, staleness after input and parameter changes, and failures that stop their dependents
+Compatible with Python 2.7
+
+    python -m pytest test_build.py
+"""
+
+import json
+import os
+
+import pytest
+from PIL import Image
+
+import ct952_build
+import ct952_fwbitmap
+
+
+def _write_image(path, color):
+    image = Image.new('RGB', (16, 8), color)
+    image.putpixel((0, 0), (255, 255, 255))
+    image.save(path)
+
+
+@pytest.fixture
+def project(tmpdir):
+    """
+    A palette made from two images, both encoded with it, and PNG previews
+    of the encodings. The palette goes after entry 0, so that is where the
+    other rules load it.
+    """
+    root = str(tmpdir)
+    os.makedirs(os.path.join(root, 'art'))
+    _write_image(os.path.join(root, 'art', 'a.png'), (200, 30, 30))
+    _write_image(os.path.join(root, 'art', 'b.png'), (30, 30, 200))
+    spec = {'rules': [
+        {'kind': 'encode', 'sources': 'art/*.png', 'output_dir': 'BMP', 'bits': 4,
+         'palette': 'BMP/palArt.txt', 'palette_start': 1},
+        {'kind': 'palette', 'sources': 'art/*.png', 'output': 'BMP/palArt.txt', 'bits': 4},
+        {'kind': 'decode', 'sources': 'BMP/*.txt', 'exclude': ['BMP/pal*'], 'output_dir': 'png',
+         'palette': 'BMP/palArt.txt', 'palette_start': 1},
+    ]}
+    _save_spec(root, spec)
+    return root
+
+
+def _save_spec(root, spec):
+    with open(os.path.join(root, 'build.json'), 'w') as f:
+        json.dump(spec, f)
+
+
+def _build(root, force=False):
+    """(built, skipped, failed, order of the outputs built) relative to root"""
+    build_file = os.path.join(root, 'build.json')
+    rules = ct952_build.load_rules(build_file)
+    manifest = ct952_build.Manifest(build_file + ct952_build.MANIFEST_SUFFIX)
+    order = []
+    built, skipped, failed = ct952_build.build(rules, manifest, processes=1, force=force,
+                                               log=order.append)
+    manifest.save()
+
+    def relative(paths):
+        return sorted(os.path.relpath(path, root).replace(os.sep, '/') for path in paths)
+    return (relative(built), relative(skipped), relative(output for output, error in failed),
+            [os.path.relpath(line.split(' ', 1)[1], root).replace(os.sep, '/') for line in order])
+
+
+ALL = ['BMP/a.txt', 'BMP/b.txt', 'BMP/palArt.txt', 'png/a.png', 'png/b.png']
+
+
+def test_waves_follow_dependencies(project):
+    built, skipped, failed, order = _build(project)
+    assert built == ALL and not skipped and not failed
+    # The encode rules come first in the file, but need the palette
+    assert order.index('BMP/palArt.txt') < min(order.index('BMP/a.txt'), order.index('BMP/b.txt'))
+    assert max(order.index('BMP/a.txt'), order.index('BMP/b.txt')) < order.index('png/a.png')
+
+
+def test_second_build_does_nothing(project):
+    _build(project)
+    built, skipped, failed, order = _build(project)
+    assert not built and not failed and skipped == ALL
+
+    rules = ct952_build.load_rules(os.path.join(project, 'build.json'))
+    manifest = ct952_build.Manifest(os.path.join(project, 'build.json') + ct952_build.MANIFEST_SUFFIX)
+    assert ct952_build.stale_rules(rules, manifest) == []
+
+
+def test_touched_but_unchanged_input_is_current(project):
+    _build(project)
+    source = os.path.join(project, 'art', 'a.png')
+    stat = os.stat(source)
+    os.utime(source, (stat.st_atime, stat.st_mtime + 10))
+    built, skipped, failed, order = _build(project)
+    assert not built and skipped == ALL
+
+
+def test_changed_input_rebuilds_its_dependents(project):
+    _build(project)
+    _write_image(os.path.join(project, 'art', 'b.png'), (30, 200, 30))
+    built, skipped, failed, order = _build(project)
+    # Both images share the palette, so a new colour changes everything made from it
+    assert built == ALL and not failed
+
+
+def test_changed_output_is_rebuilt(project):
+    _build(project)
+    with open(os.path.join(project, 'png', 'a.png'), 'ab') as f:
+        f.write(b'edited')
+    built, skipped, failed, order = _build(project)
+    assert built == ['png/a.png']
+
+
+def test_changed_parameter_rebuilds_the_rule(project):
+    _build(project)
+    with open(os.path.join(project, 'build.json')) as f:
+        spec = json.load(f)
+    spec['rules'][2]['palette_start'] = 2
+    _save_spec(project, spec)
+    built, skipped, failed, order = _build(project)
+    assert built == ['png/a.png', 'png/b.png']
+
+
+def test_failed_producer_skips_its_dependents(project):
+    _build(project)
+    with open(os.path.join(project, 'art', 'b.png'), 'wb') as f:
+        f.write(b'not a png')
+    built, skipped, failed, order = _build(project)
+    assert 'BMP/palArt.txt' in failed
+    # Nothing is built from the old palette; a.png's own encode cannot be either
+    assert not built
+    assert set(['BMP/a.txt', 'png/a.png', 'png/b.png']) <= set(failed)
+
+
+def test_dependency_cycle_is_an_error(project):
+    rules = ct952_build.load_rules(os.path.join(project, 'build.json'))
+    preview = [rule for rule in rules if rules[0].output in rule.inputs][0]
+    rules[0].inputs.append(preview.output)      # an encode that needs its own preview
+    manifest = ct952_build.Manifest(os.path.join(project, 'none.json'))
+    with pytest.raises(ValueError):
+        ct952_build.build(rules, manifest, processes=1)
+
+
+def test_bin_extension_writes_binary(project):
+    with open(os.path.join(project, 'build.json')) as f:
+        spec = json.load(f)
+    spec['rules'].append(dict(spec['rules'][0], output_dir='BIN', extension='.bin'))
+    spec['rules'].append({'kind': 'decode', 'sources': 'BIN/*.bin', 'output_dir': 'binpng',
+                          'palette': 'BMP/palArt.txt', 'palette_start': 1})
+    _save_spec(project, spec)
+    built, skipped, failed, order = _build(project)
+    assert not failed and set(['BIN/a.bin', 'BIN/b.bin', 'binpng/a.png']) <= set(built)
+
+    text, bitmap = ct952_fwbitmap.load_file(os.path.join(project, 'BMP', 'a.txt'))
+    with open(os.path.join(project, 'BIN', 'a.bin'), 'rb') as f:
+        assert f.read() == bytes(text)
+    with open(os.path.join(project, 'png', 'a.png'), 'rb') as f, \
+            open(os.path.join(project, 'binpng', 'a.png'), 'rb') as g:
+        assert f.read() == g.read()
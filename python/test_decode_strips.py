@@ -0,0 +1,93 @@
+"""
+Checks for strip decoding (ct952_decode.decode_strips)
+Every format, decoded in strips from a buffer or from blocks, must match the whole-image decoders byte for byte
+Compatible with Python 2.7
+
+    python -m pytest test_decode_strips.py
+"""
+
+import numpy as np
+import pytest
+
+import ct952_decode
+
+PALETTE = bytes(bytearray(range(256)) * 3)
+SIZES = [(13, 37), (80, 124), (7, 9), (1, 50)]
+STRIP_BYTES = [1, 3, 64, ct952_decode.STRIP_BYTES]
+
+
+def _cases():
+    for format_type in sorted(ct952_decode.FORMAT_BITS):
+        palettes = [None]
+        if format_type in ct952_decode.INDEXED_FORMATS.values():
+            palettes.append(PALETTE)
+        for palette in palettes:
+            yield format_type, palette
+
+
+def _whole(data, width, height, format_type, palette):
+    """The whole-image decoder, which decode() skips for large images"""
+    decoder = ct952_decode.DECODERS[format_type]
+    if format_type in ct952_decode.INDEXED_FORMATS.values():
+        return decoder(data, width, height, palette)
+    return decoder(data, width, height)
+
+
+def _assert_same(image, expected):
+    assert image.mode == expected.mode
+    assert image.size == expected.size
+    assert image.tobytes() == expected.tobytes()
+    if expected.mode == 'P':
+        assert image.getpalette() == expected.getpalette()
+        assert image.info.get('transparency') == expected.info.get('transparency')
+
+
+@pytest.mark.parametrize('format_type, palette', list(_cases()))
+def test_strips_match_whole_decode(format_type, palette):
+    rng = np.random.RandomState(0)
+    bits = ct952_decode.FORMAT_BITS[format_type]
+    for width, height in SIZES:
+        data = rng.randint(0, 256, (width * height * bits + 7) // 8 + 5).astype(np.uint8).tobytes()
+        expected = _whole(data, width, height, format_type, palette)
+        for strip_bytes in STRIP_BYTES:
+            _assert_same(ct952_decode.decode_strips(data, width, height, format_type, palette,
+                                                    strip_bytes), expected)
+            blocks = (data[i:i + 5] for i in range(0, len(data), 5))
+            _assert_same(ct952_decode.decode_strips(blocks, width, height, format_type, palette,
+                                                    strip_bytes), expected)
+
+
+@pytest.mark.parametrize('format_type, palette', list(_cases()))
+def test_decode_uses_strips_for_large_images(format_type, palette):
+    bits = ct952_decode.FORMAT_BITS[format_type]
+    width = 256
+    height = ct952_decode.strip_rows(width, bits) * 2 + 3
+    data = np.random.RandomState(1).randint(0, 256, (width * height * bits + 7) // 8).astype(np.uint8)
+    _assert_same(ct952_decode.decode(data.tobytes(), width, height, format_type, palette),
+                 _whole(data.tobytes(), width, height, format_type, palette))
+
+
+@pytest.mark.parametrize('width, bits', [(1, 1), (3, 1), (5, 2), (7, 4), (13, 24), (640, 16)])
+def test_strips_are_whole_bytes(width, bits):
+    for strip_bytes in STRIP_BYTES:
+        rows = ct952_decode.strip_rows(width, bits, strip_bytes)
+        assert rows >= 1
+        assert rows * width * bits % 8 == 0
+
+
+def test_short_data_is_an_error():
+    with pytest.raises(ValueError):
+        ct952_decode.decode_strips(b'\0' * 10, 10, 10, ct952_decode.FORMAT_RGB24)
+    with pytest.raises(ValueError):
+        ct952_decode.decode_strips(iter([b'\0' * 10]), 10, 10, ct952_decode.FORMAT_RGB24)
+
+
+def test_blocks_are_read_only_as_far_as_needed():
+    read = []
+
+    def blocks():
+        for i in range(100):
+            read.append(i)
+            yield b'\0' * 10
+    ct952_decode.decode_strips(blocks(), 10, 10, ct952_decode.FORMAT_8BIT_GRAY, strip_bytes=10)
+    assert len(read) == 10
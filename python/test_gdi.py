@@ -0,0 +1,81 @@
+"""
+Checks for the GDI region model (ct952_gdi)
+Fills and copies with rectangles partly or wholly outside a region are clipped, never wrapped by negative indexing
+Compatible with Python 2.7
+
+    python -m pytest test_gdi.py
+"""
+
+import numpy as np
+import pytest
+
+import ct952_gdi
+
+
+def _region(width=8, height=6):
+    return ct952_gdi.Region(width, height)
+
+
+def _numbered(width=8, height=6):
+    """A region whose pixels are their own numbers, so every copy shows where it came from"""
+    region = _region(width, height)
+    region.pixels[...] = np.arange(1, width * height + 1).reshape(height, width)
+    return region
+
+
+def _reference_copy(target, source, left, top, right, bottom, x, y):
+    """bitmap_copy one pixel at a time: only pixels inside both regions move"""
+    expected = target.pixels.copy()
+    for row in range(top, bottom + 1):
+        for column in range(left, right + 1):
+            tx, ty = x + column - left, y + row - top
+            if (0 <= row < source.height and 0 <= column < source.width
+                    and 0 <= ty < target.height and 0 <= tx < target.width):
+                expected[ty, tx] = source.pixels[row, column]
+    return expected
+
+
+@pytest.mark.parametrize('rect, filled', [
+    ((-3, -2, 2, 1), (slice(0, 2), slice(0, 3))),
+    ((5, 4, 20, 20), (slice(4, 6), slice(5, 8))),
+    ((-10, 2, -1, 3), None),
+    ((2, -5, 4, -1), None),
+    ((8, 0, 9, 5), None),
+    ((4, 3, 2, 3), None),
+])
+def test_fill_rect_is_clipped(rect, filled):
+    region = _region()
+    region.fill_rect(*(rect + (7,)))
+    expected = np.zeros_like(region.pixels)
+    if filled is not None:
+        expected[filled] = 7
+    np.testing.assert_array_equal(region.pixels, expected)
+
+
+@pytest.mark.parametrize('rect, x, y', [
+    ((0, -5, 3, -2), 0, 0),         # wholly above the source
+    ((-6, 0, -1, 3), 2, 2),         # wholly left of the source
+    ((-2, -1, 3, 2), 1, 1),         # corner outside the source
+    ((2, 1, 6, 4), -3, -2),         # target corner outside the region
+    ((5, 3, 12, 9), 0, 0),          # past the source's far edges
+    ((0, 0, 7, 5), 2, 1),           # overlapping itself
+    ((3, 2, 1, 4), 0, 0),           # right before left
+])
+def test_bitmap_copy_is_clipped(rect, x, y):
+    region = _numbered()
+    expected = _reference_copy(region, region, *(rect + (x, y)))
+    region.bitmap_copy(region, *(rect + (x, y)))
+    np.testing.assert_array_equal(region.pixels, expected)
+
+
+def test_bitmap_copy_outside_the_source_copies_nothing():
+    source = _numbered()
+    target = _region()
+    target.bitmap_copy(source, 0, -5, 3, -2, 0, 0)
+    target.bitmap_copy(source, 0, 6, 3, 9, 0, 0)
+    assert not target.pixels.any()
+
+
+def test_bitmap_copy_needs_the_same_depth():
+    with pytest.raises(ValueError):
+        _region().bitmap_copy(ct952_gdi.Region(8, 6, ct952_gdi.GDI_OSD_4B_MODE), 0, 0, 1, 1, 0, 0)
@@ -0,0 +1,155 @@
+"""
+Checks for the boot logo decoder (ct952_mpeg)
+VLC tables against their code lists, dequantization and the IDCT against the ISO/IEC 13818-2 formulas, and the logos in the tree
+Compatible with Python 2.7
+
+    python -m pytest test_mpeg.py
+"""
+
+import os
+
+import numpy as np
+import pytest
+
+import ct952_mpeg
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir)
+
+# (file, size, mean R, G, B of the decoded picture)
+LOGOS = [
+    ('LOGO.TXT', (704, 480), (98.78, 177.10, 167.88)),          # MPEG-1
+    ('logo_dbg.txt', (704, 480), (86.74, 149.51, 209.83)),      # MPEG-2, table one, non-linear scale
+]
+
+
+def _code_lists():
+    return [
+        (ct952_mpeg.MACROBLOCK_ADDRESS_INCREMENT, ct952_mpeg.ADDRESS_BITS),
+        (ct952_mpeg.DC_SIZE_LUMINANCE, ct952_mpeg.DC_LUMINANCE_BITS),
+        (ct952_mpeg.DC_SIZE_CHROMINANCE, ct952_mpeg.DC_CHROMINANCE_BITS),
+        ([(code, (run, level)) for code, run, level in ct952_mpeg.DCT_TABLE_ZERO], ct952_mpeg.DCT_BITS),
+        ([(code, (run, level)) for code, run, level in ct952_mpeg.DCT_TABLE_ONE], ct952_mpeg.DCT_BITS),
+    ]
+
+
+@pytest.mark.parametrize('codes, bits', _code_lists())
+def test_vlc_lookup_finds_every_code(codes, bits):
+    """Every code, followed by any bits, looks up its own value and length"""
+    assert len(set(code for code, value in codes)) == len(codes)
+    assert max(len(code) for code, value in codes) == bits
+    table = ct952_mpeg._lookup(codes, bits)
+    for code, value in codes:
+        shift = bits - len(code)
+        first = int(code, 2) << shift
+        for index in (first, first + (1 << shift) - 1):
+            assert table[index] == (value, len(code)), code
+
+
+def test_dct_tables_cover_the_same_pairs():
+    """Tables B-14 and B-15 code the same 111 run/level pairs, plus EOB and escape"""
+    zero = set((run, level) for code, run, level in ct952_mpeg.DCT_TABLE_ZERO)
+    one = set((run, level) for code, run, level in ct952_mpeg.DCT_TABLE_ONE)
+    assert zero == one
+    assert len(ct952_mpeg.DCT_TABLE_ZERO) == len(ct952_mpeg.DCT_TABLE_ONE) == 113
+
+
+def _picture(mpeg2, q_scale_type, intra_dc_precision, seed):
+    """An IntraPicture with random quantized blocks, without parsing a stream"""
+    rng = np.random.RandomState(seed)
+    picture = object.__new__(ct952_mpeg.IntraPicture)
+    picture.mpeg2 = mpeg2
+    picture.q_scale_type = q_scale_type
+    picture.intra_dc_precision = intra_dc_precision
+    picture.intra_matrix = ct952_mpeg.DEFAULT_INTRA_MATRIX
+    codes = rng.randint(1, 32, 4)
+    picture.quantiser_scale = np.array([picture._quantiser_scale(code) for code in codes])
+    picture.dc = rng.randint(0, 1 << (8 + intra_dc_precision), 24)
+    picture.indices = []
+    picture.levels = []
+    for block in range(24):
+        for position in rng.choice(np.arange(1, 64), 12, replace=False):
+            picture.indices.append(block * 64 + position)
+            picture.levels.append(int(rng.randint(-300, 300)))
+    return picture, codes
+
+
+def _reference_coefficients(picture, codes):
+    """ISO/IEC 11172-2 2.4.4.1 and 13818-2 7.4, one coefficient at a time"""
+    levels = dict(zip(picture.indices, picture.levels))
+    result = np.zeros((len(picture.dc), 64), dtype=np.int64)
+    for block in range(len(picture.dc)):
+        code = codes[block // 6]
+        total = 0
+        for position in range(64):
+            if position == 0:
+                value = picture.dc[block] * (8 >> picture.intra_dc_precision)
+            else:
+                level = levels.get(block * 64 + position, 0)
+                weight = picture.intra_matrix[position]
+                if picture.mpeg2:
+                    scale = ct952_mpeg.NON_LINEAR_QUANTISER_SCALE[code] if picture.q_scale_type else 2 * code
+                    value = int(2.0 * level * weight * scale / 32)
+                else:
+                    value = int(2.0 * level * code * weight / 16)
+                    if value % 2 == 0 and value:
+                        value -= 1 if value > 0 else -1
+            value = min(2047, max(-2048, value))
+            result[block, position] = value
+            total += value
+        if picture.mpeg2 and total % 2 == 0:
+            result[block, 63] += -1 if result[block, 63] & 1 else 1
+    return result
+
+
+@pytest.mark.parametrize('mpeg2, q_scale_type, intra_dc_precision', [
+    (False, 0, 0), (True, 0, 0), (True, 1, 0), (True, 1, 2)])
+def test_dequantization_matches_the_standard(mpeg2, q_scale_type, intra_dc_precision):
+    picture, codes = _picture(mpeg2, q_scale_type, intra_dc_precision, seed=q_scale_type + intra_dc_precision)
+    np.testing.assert_array_equal(picture.coefficients(), _reference_coefficients(picture, codes))
+
+
+def test_idct_matches_the_definition():
+    """blocks() against the 8x8 inverse DCT sum of ISO/IEC 13818-2 A.1"""
+    rng = np.random.RandomState(1)
+    coefficients = rng.randint(-48, 48, (24, 64))
+    coefficients[:, 0] = rng.randint(256, 1792, 24)
+    picture = object.__new__(ct952_mpeg.IntraPicture)
+    picture.coefficients = lambda: coefficients
+    blocks = picture.blocks()
+    coefficients = coefficients.reshape(-1, 8, 8).astype(np.float64)
+    c = np.array([np.sqrt(0.5)] + [1.0] * 7)
+    n = np.arange(8)
+    basis = np.cos((2 * n[:, np.newaxis] + 1) * n[np.newaxis, :] * np.pi / 16)     # [sample, frequency]
+    for block in (0, 7, 23):
+        samples = np.zeros((8, 8))
+        for y in range(8):
+            for x in range(8):
+                samples[y, x] = 0.25 * sum(c[u] * c[v] * coefficients[block, v, u] * basis[x, u] * basis[y, v]
+                                           for u in range(8) for v in range(8))
+        expected = np.clip(np.rint(samples), 0, 255)
+        assert np.abs(blocks[block] - expected).max() <= 1
+
+
+@pytest.mark.parametrize('name, size, mean', LOGOS)
+def test_logo_decodes(name, size, mean):
+    filename = os.path.join(ROOT, name)
+    if not os.path.exists(filename):
+        pytest.skip("{} is not in this tree".format(name))
+    data = ct952_mpeg.load_logo(filename)
+    assert ct952_mpeg.logo_kind(data) == ct952_mpeg.LOGO_MPEG
+
+    picture = ct952_mpeg.IntraPicture(bytes(ct952_mpeg.logo_payload(data)))
+    assert picture.decoded == picture.mb_width * picture.mb_height
+    image = ct952_mpeg.decode_logo(data)
+    assert image.size == size
+    averages = np.asarray(image, dtype=np.float64).reshape(-1, 3).mean(axis=0)
+    np.testing.assert_allclose(averages, mean, atol=0.5)
+
+
+@pytest.mark.parametrize('data', [
+    b'\xff\xd8' + b'\x5a' * 200,                        # JPEG start, then garbage
+    b'\0\0\1\xb3' + b'\xff' * 200,                      # MPEG sequence header, then garbage
+])
+def test_bad_logo_is_a_value_error(data):
+    with pytest.raises(ValueError):
+        ct952_mpeg.decode_logo(data)